@@ -1,320 +1,179 @@
 # backend/app.py
-import random
-import re
-import pandas as pd
-from flask import Flask, request, jsonify
-import sqlite3
+import tempfile
+from flask import Flask, Response, request, jsonify, stream_with_context
 import os
+from html import escape
+from urllib.parse import urlencode
+from db import get_connection
+import bulk
+import complaints
+import export
+import handlers
+import rollups
+import search
+from handlers import (db_path, dataset_manager, intent_registry, keywords_file_path, pnr_dataset,
+                      pnr_file_path, station_dataset, stations_file_path)
 
 app = Flask(__name__)
 
 # --- 1. Define Paths ---
-project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
-pnr_file_path = os.path.join(project_root, 'data', 'pnr_database.csv')
-stations_file_path = os.path.join(project_root, 'data', 'stations_original.csv')
-db_path = os.path.join(project_root, 'railmadad.db')
-
+# The paths and the intent handlers live in handlers.py, shared with asgi.py and main.py.
 print(f"Looking for PNR data at: {pnr_file_path}")
 print(f"Looking for Station data at: {stations_file_path}")
 print(f"Looking for DB at: {db_path}")
+print(f"Looking for department keywords at: {keywords_file_path}")
 
-# --- 2. RUN DATABASE SETUP ---
-# This runs EVERY time the server starts, ensuring the tables always exist.
-def setup_database():
-    try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS queries (
-            query_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            query_text TEXT NOT NULL,
-            status TEXT DEFAULT 'Open',
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        );
-        ''')
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS complaints (
-            complaint_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            phone_number TEXT,
-            pnr TEXT,
-            token TEXT,
-            station TEXT,
-            complaint_text TEXT NOT NULL,
-            department TEXT, 
-            status TEXT DEFAULT 'Open',
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        );
-        ''')
-        print("✅ Database tables checked/created successfully.")
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        print(f"❌ ERROR setting up database: {e}")
-
-setup_database() # Run the setup function on startup
-
-# --- 3. Load Data at Startup ---
-try:
-    # Use the correct column name 'PNR'
-    pnr_data = pd.read_csv(pnr_file_path, index_col='PNR') 
-    print("✅ PNR dataset loaded successfully.")
-except Exception as e:
-    print(f"❌ ERROR loading PNR data: {e}")
-    pnr_data = None
-
-try:
-    # Use the correct column names 'station' and 'id_code' and handle quotes
-    station_data_raw = pd.read_csv(stations_file_path, quotechar='"') 
-    station_data_processed = station_data_raw.copy()
-    station_data_processed['station'] = station_data_processed['station'].str.lower()
-    station_data_processed['id_code'] = station_data_processed['id_code'].str.lower()
-    print("✅ Station dataset loaded successfully.")
-except Exception as e:
-    print(f"❌ ERROR loading Station data: {e}")
-    station_data_raw = None
-    station_data_processed = None
-
-# --- 4. Helper Functions for Chatbot ---
-
-def handle_query_intent(request_json):
-    """Handles the 'capture_user_query' intent."""
-    user_query_text = request_json['queryResult']['parameters']['user_query']
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO queries (query_text) VALUES (?)", (user_query_text,))
-    conn.commit()
-    new_query_id = cursor.lastrowid
-    conn.close()
-    response_text = f"Thank you. Your query has been registered with ID: Q-{new_query_id}."
-    return {"fulfillmentText": response_text}
-
-def handle_phone_number(request_json):
-    """Handles the 'provide_phone_number' intent."""
-    raw_input = request_json['queryResult'].get('queryText', '')
-    digits = re.findall(r'\d', raw_input)
-    phone_number_str = "".join(digits)
-    
-    if len(phone_number_str) == 10:
-        return {
-            "fulfillmentText": "Thank you. Where is the issue occurring? Please select one:",
-            "outputContexts": [
-                {
-                    "name": f"{request_json['session']}/contexts/awaiting-location",
-                    "lifespanCount": 1,
-                    "parameters": {"phone_number": phone_number_str}
-                }
-            ],
-            "payload": {
-                "richContent": [
-                    [
-                        {
-                            "type": "chips",
-                            "options": [
-                                {"text": "On a Train"},
-                                {"text": "On a Platform"}
-                            ]
-                        }
-                    ]
-                ]
-            }
+# --- 2. Set Up the Database and Load Data at Startup ---
+# The handlers do this lazily on first use; a long-running server does it all up
+# front so the first requests don't pay for it (and the tables always exist).
+handlers.warm_up()
+
+# --- 3. Main Webhook Router ---
+@app.route('/webhook', methods=['POST'])
+def dialogflow_webhook():
+    return jsonify(handlers.handle_webhook(request.get_json()))
+
+@app.route('/stations/nearest')
+def nearest_stations():
+    """Returns the k stations nearest to ?lat=..&lon=.. as JSON."""
+    stations = station_dataset.get()
+    if stations is None:
+        return jsonify({"error": "Station database is not loaded."}), 503
+    lat = request.args.get('lat', type=float)
+    lon = request.args.get('lon', type=float)
+    k = min(request.args.get('k', default=handlers.NEAREST_STATIONS, type=int), 50)
+    if lat is None or lon is None or not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return jsonify({"error": "Provide valid 'lat' and 'lon' query parameters."}), 400
+    nearest = [
+        {
+            "id_code": row['id_code'],
+            "station": row['station'],
+            "district": row.get('district'),
+            "latitude": float(row['latitude']),
+            "longitude": float(row['longitude']),
+            "distance_km": round(distance_km, 3)
         }
-    else:
-        return {"fulfillmentText": "That doesn't seem to be a valid 10-digit number. Please try again."}
-
-def handle_station_search(request_json):
-    """Handles the 'provide_station_name' intent."""
-    user_input = request_json['queryResult']['parameters'].get('station_input', '').lower().strip('"')
-    if station_data_processed is None:
-        return {"fulfillmentText": "Error: Station database is not loaded. Please contact support."}
-    
-    station_match = station_data_processed[
-        (station_data_processed['id_code'] == user_input) | 
-        (station_data_processed['station'] == user_input)
+        for distance_km, row in stations.nearest.nearest(lat, lon, k=k)
     ]
-    
-    if not station_match.empty:
-        original_station_name = station_data_raw.iloc[station_match.index[0]].get('station')
-        return {
-            "fulfillmentText": f"Did you mean '{original_station_name}'?",
-            "outputContexts": [
-                {
-                    "name": f"{request_json['session']}/contexts/awaiting-station-confirmation",
-                    "lifespanCount": 1,
-                    "parameters": {"station_confirmed": original_station_name}
-                }
-            ]
-        }
-    else:
-        return {"fulfillmentText": "Sorry, I couldn't find that station. Please try the name or code again."}
+    return jsonify({"stations": nearest})
 
-def handle_station_confirmed(request_json):
-    """Handles the 'user_confirms_station_yes' intent."""
-    try:
-        confirmed_station = "Unknown"
-        contexts = request_json['queryResult']['outputContexts']
-        for c in contexts:
-            if 'awaiting-station-confirmation' in c['name']:
-                confirmed_station = c['parameters']['station_confirmed']
-                break
-        response_text = f"Great! Complaint at '{confirmed_station}'. Please describe your complaint (e.g., 'no water', 'dirty platform')."
-        return {
-            "fulfillmentText": response_text,
-            "outputContexts": [
-                {
-                    "name": f"{request_json['session']}/contexts/awaiting-complaint-description",
-                    "lifespanCount": 1,
-                    "parameters": {"station_confirmed": confirmed_station}
-                }
-            ]
-        }
-    except Exception as e:
-        print(f"Error in handle_station_confirmed: {e}")
-        return {"fulfillmentText": "An error occurred. Please try again."}
+@app.route('/metrics')
+def metrics():
+    """Per-intent request counts, error counts and latency histograms in Prometheus text format.
 
-def handle_pnr_verification(request_json):
-    """Handles the 'provide_pnr' intent."""
-    pnr_str = request_json['queryResult']['parameters'].get('pnr_number', '')
-    if pnr_data is None:
-        return {"fulfillmentText": "Error: PNR database is not loaded. Please check server logs."}
-    try:
-        pnr_num_str = str(int(float(pnr_str)))
-        padded_pnr_num = pnr_num_str.zfill(10)
-        pnr_to_check = f"PNR{padded_pnr_num}"
-        
-        if pnr_to_check in pnr_data.index:
-            pnr_list = list(pnr_to_check)
-            random.shuffle(pnr_list)
-            token = "".join(pnr_list)
-            pnr_details = pnr_data.loc[pnr_to_check]
-            
-            # Use the correct column name 'Train_No'
-            train_no = pnr_details['Train_No'] 
-
-            response_text = f"PNR verified for Train {train_no}. Your complaint token is {token}. Please describe your complaint."
-            return {
-                "fulfillmentText": response_text,
-                "outputContexts": [
-                    {
-                        "name": f"{request_json['session']}/contexts/awaiting-complaint-description",
-                        "lifespanCount": 1,
-                        "parameters": {
-                            "complaint_token": token,
-                            "pnr": pnr_to_check
-                        }
-                    }
-                ]
-            }
-        else:
-            return {"fulfillmentText": "That PNR was not found in our records. Please try again."}
-    except Exception as e:
-        print(f"Error in PNR check: {e}")
-        return {"fulfillmentText": "That doesn't seem to be a valid PNR. Please enter a 10-digit PNR."}
-
-def categorize_complaint(complaint_text):
-    """Analyzes complaint text to route it to a department."""
-    text = complaint_text.lower()
-    
-    # FIX: Added 'bad' to the food keywords
-    food_keywords = ['food', 'overpriced', 'overcharged', 'irctc', 'pantry', 'water', 'tea', 'meal', 'catering', 'bad']
-    if any(keyword in text for keyword in food_keywords):
-        return "IRCTC Department"
-    
-    cleaning_keywords = ['clean', 'dirty', 'filthy', 'hygiene', 'washroom', 'toilet', 'coach', 'stink', 'platform']
-    if any(keyword in text for keyword in cleaning_keywords):
-        return "Cleaning Department"
-    
-    ticket_keywords = ['ticket', 'tc', 'tte', 'ticketless', 'no ticket', 'collector']
-    if any(keyword in text for keyword in ticket_keywords):
-        return "TICKET COLLECTOR Department"
-    
-    return "General Operations"
-
-def handle_complaint_logging(request_json):
-    """Handles the final 'capture_complaint_description' intent."""
-    try:
-        complaint_text = request_json['queryResult']['parameters'].get('complaint_text', '')
-        pnr = ""
-        token = ""
-        station = ""
-        phone_number = ""
-        
-        contexts = request_json['queryResult']['outputContexts']
-        for c in contexts:
-            if 'awaiting-complaint-description' in c['name']:
-                params = c.get('parameters', {})
-                pnr = params.get('pnr', '')
-                token = params.get('complaint_token', '')
-                station = params.get('station_confirmed', '')
-            if 'awaiting-location' in c['name']:
-                phone_number = c['parameters'].get('phone_number', '')
-
-        department = categorize_complaint(complaint_text)
-        
-        if pnr:
-            station = ""
-        if station:
-            pnr = ""
-            token = ""
-
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO complaints (phone_number, pnr, token, station, complaint_text, department) VALUES (?, ?, ?, ?, ?, ?)",
-            (phone_number, pnr, token, station, complaint_text, department)
-        )
-        conn.commit()
-        new_complaint_id = cursor.lastrowid
-        conn.close()
-        response_text = f"Thank you. Your complaint (ID: C-{new_complaint_id}) has been successfully routed to the {department}."
-        return {
-            "fulfillmentText": response_text,
-            "outputContexts": [] 
-        }
-    except Exception as e:
-        print(f"Error in complaint logging: {e}")
-        return {"fulfillmentText": "Sorry, there was an error lodging your complaint. Please try again."}
+    Followed by this worker's session store and rate limiter counters.
+    """
+    body = intent_registry.metrics.render_prometheus() + handlers.render_session_metrics()
+    return Response(body, mimetype='text/plain; version=0.0.4')
 
-# --- 5. Main Webhook Router ---
-@app.route('/webhook', methods=['POST'])
-def dialogflow_webhook():
-    request_json = request.get_json()
-    try:
-        intent_name = request_json['queryResult']['intent']['displayName']
-    except Exception:
-        return jsonify({"fulfillmentText": "Error: Invalid request."})
-
-    if intent_name == 'capture_user_query':
-        return jsonify(handle_query_intent(request_json))
-    elif intent_name == 'provide_phone_number':
-        # FIX: Re-enabled the phone number webhook
-        return jsonify(handle_phone_number(request_json))
-    elif intent_name == 'provide_station_name':
-        return jsonify(handle_station_search(request_json))
-    elif intent_name == 'user_confirms_station_yes':
-        return jsonify(handle_station_confirmed(request_json))
-    elif intent_name == 'provide_pnr':
-        return jsonify(handle_pnr_verification(request_json))
-    elif intent_name == 'capture_complaint_description':
-        return jsonify(handle_complaint_logging(request_json))
-    else:
-        return jsonify({"fulfillmentText": "Error: Unrecognized intent in webhook."})
-
-# --- 6. ADMIN DASHBOARD PAGES ---
-
-def get_db_as_html_table(query, db_path_to_use):
-    """Helper function to query the DB and return an HTML table."""
-    try:
-        # Run setup_database() to guarantee tables exist
-        setup_database() 
-        conn = sqlite3.connect(db_path_to_use)
-        df = pd.read_sql_query(query, conn)
-        conn.close()
-        # Return an empty message if the dataframe is empty
-        if df.empty:
-            return "<p>No complaints found in the log.</p>"
-        return df.to_html(index=False, border=1, classes="table table-striped")
-    except Exception as e:
-        return f"<p>Error reading database: {e}. (The table may be empty.)</p>"
+@app.route('/admin/profile', methods=['GET', 'POST', 'DELETE'])
+def admin_profile():
+    """Runtime sampling profiler for one intent, in this worker.
+
+    POST ?intent=provide_pnr[&interval=0.001] switches it on, GET returns the folded
+    stacks collected so far (flamegraph.pl/speedscope format), DELETE switches it off
+    and returns them.
+    """
+    if request.method == 'POST':
+        try:
+            intent_registry.start_profiling(request.args.get('intent', ''),
+                                            interval=request.args.get('interval', default=0.001, type=float))
+        except ValueError as e:
+            return jsonify({"error": str(e), "intents": intent_registry.intents}), 400
+        return jsonify({"profiling": intent_registry.profiled_intent, "pid": os.getpid()})
+    profiler = intent_registry.stop_profiling() if request.method == 'DELETE' else intent_registry.profiler
+    if profiler is None:
+        return jsonify({"error": "Profiling is not switched on in this worker."}), 404
+    return Response(profiler.folded(), mimetype='text/plain')
+
+@app.route('/admin/datasets')
+def admin_datasets():
+    """Version, row count and recent loads (time, memory, errors) of each dataset in this worker."""
+    return jsonify(dataset_manager.status())
+
+@app.route('/admin/duplicates')
+def admin_duplicates():
+    """Size of this worker's near-duplicate index and how many duplicates it has linked."""
+    return jsonify(handlers.get_duplicate_index().stats())
+
+@app.route('/complaints/bulk', methods=['POST'])
+def bulk_complaints():
+    """Bulk-loads complaints sent as the request body, CSV or JSONL (see bulk.py).
+
+    The format comes from ?format=csv|jsonl or the Content-Type. The body is read
+    as it streams in and the response streams back as JSONL: one result per record
+    ({"row", "complaint_id", "department"[, "parent_complaint_id"]} or {"row", "error"}),
+    then a {"summary": ...} line. ?dedup=0 skips duplicate linking, e.g. for a
+    historical backfill.
+    """
+    fmt = request.args.get('format') or bulk.format_of(None, request.content_type)
+    if fmt not in bulk.FORMATS:
+        return jsonify({"error": f"'format' must be one of: {', '.join(bulk.FORMATS)}"}), 400
+    summary = {}
+    results = handlers.ingest_complaints(request.stream, fmt, summary,
+                                         link_duplicates=request.args.get('dedup') != '0')
+    return Response(stream_with_context(bulk.encode_results(results, summary)), mimetype='application/x-ndjson')
+
+@app.route('/admin/sessions')
+def admin_sessions():
+    """Session store hits, expiries and evictions, and requests allowed or shed by each rate limiter, in this worker."""
+    return jsonify(handlers.session_stats())
+
+@app.route('/admin/datasets/<name>/reload', methods=['POST'])
+def admin_reload_dataset(name):
+    """Reloads a dataset in the background, from its files or from a delta CSV sent as the body.
+
+    ?wait=1 reloads before responding and returns the load's stats. ?trace=1 also
+    measures the heap the load allocates (tracemalloc), which makes it much slower.
+    With several workers, the others pick up the new files through their watchers.
+    """
+    if name not in dataset_manager.datasets:
+        return jsonify({"error": f"Unknown dataset '{name}'", "datasets": list(dataset_manager.datasets)}), 404
+    dataset = dataset_manager[name]
+    delta_path = None
+    body = request.get_data()
+    if body:
+        with tempfile.NamedTemporaryFile('wb', suffix='.csv', delete=False) as f:
+            f.write(body)
+            delta_path = f.name
+
+    def cleanup(stats):
+        if delta_path:
+            os.remove(delta_path)
+
+    trace_memory = bool(request.args.get('trace'))
+    if request.args.get('wait'):
+        stats = dataset.reload(delta_path, trace_memory)
+        cleanup(stats)
+        return jsonify(stats), (200 if stats['ok'] else 422)
+    dataset.reload_in_background(delta_path, on_done=cleanup, trace_memory=trace_memory)
+    return jsonify({"dataset": name, "version": dataset.version, "reloading": True}), 202
+
+# --- 4. ADMIN DASHBOARD PAGES ---
+
+def render_html_table(columns, rows):
+    """Helper function to render a list of row dicts as an HTML table, without pandas."""
+    header = "".join(f"<th>{escape(c)}</th>" for c in columns)
+    body = "".join(
+        "<tr>" + "".join(f"<td>{escape('' if row.get(c) is None else str(row.get(c)))}</td>" for c in columns) + "</tr>"
+        for row in rows
+    )
+    return f'<table border="1" class="table table-striped"><thead><tr>{header}</tr></thead><tbody>{body}</tbody></table>'
+
+def render_filter_form(action, filters, fields=('department', 'status', 'station', 'pnr'), extra_inputs=''):
+    """Helper function to render the shared complaint filter form."""
+    inputs = extra_inputs + "".join(
+        f'<label>{field.title()} <input name="{field}" value="{escape(filters.get(field, ""))}" size="14"></label> '
+        for field in fields
+    )
+    return f"""
+    <form method="get" action="{action}" style="margin-top: 10px;">
+        {inputs}
+        <label>From <input type="date" name="date_from" value="{escape(filters.get('date_from', ''))}"></label>
+        <label>To <input type="date" name="date_to" value="{escape(filters.get('date_to', ''))}"></label>
+        <button type="submit">Filter</button> <a href="{action}">Clear</a>
+    </form>
+    """
 
 def get_page_template(title, table_html):
     """Helper function to wrap the tables in a styled HTML page."""
@@ -350,7 +209,12 @@ def admin_dashboard():
             <h1>Rail Madad Admin Dashboard</h1>
             <p>Select a database to view:</p>
             <ul>
-                <li><a href="/view-complaints" style="font-size: 1.5em;">View Complaints Log</a></li>
+                <li><a href="/view-complaints" style="font-size: 1.5em;">View Complaints Log</a>
+                    (export as <a href="/export/complaints">CSV</a> or <a href="/export/complaints?format=jsonl">JSONL</a>)</li>
+                <li><a href="/export/queries" style="font-size: 1.5em;">Export Queries Log (CSV)</a></li>
+                <li><a href="/view-search" style="font-size: 1.5em;">Search Complaints</a></li>
+                <li><a href="/view-stats" style="font-size: 1.5em;">View Complaint Statistics</a>
+                    (<a href="/admin/stats">JSON</a>)</li>
                 <li><a href="/view-pnrs" style="font-size: 1.5em;">View PNR Database (Sample)</a></li>
                 <li><a href="/view-stations" style="font-size: 1.5em;">View Station Database (Sample)</a></li>
             </ul>
@@ -360,28 +224,135 @@ def admin_dashboard():
 
 @app.route('/view-complaints')
 def view_complaints():
-    """Shows the complaints table."""
-    query = "SELECT * FROM complaints ORDER BY timestamp DESC"
-    table_html = get_db_as_html_table(query, db_path)
-    return get_page_template("Complaints Log", table_html)
+    """Shows one page of the complaints table, newest first, with optional filters."""
+    try:
+        filters = complaints.parse_filters(request.args)
+        rows, has_older, has_newer = complaints.fetch_page(
+            get_connection(db_path), filters,
+            before=request.args.get('before'), after=request.args.get('after'),
+            limit=request.args.get('limit', default=complaints.DEFAULT_PAGE_SIZE, type=int)
+        )
+    except ValueError as e:
+        return get_page_template("Complaints Log", f"<p>Error: {escape(str(e))}</p>"), 400
+    except Exception as e:
+        return get_page_template("Complaints Log", f"<p>Error reading database: {escape(str(e))}.</p>")
+
+    links = []
+    if has_newer and rows:
+        links.append(f'<a href="/view-complaints?{urlencode({**filters, "after": complaints.encode_cursor(rows[0])})}">&larr; Newer</a>')
+    if has_older and rows:
+        links.append(f'<a href="/view-complaints?{urlencode({**filters, "before": complaints.encode_cursor(rows[-1])})}">Older &rarr;</a>')
+    pager = f"<p>{' | '.join(links)}</p>"
+    table_html = render_html_table(complaints.COLUMNS, rows) if rows else "<p>No complaints found in the log.</p>"
+    return get_page_template("Complaints Log", render_filter_form('/view-complaints', filters) + pager + table_html + pager)
+
+def export_table(table):
+    """Streams a table as CSV or JSONL (?format=csv|jsonl), optionally gzipped (?gzip=1)."""
+    fmt = request.args.get('format', 'csv').lower()
+    gzip = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    try:
+        filters = complaints.parse_filters(request.args)
+        export.check_export(table, fmt, filters)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    filename = f"{table}.{fmt}" + (".gz" if gzip else "")
+    return Response(
+        export.stream_export(db_path, table, fmt, filters, gzip=gzip),
+        mimetype='application/gzip' if gzip else export.FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.route('/export/complaints')
+def export_complaints():
+    """Streams the complaints table; accepts the same filters as /view-complaints."""
+    return export_table('complaints')
+
+@app.route('/export/queries')
+def export_queries():
+    """Streams the queries table; accepts the status and date range filters."""
+    return export_table('queries')
+
+@app.route('/admin/stats')
+def admin_stats():
+    """Complaint counts by department, station, hour and status, read from the rollup tables.
+
+    Filters by department, station and date range; other complaint filters get a 400.
+    """
+    try:
+        filters = complaints.parse_filters(request.args)
+        return jsonify(rollups.stats(get_connection(db_path), filters))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/view-stats')
+def view_stats():
+    """Shows the complaint rollups as tables."""
+    try:
+        filters = complaints.parse_filters(request.args)
+        stats = rollups.stats(get_connection(db_path), filters)
+    except ValueError as e:
+        return get_page_template("Complaint Statistics", f"<p>Error: {escape(str(e))}</p>"), 400
+    sections = [f"<p>Total complaints: <b>{stats['total']}</b></p>"]
+    for title, key in (("By Department", 'by_department'), ("By Status", 'by_status'),
+                       ("Top Stations", 'by_station'), ("By Hour", 'by_hour')):
+        sections.append(f"<h2>{title}</h2>" + render_html_table(('key', 'count'), stats[key]))
+    form = render_filter_form('/view-stats', filters, fields=('department', 'station'))
+    return get_page_template("Complaint Statistics", form + "".join(sections))
+
+@app.route('/admin/search')
+def admin_search():
+    """Ranked full-text search over complaints (?q=...), with the usual complaint filters."""
+    try:
+        filters = complaints.parse_filters(request.args)
+        results = search.search(get_connection(db_path), request.args.get('q', ''), filters,
+                                limit=request.args.get('limit', default=search.DEFAULT_LIMIT, type=int))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"query": request.args.get('q', ''), "results": results})
+
+@app.route('/view-search')
+def view_search():
+    """Search page for triage staff."""
+    query = request.args.get('q', '')
+    try:
+        filters = complaints.parse_filters(request.args)
+        results = search.search(get_connection(db_path), query, filters) if query else []
+    except ValueError as e:
+        return get_page_template("Search Complaints", f"<p>Error: {escape(str(e))}</p>"), 400
+    except Exception as e:
+        return get_page_template("Search Complaints", f"<p>Error searching complaints: {escape(str(e))}.</p>")
+    form = render_filter_form('/view-search', filters,
+                              extra_inputs=f'<label>Search <input name="q" value="{escape(query)}" size="30"></label> ')
+    columns = ('complaint_id', 'timestamp', 'department', 'station', 'pnr', 'status')
+    rows = "".join(
+        "<tr>" + "".join(f"<td>{escape(str(r[c] or ''))}</td>" for c in columns) + f"<td>{r['snippet']}</td></tr>"
+        for r in results
+    )
+    header = "".join(f"<th>{c}</th>" for c in columns) + "<th>match</th>"
+    table_html = (f'<table border="1" class="table table-striped"><thead><tr>{header}</tr></thead><tbody>{rows}</tbody></table>'
+                  if results else ("<p>No matching complaints.</p>" if query else ""))
+    return get_page_template("Search Complaints", form + table_html)
 
 @app.route('/view-pnrs')
 def view_pnrs():
     """Shows a sample of the PNR CSV."""
+    pnr_data = pnr_dataset.current
     if pnr_data is None:
         return "<p>Error: PNR data is not loaded.</p>"
-    table_html = pnr_data.head(100).reset_index().to_html(index=False, border=1, classes="table table-striped")
+    table_html = render_html_table(pnr_data.columns, pnr_data.head(100))
     return get_page_template("PNR Database (First 100 Rows)", table_html)
 
 @app.route('/view-stations')
 def view_stations():
     """Shows a sample of the Station CSV."""
-    if station_data_raw is None:
+    stations = station_dataset.current
+    if stations is None:
         return "<p>Error: Station data is not loaded.</p>"
-    table_html = station_data_raw.head(100).to_html(index=False, border=1, classes="table table-striped")
+    table_html = render_html_table(stations.columns, stations.rows[:100])
     return get_page_template("Station Database (First 100 Rows)", table_html)
 
-# --- 7. Run the Server ---
+# --- 5. Run the Server ---
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
@@ -0,0 +1,126 @@
+# backend/asgi.py
+"""ASGI entry point for the Dialogflow webhook.
+
+Serves the same POST /webhook contract (and /metrics) as the Flask app, using
+the same intent handlers (see handlers.py), without importing Flask:
+    * lookup-only intents (PNR, station, phone number...) run directly on the
+      event loop: they are in-memory index lookups taking microseconds;
+    * intents registered with writes=True run on a small thread pool, where they
+      wait on the group-commit writer without blocking the loop. So do the intents
+      that update the session store when it is shared through SESSION_STORE_DB
+      (see handlers.blocks).
+
+Run it with any ASGI server, e.g.:
+    pip install uvicorn
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+Concurrency limits (environment variables):
+    ASGI_MAX_IN_FLIGHT   webhook requests handled at once (default 256)
+    ASGI_QUEUE_TIMEOUT   seconds a request may wait for a slot before a 503 (default 2)
+    ASGI_DB_THREADS      threads running database-writing handlers (default 8)
+"""
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import handlers
+
+intent_registry = handlers.intent_registry
+
+MAX_IN_FLIGHT = int(os.environ.get('ASGI_MAX_IN_FLIGHT', 256))
+QUEUE_TIMEOUT = float(os.environ.get('ASGI_QUEUE_TIMEOUT', 2))
+DB_THREADS = int(os.environ.get('ASGI_DB_THREADS', 8))
+
+_db_executor = ThreadPoolExecutor(max_workers=DB_THREADS, thread_name_prefix='asgi-db')
+_slots = None   # asyncio.Semaphore, created on the server's event loop
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body', False):
+            return b''.join(chunks)
+
+
+async def _send(send, status, body, content_type=b'application/json'):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', content_type), (b'content-length', str(len(body)).encode())],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _send_json(send, payload, status=200):
+    await _send(send, status, json.dumps(payload).encode('utf-8'))
+
+
+async def handle_webhook(request_json):
+    """Dispatches one Dialogflow request. Returns the response dict."""
+    try:
+        intent_name = request_json['queryResult']['intent']['displayName']
+    except Exception:
+        return {"fulfillmentText": "Error: Invalid request."}
+
+    shed = handlers.admit(request_json, intent_name)
+    if shed is not None:
+        return shed
+    if handlers.blocks(intent_name):
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(_db_executor, intent_registry.dispatch, intent_name, request_json)
+    else:
+        response = intent_registry.dispatch(intent_name, request_json)
+    if response is None:
+        return {"fulfillmentText": "Error: Unrecognized intent in webhook."}
+    return response
+
+
+async def _webhook(receive, send):
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(MAX_IN_FLIGHT)
+    try:
+        await asyncio.wait_for(_slots.acquire(), QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        await _send_json(send, {"fulfillmentText": "The service is busy. Please try again in a moment."}, 503)
+        return
+    try:
+        try:
+            request_json = json.loads(await _read_body(receive) or b'null')
+        except ValueError:
+            request_json = None
+        await _send_json(send, await handle_webhook(request_json))
+    finally:
+        _slots.release()
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await asyncio.get_running_loop().run_in_executor(None, handlers.warm_up)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            _db_executor.shutdown(wait=True)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+    path, method = scope['path'], scope['method']
+    if path == '/webhook' and method == 'POST':
+        await _webhook(receive, send)
+    elif path == '/metrics' and method == 'GET':
+        body = intent_registry.metrics.render_prometheus() + handlers.render_session_metrics()
+        await _send(send, 200, body.encode('utf-8'), b'text/plain; version=0.0.4')
+    else:
+        # The admin pages and exports are served by the Flask app (python app.py / gunicorn app:app).
+        await _send_json(send, {"error": "Not found. This ASGI entry point serves /webhook and /metrics."}, 404)
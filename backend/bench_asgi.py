@@ -0,0 +1,186 @@
+# backend/bench_asgi.py
+"""Side-by-side load benchmark of the Flask and ASGI webhook modes.
+
+Usage:
+    python bench_asgi.py [--requests 20000] [--concurrency 64]
+    python bench_asgi.py --flask-url http://127.0.0.1:5000 --asgi-url http://127.0.0.1:8000
+
+In-process (default), Flask is driven through its test client from a thread pool
+and the ASGI app is called directly from asyncio tasks. With URLs, both servers
+are driven over HTTP with the same payloads and concurrency.
+
+Every request comes from its own session and phone number, so none is shed by the
+webhook's rate limits (see handlers.admit); any that are shed anyway are counted
+apart and left out of the latencies, as in bench_webhook.py. In-process runs write
+to a throwaway database; start servers under test with RAILMADAD_DB pointing at one.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# Before app is imported: handlers reads RAILMADAD_DB at import.
+os.environ.setdefault('RAILMADAD_DB', os.path.join(tempfile.mkdtemp(prefix='bench_asgi_'), 'bench.db'))
+
+import app as flask_app
+import asgi
+import webhook_fixtures
+from bench_webhook import outcome
+from handlers import SHED_RESPONSE
+
+SESSION = "projects/rail-madad/agent/sessions/bench"
+
+
+def replay_payloads(n):
+    """n Dialogflow requests shaped like production traffic, cycling through the intents.
+
+    Request i comes from session bench-i and phone number 9000000000 + i.
+    """
+    pnr_data = flask_app.pnr_dataset.current
+    known = pnr_data.head(1) if pnr_data is not None else []
+    first_pnr = known[0]['PNR'] if known else 'PNR0000000001'
+
+    def req(i, intent, params=None, query_text='', contexts=()):
+        session = f"{SESSION}-{i}"
+        return {"session": session, "queryResult": {
+            "queryText": query_text, "parameters": params or {}, "intent": {"displayName": intent},
+            "outputContexts": [{"name": f"{session}/contexts/{name}", "parameters": p} for name, p in contexts]}}
+
+    templates = [
+        lambda i, phone: req(i, 'provide_phone_number', query_text=f"{phone[:5]} {phone[5:]}"),
+        lambda i, phone: req(i, 'provide_station_name', {'station_input': 'agra cantt'}),
+        lambda i, phone: req(i, 'provide_station_name', {'station_input': 'adarsh nagar'}),
+        lambda i, phone: req(i, 'provide_location', {'latitude': 28.64, 'longitude': 77.22}),
+        lambda i, phone: req(i, 'user_confirms_station_yes',
+                             contexts=[('awaiting-station-confirmation', {'station_confirmed': 'agra cantt'})]),
+        lambda i, phone: req(i, 'provide_pnr', {'pnr_number': first_pnr[3:]}),
+        lambda i, phone: req(i, 'capture_complaint_description', {'complaint_text': 'toilet is dirty in coach B2'},
+                             contexts=[('awaiting-complaint-description', {'station_confirmed': 'agra cantt'}),
+                                       ('awaiting-location', {'phone_number': phone})]),
+        lambda i, phone: req(i, 'capture_user_query', {'user_query': 'when does the tatkal window open?'},
+                             contexts=[('awaiting-location', {'phone_number': phone})]),
+    ]
+    return [templates[i % len(templates)](i, str(9_000_000_000 + i)) for i in range(n)]
+
+
+def summarize(label, samples, elapsed):
+    """Prints throughput and the latency of requests that weren't shed; samples are (seconds, outcome)."""
+    latencies = sorted(seconds for seconds, result in samples if result != 'shed')
+    shed = len(samples) - len(latencies)
+    errors = sum(1 for _, result in samples if result == 'error')
+    if not latencies:
+        print(f"{label:<22} all {shed:,} requests were shed")
+        return
+    p = lambda q: latencies[min(int(len(latencies) * q), len(latencies) - 1)] * 1000
+    print(f"{label:<22} {len(latencies) / elapsed:9.0f} req/s  p50 {p(0.5):7.2f}ms  "
+          f"p95 {p(0.95):7.2f}ms  p99 {p(0.99):7.2f}ms  {errors:,} errors  {shed:,} shed")
+
+
+def run_threads(send_one, payloads, concurrency):
+    samples = []
+    lock = threading.Lock()
+
+    def one(payload):
+        t0 = time.perf_counter()
+        result = send_one(payload)
+        dt = time.perf_counter() - t0
+        with lock:
+            samples.append((dt, result))
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, payloads))
+    return samples, time.perf_counter() - t0
+
+
+def bench_flask_inprocess(payloads, concurrency):
+    local = threading.local()
+
+    def send_one(payload):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = flask_app.app.test_client()
+        resp = client.post('/webhook', json=payload)
+        return outcome(resp.status_code, resp.get_json(silent=True), SHED_RESPONSE)
+
+    return run_threads(send_one, payloads, concurrency)
+
+
+async def _asgi_call(payload):
+    body = json.dumps(payload).encode()
+    sent = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        sent.append(message)
+
+    await asgi.app({'type': 'http', 'path': '/webhook', 'method': 'POST', 'headers': []}, receive, send)
+    body = b''.join(m.get('body', b'') for m in sent[1:])
+    try:
+        reply = json.loads(body)
+    except ValueError:
+        reply = None
+    return outcome(sent[0]['status'], reply, SHED_RESPONSE)
+
+
+async def _bench_asgi(payloads, concurrency):
+    samples = []
+    queue = asyncio.Queue()
+    for payload in payloads:
+        queue.put_nowait(payload)
+
+    async def worker():
+        while not queue.empty():
+            payload = queue.get_nowait()
+            t0 = time.perf_counter()
+            result = await _asgi_call(payload)
+            samples.append((time.perf_counter() - t0, result))
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples, time.perf_counter() - t0
+
+
+def bench_http(url, payloads, concurrency):
+    def send_one(payload):
+        req = urllib.request.Request(f"{url.rstrip('/')}/webhook", data=json.dumps(payload).encode(),
+                                     headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(req, timeout=30) as resp:
+                return outcome(resp.status, json.loads(resp.read()), SHED_RESPONSE)
+        except (OSError, ValueError):
+            return 'error'
+
+    return run_threads(send_one, payloads, concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=20_000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--flask-url')
+    parser.add_argument('--asgi-url')
+    args = parser.parse_args()
+
+    payloads = replay_payloads(args.requests)
+    print(f"{args.requests:,} replayed Dialogflow requests, concurrency {args.concurrency}\n")
+    if args.flask_url or args.asgi_url:
+        for label, url in (('flask (http)', args.flask_url), ('asgi (http)', args.asgi_url)):
+            if url:
+                summarize(label, *bench_http(url, payloads, args.concurrency))
+    else:
+        summarize('flask (in-process)', *bench_flask_inprocess(payloads, args.concurrency))
+        # The same requests again would continue the Flask run's sessions, so the ASGI run gets its own.
+        payloads = webhook_fixtures.relabel(payloads, 'asgi')
+        summarize('asgi (in-process)', *asyncio.run(_bench_asgi(payloads, args.concurrency)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+# backend/bench_bulk.py
+"""Benchmarks bulk complaint ingestion (bulk.py) end to end.
+
+Usage:
+    python bench_bulk.py [--rows 200000] [--pnrs 1000000] [--formats csv jsonl] [--chunk-size 5000] [--no-dedup]
+
+A synthetic upload is generated in memory: PNR complaints (some with unknown PNRs),
+station complaints by name or code (some unknown), a few malformed rows, and
+incidents reported many times over. It is ingested into a fresh temp database
+with the full schema (indexes, FTS triggers, rollups) through the group-commit
+writer, and the results are encoded as the endpoint would stream them. Reports
+rows/s per format, then checks that the rollups and the search index agree
+with the complaints table.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from bench_categorizer import synthetic_complaints
+from bench_pnr_index import make_csv
+from pnr_index import PnrIndex, build_index
+
+FIELDS = ['complaint_text', 'pnr', 'station', 'phone_number', 'timestamp']
+
+
+def make_records(n, n_pnrs, stations, seed=1):
+    rng = random.Random(seed)
+    random.seed(seed)
+    texts = synthetic_complaints(20_000)
+    records = []
+    for i in range(n):
+        r = rng.random()
+        record = {'complaint_text': rng.choice(texts), 'phone_number': f"9{rng.randrange(10**9):09d}"}
+        if r < 0.65:
+            record['pnr'] = f"PNR{1000000000 + rng.randrange(n_pnrs) * 7:010d}"
+        elif r < 0.70:
+            record['pnr'] = f"PNR{1000000000 + rng.randrange(n_pnrs) * 7 + 3:010d}"   # not in the index
+        elif r < 0.95:
+            row = rng.choice(stations)
+            record['station'] = row['station'] if rng.random() < 0.7 else row['id_code']
+        elif r < 0.97:
+            record['station'] = "Nowhere Junction"
+        elif r < 0.98:
+            record['complaint_text'] = ""
+        else:
+            record['timestamp'] = "2026-10-16T09:30:00+05:30"
+            record['station'] = rng.choice(stations)['station']
+        records.append(record)
+    return records
+
+
+def encode(records, fmt):
+    if fmt == 'jsonl':
+        return "".join(json.dumps(r) + "\n" for r in records).encode('utf-8')
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, FIELDS)
+    writer.writeheader()
+    writer.writerows(records)
+    return buf.getvalue().encode('utf-8')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--pnrs', type=int, default=1_000_000)
+    parser.add_argument('--formats', nargs='+', default=['csv', 'jsonl'], choices=['csv', 'jsonl'])
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--memory', action='store_true', help="also trace peak memory (slower)")
+    parser.add_argument('--no-dedup', action='store_true', help="skip duplicate linking, as ?dedup=0 does")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['RAILMADAD_DB'] = os.path.join(tmp, 'bulk.db')
+        os.environ['DATASET_WATCH_INTERVAL'] = '0'
+        import bulk
+        import handlers
+        import rollups
+        from db import connect
+
+        make_csv(os.path.join(tmp, 'pnrs.csv'), args.pnrs)
+        build_index(os.path.join(tmp, 'pnrs.csv'), os.path.join(tmp, 'pnrs.bin'))
+        pnr_data = PnrIndex(os.path.join(tmp, 'pnrs.bin'))
+        stations = handlers.station_dataset.get()
+        writer, categorizer = handlers.get_db_writer(), handlers.get_categorizer()
+        duplicate_index = None if args.no_dedup else handlers.get_duplicate_index()
+        records = make_records(args.rows, args.pnrs, stations.rows)
+
+        print(f"\n{args.rows:,} rows per upload, chunks of {args.chunk_size:,}, {args.pnrs:,} PNRs indexed"
+              f"{', no duplicate linking' if args.no_dedup else ''}\n")
+        print(f"{'format':<7} {'MB':>6} {'seconds':>8} {'rows/s':>9} {'inserted':>9} {'duplicates':>11} {'errors':>7}"
+              + (f" {'peak MB':>8}" if args.memory else ""))
+        for fmt in args.formats:
+            body = encode(records, fmt)
+            summary = {}
+            if args.memory:
+                tracemalloc.start()
+            t0 = time.perf_counter()
+            results = bulk.ingest(bulk.read_records(io.BytesIO(body), fmt), writer, pnr_data=pnr_data,
+                                  stations=stations, categorizer=categorizer, duplicate_index=duplicate_index,
+                                  chunk_size=args.chunk_size, summary=summary)
+            out = sum(len(data) for data in bulk.encode_results(results, summary))
+            elapsed = time.perf_counter() - t0
+            peak = ""
+            if args.memory:
+                peak = f" {tracemalloc.get_traced_memory()[1] / 1e6:8.1f}"
+                tracemalloc.stop()
+            print(f"{fmt:<7} {len(body) / 1e6:6.1f} {elapsed:8.2f} {args.rows / elapsed:9,.0f} "
+                  f"{summary['inserted']:9,} {summary['duplicates']:11,} {summary['errors']:7,}{peak}")
+            assert out > 0
+
+        conn = connect(handlers.db_path)
+        complaints = conn.execute("SELECT COUNT(*) FROM complaints").fetchone()[0]
+        indexed = conn.execute("SELECT COUNT(*) FROM complaints_fts WHERE complaints_fts MATCH 'a* OR e* OR i* OR o* OR "
+                               "u* OR n* OR t* OR s* OR w* OR c* OR d* OR f* OR b* OR l* OR p* OR r* OR m* OR h*'"
+                               ).fetchone()[0]
+        mismatches = rollups.check(conn)
+        print(f"\nconsistency: {complaints:,} complaints, {indexed:,} found through the search index, "
+              f"{len(mismatches)} rollup mismatches")
+        conn.close()
+        pnr_data.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+# backend/bench_categorizer.py
+"""Throughput benchmark for complaint categorization.
+
+Usage:
+    python bench_categorizer.py [--complaints 1000000]
+
+Compares the original three-loop substring categorizer with the compiled
+Categorizer, one text at a time and through categorize_many.
+"""
+import argparse
+import os
+import random
+import time
+
+from categorizer import Categorizer
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+keywords_file_path = os.path.join(project_root, 'data', 'department_keywords.json')
+
+PHRASES = [
+    "the food served in the pantry car was cold", "tea was overpriced", "no water in the coach",
+    "toilet is dirty and stinks", "washroom not cleaned since morning", "platform is filthy",
+    "tte is demanding extra money", "ticketless passengers occupying my berth", "ac is not working",
+    "fan not working in coach b2", "the train is running late", "lights are off in the compartment",
+    "charging point broken", "someone stole my bag", "watched a passenger smoking",
+]
+
+
+def categorize_original(complaint_text):
+    """The categorizer as it was before the compiled engine, kept for comparison."""
+    text = complaint_text.lower()
+    food_keywords = ['food', 'overpriced', 'overcharged', 'irctc', 'pantry', 'water', 'tea', 'meal', 'catering', 'bad']
+    if any(keyword in text for keyword in food_keywords):
+        return "IRCTC Department"
+    cleaning_keywords = ['clean', 'dirty', 'filthy', 'hygiene', 'washroom', 'toilet', 'coach', 'stink', 'platform']
+    if any(keyword in text for keyword in cleaning_keywords):
+        return "Cleaning Department"
+    ticket_keywords = ['ticket', 'tc', 'tte', 'ticketless', 'no ticket', 'collector']
+    if any(keyword in text for keyword in ticket_keywords):
+        return "TICKET COLLECTOR Department"
+    return "General Operations"
+
+
+def synthetic_complaints(n):
+    return [" and ".join(random.sample(PHRASES, random.randint(1, 3))).capitalize() for _ in range(n)]
+
+
+def timed(label, n, fn):
+    t0 = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - t0
+    print(f"{label:<34} {elapsed:6.2f}s  {n / elapsed:10,.0f} complaints/s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--complaints', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    texts = synthetic_complaints(args.complaints)
+    categorizer = Categorizer.from_file(keywords_file_path)
+    n = len(texts)
+
+    timed("original (substring loops)", n, lambda: [categorize_original(t) for t in texts])
+    single = timed("compiled, categorize()", n, lambda: [categorizer.categorize(t) for t in texts])
+    batch = timed("compiled, categorize_many()", n, lambda: categorizer.categorize_many(texts))
+    assert single == batch, "categorize_many disagrees with categorize"
+
+
+if __name__ == '__main__':
+    main()
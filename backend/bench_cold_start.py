@@ -0,0 +1,100 @@
+# backend/bench_cold_start.py
+"""Measures cold-start import time and first-request latency of each webhook entry point.
+
+Usage:
+    python bench_cold_start.py [--entries main asgi app] [--runs 5]
+                               [--intents capture_user_query provide_pnr provide_station_name]
+
+Every run is a fresh interpreter (with a throwaway database and the dataset
+watcher off) that imports the entry point and serves one Dialogflow request:
+    main   the Cloud Function, called with a stand-in request object
+    asgi   the ASGI app, called directly (no lifespan warm-up, as on a cold start)
+    app    the Flask app, through its test client (it warms up while importing)
+Medians are reported; compile the datasets first (python datasets.py compile)
+to measure what a deploy would see.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+import webhook_fixtures
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CHILD = r'''
+import json, sys, time
+entry, payload = sys.argv[1], json.loads(sys.stdin.read())
+t0 = time.perf_counter()
+if entry == 'main':
+    import main
+    class Request:
+        def get_json(self, silent=False):
+            return payload
+    t1 = time.perf_counter()
+    main.dialogflow_webhook(Request())
+elif entry == 'asgi':
+    import asyncio
+    import asgi
+    t1 = time.perf_counter()
+    body = json.dumps(payload).encode()
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+    async def send(message):
+        pass
+    asyncio.run(asgi.app({'type': 'http', 'path': '/webhook', 'method': 'POST', 'headers': []}, receive, send))
+else:
+    import app
+    t1 = time.perf_counter()
+    app.app.test_client().post('/webhook', json=payload)
+t2 = time.perf_counter()
+print(json.dumps({'import_ms': (t1 - t0) * 1000, 'first_request_ms': (t2 - t1) * 1000}))
+'''
+
+
+def first_request_of(intent, sessions):
+    for session in sessions:
+        for request_json in session:
+            if request_json['queryResult']['intent']['displayName'] == intent:
+                return request_json
+    raise ValueError(f"No fixture for intent '{intent}'")
+
+
+def cold_run(entry, payload, db_dir):
+    env = dict(os.environ, RAILMADAD_DB=os.path.join(db_dir, f"{entry}.db"), DATASET_WATCH_INTERVAL='0')
+    proc = subprocess.run([sys.executable, '-c', CHILD, entry], input=json.dumps(payload), env=env,
+                          cwd=BACKEND_DIR, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError((proc.stderr.strip().splitlines() or ['failed'])[-1])
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', nargs='+', default=['main', 'asgi', 'app'], choices=['main', 'asgi', 'app'])
+    parser.add_argument('--intents', nargs='+', default=['capture_user_query', 'provide_pnr', 'provide_station_name'])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    sessions = webhook_fixtures.generate_sessions(200)
+    payloads = {intent: first_request_of(intent, sessions) for intent in args.intents}
+
+    print(f"{'entry':<6} {'first intent':<30} {'import ms':>10} {'request ms':>11} {'total ms':>9}")
+    for entry in args.entries:
+        for intent, payload in payloads.items():
+            try:
+                with tempfile.TemporaryDirectory() as db_dir:
+                    runs = [cold_run(entry, payload, db_dir) for _ in range(args.runs)]
+            except RuntimeError as e:
+                print(f"{entry:<6} {intent:<30} failed: {e}")
+                continue
+            import_ms = statistics.median(r['import_ms'] for r in runs)
+            request_ms = statistics.median(r['first_request_ms'] for r in runs)
+            print(f"{entry:<6} {intent:<30} {import_ms:10.1f} {request_ms:11.1f} {import_ms + request_ms:9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+# backend/bench_db_writes.py
+"""Load test for complaint inserts: connect-per-request vs. the group-commit writer.
+
+Usage:
+    python bench_db_writes.py [--threads 32] [--seconds 5]
+
+Each mode gets a fresh temp database with the complaints schema. N threads insert
+complaints as fast as they can for a fixed time; we report sustained inserts/sec,
+p50/p99 latency and the number of "database is locked" failures.
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from db import connect, get_writer
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS complaints (
+    complaint_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    phone_number TEXT,
+    pnr TEXT,
+    token TEXT,
+    station TEXT,
+    complaint_text TEXT NOT NULL,
+    department TEXT,
+    status TEXT DEFAULT 'Open',
+    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+'''
+INSERT = ("INSERT INTO complaints (phone_number, pnr, token, station, complaint_text, department) "
+          "VALUES (?, ?, ?, ?, ?, ?)")
+ROW = ('9876543210', 'PNR1234567890', 'N1P2R3', '', 'no water in coach B2', 'IRCTC Department')
+
+
+def insert_baseline(db_path):
+    """The old path: new connection, insert, commit (rollback-journal fsync), close."""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute(INSERT, ROW)
+    conn.commit()
+    new_id = cursor.lastrowid
+    conn.close()
+    return new_id
+
+
+def load(insert, threads, seconds):
+    latencies, errors = [], []
+    stop = time.monotonic() + seconds
+
+    def worker():
+        mine, failed = [], 0
+        while time.monotonic() < stop:
+            t0 = time.perf_counter()
+            try:
+                insert()
+            except sqlite3.OperationalError:
+                failed += 1
+                continue
+            mine.append(time.perf_counter() - t0)
+        latencies.extend(mine)
+        errors.append(failed)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    t0 = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+    p = lambda q: latencies[min(int(len(latencies) * q), len(latencies) - 1)] * 1000 if latencies else float('nan')
+    return len(latencies) / elapsed, p(0.5), p(0.99), sum(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base_db = os.path.join(tmp, 'baseline.db')
+        conn = sqlite3.connect(base_db)
+        conn.execute(SCHEMA)
+        conn.close()
+
+        group_db = os.path.join(tmp, 'group.db')
+        conn = connect(group_db)
+        conn.execute(SCHEMA)
+        conn.close()
+        writer = get_writer(group_db)
+
+        for label, insert in (('before (connect per insert)', lambda: insert_baseline(base_db)),
+                              ('after (WAL + group commit)', lambda: writer.execute(INSERT, ROW))):
+            rate, p50, p99, failed = load(insert, args.threads, args.seconds)
+            print(f"{label:<28} {rate:9.0f} inserts/s  p50 {p50:7.2f}ms  p99 {p99:7.2f}ms  locked errors {failed}")
+        print(f"group commit: {writer.jobs} inserts in {writer.batches} transactions "
+              f"({writer.jobs / max(writer.batches, 1):.1f} per commit)")
+        writer.close()
+
+
+if __name__ == '__main__':
+    main()
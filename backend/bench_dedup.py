@@ -0,0 +1,163 @@
+# backend/bench_dedup.py
+"""Benchmarks near-duplicate detection (dedup.py) on a simulated complaint stream.
+
+Usage:
+    python bench_dedup.py [--complaints 300000] [--rate 1000] [--window 90] [--incident-share 0.3]
+
+Complaints arrive at --rate per second of simulated time: background complaints
+spread over thousands of trains, plus incidents where dozens of passengers on one
+train report the same problem in their own words. Each one is categorized, then
+goes through what handle_complaint_logging does (signature, find, add), timed per
+complaint. A short --window keeps eviction busy; memory is measured once the index
+is full.
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from collections import deque
+
+import dedup
+from bench_categorizer import PHRASES, keywords_file_path, synthetic_complaints
+from categorizer import Categorizer
+
+FILLERS = ["please help", "since morning", "very bad", "urgent", "sir", "kindly look into it", "again", "!!"]
+COACHES = [f"{c}{n}" for c in "ABS" for n in range(1, 13)]
+
+
+def paraphrase(rng, base):
+    """The same complaint as another passenger might word it."""
+    words = base.split()
+    if len(words) > 4 and rng.random() < 0.5:
+        del words[rng.randrange(len(words))]
+    if rng.random() < 0.6:
+        words.insert(rng.randrange(len(words) + 1), rng.choice(FILLERS))
+    return " ".join(words).capitalize()
+
+
+def complaint_stream(n, rate, incident_share, seed=1):
+    """Yields (time, scope, text, incident id or None, problems); incidents are 20-60 reports over ~10 minutes.
+
+    problems is the set of PHRASES the complaint was made from.
+    """
+    rng = random.Random(seed)
+    random.seed(seed)
+    noise = synthetic_complaints(10_000)
+    active = []   # [incident_id, scope, base text, reports left, phrase]
+    next_incident = 0
+    for i in range(n):
+        now = i / rate
+        if rng.random() < incident_share:
+            if not active or (len(active) < 20 and rng.random() < 0.02):
+                phrase = rng.choice(PHRASES)
+                base = f"{phrase} in coach {rng.choice(COACHES)}"
+                active.append([next_incident, ('train', str(rng.randint(12001, 22999))), base, rng.randint(20, 60),
+                               frozenset([phrase])])
+                next_incident += 1
+            incident = rng.choice(active)
+            incident[3] -= 1
+            if incident[3] == 0:
+                active.remove(incident)
+            yield now, incident[1], paraphrase(rng, incident[2]), incident[0], incident[4]
+        else:
+            text = rng.choice(noise)
+            yield (now, ('train', str(rng.randint(12001, 22999))), text, None,
+                   frozenset(p for p in PHRASES if p in text.lower()))
+
+
+def percentile(sorted_values, p):
+    return sorted_values[min(int(len(sorted_values) * p / 100), len(sorted_values) - 1)]
+
+
+def true_similarity(a, b):
+    """Exact Jaccard similarity of two word sets, or 0.0 if they have too few words in common to match."""
+    if not a or not b or (len(a & b) < dedup.MIN_SHARED_WORDS and a != b):
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--complaints', type=int, default=300_000)
+    parser.add_argument('--rate', type=float, default=1000, help="complaints per second of simulated time")
+    parser.add_argument('--window', type=float, default=90, help="index window in seconds")
+    parser.add_argument('--incident-share', type=float, default=0.3)
+    args = parser.parse_args()
+
+    stream = list(complaint_stream(args.complaints, args.rate, args.incident_share))
+    departments = Categorizer.from_file(keywords_file_path).categorize_many([text for _, _, text, _, _ in stream])
+    stream = [(now, scope + (department,), text, incident, problems)
+              for (now, scope, text, incident, problems), department in zip(stream, departments)]
+    index = dedup.DuplicateIndex(window_seconds=args.window, max_entries=max(dedup.MAX_ENTRIES, int(args.window * args.rate) + 1))
+    latencies = []
+    links = []   # parent ID given to each complaint, or None
+
+    t_start = time.perf_counter()
+    for complaint_id, (now, scope, text, _, _) in enumerate(stream, 1):
+        t0 = time.perf_counter()
+        sig = dedup.signature(text)
+        match = index.find(scope, sig, now=now)
+        parent_id = match[0] if match else None
+        index.add(complaint_id, scope, sig, parent_id, now=now)
+        latencies.append(time.perf_counter() - t0)
+        links.append(parent_id)
+    elapsed = time.perf_counter() - t_start
+    latencies.sort()
+
+    # Accuracy against brute force: exact word-set similarity to every earlier complaint
+    # in the same scope and window. Margins of 0.1 around THRESHOLD leave out the pairs
+    # that MinHash's estimate can reasonably put on either side.
+    recent = {}                  # scope -> deque of (time, words)
+    should_link = linked_of_those = linked = linked_far_below = linked_elsewhere = 0
+    incident_repeats = incident_linked = 0
+    seen_incidents = set()
+    for (now, scope, text, incident, problems), parent_id in zip(stream, links):
+        words = dedup.words(text)
+        window = recent.setdefault(scope, deque())
+        while window and window[0][0] < now - args.window:
+            window.popleft()
+        best = max((true_similarity(words, other) for _, other in window), default=0.0)
+        window.append((now, words))
+        if best >= dedup.THRESHOLD + 0.1:
+            should_link += 1
+            linked_of_those += parent_id is not None
+        if parent_id is not None:
+            linked += 1
+            linked_far_below += best < dedup.THRESHOLD - 0.1
+            # Filed under the ticket of a complaint about none of the same problems.
+            linked_elsewhere += not problems & stream[parent_id - 1][4]
+        if incident is not None:
+            if incident in seen_incidents:
+                incident_repeats += 1
+                incident_linked += parent_id is not None
+            seen_incidents.add(incident)
+
+    print(f"{args.complaints:,} complaints at {args.rate:g}/s simulated, window {args.window:g}s, "
+          f"{len(seen_incidents):,} incidents\n")
+    print(f"throughput      {args.complaints / elapsed:10,.0f} complaints/s (target {args.rate:g}/s)")
+    print(f"latency         p50 {percentile(latencies, 50) * 1e6:.0f}us  p99 {percentile(latencies, 99) * 1e6:.0f}us  "
+          f"max {latencies[-1] * 1e6:.0f}us")
+    print(f"index           {len(index):,} entries after eviction")
+    print(f"recall          {linked_of_those / max(should_link, 1):7.1%} of complaints with an earlier one at "
+          f">= {dedup.THRESHOLD + 0.1:.1f} similarity were linked")
+    print(f"false links     {linked_far_below / max(linked, 1):7.1%} of links were to complaints below "
+          f"{dedup.THRESHOLD - 0.1:.1f} similarity")
+    print(f"wrong problem   {linked_elsewhere / max(linked, 1):7.1%} of links were to a ticket about "
+          f"a different problem")
+    print(f"incidents       {incident_linked / max(incident_repeats, 1):7.1%} of repeat reports linked "
+          f"(the rest differ from earlier reports by too many words)")
+
+    # Memory: refill a fresh index to its steady state under tracemalloc.
+    tracemalloc.start()
+    index = dedup.DuplicateIndex(window_seconds=args.window, max_entries=len(stream))
+    before = tracemalloc.get_traced_memory()[0]
+    steady = min(len(stream), int(args.window * args.rate))
+    for complaint_id, (now, scope, text, _, _) in enumerate(stream[:steady], 1):
+        index.add(complaint_id, scope, dedup.signature(text), now=now)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    print(f"memory          {used / 1e6:.1f} MB for {len(index):,} entries ({used / max(len(index), 1):.0f} bytes each)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+# backend/bench_nearest_station.py
+"""Benchmarks KD-tree nearest-station lookups against a linear haversine scan.
+
+Usage:
+    python bench_nearest_station.py [--queries 100000] [--k 3] [--stations 8000]
+
+Queries are random points inside India's bounding box. The linear scan is timed
+on a smaller sample (it is orders of magnitude slower) and used to check results.
+"""
+import argparse
+import csv
+import os
+import random
+import time
+
+from station_geo import NearestStationIndex, haversine_km
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+stations_file_path = os.path.join(project_root, 'data', 'stations_original.csv')
+
+LAT_RANGE = (8.0, 35.0)
+LON_RANGE = (68.0, 97.5)
+
+
+def random_point():
+    return random.uniform(*LAT_RANGE), random.uniform(*LON_RANGE)
+
+
+def linear_nearest(stations, lat, lon, k):
+    return sorted(haversine_km(lat, lon, float(r['latitude']), float(r['longitude'])) for r in stations)[:k]
+
+
+def run(rows, queries, k):
+    t0 = time.perf_counter()
+    index = NearestStationIndex(rows)
+    build_ms = (time.perf_counter() - t0) * 1000
+    print(f"\n=== {len(index):,} stations (KD-tree built in {build_ms:.0f}ms) ===")
+
+    points = [random_point() for _ in range(queries)]
+    t0 = time.perf_counter()
+    for lat, lon in points:
+        index.nearest(lat, lon, k)
+    elapsed = time.perf_counter() - t0
+    print(f"  kd-tree: {queries:,} queries in {elapsed:.2f}s ({elapsed / queries * 1e6:.1f}us/query)")
+
+    sample = points[:max(1, min(queries, 2000))]
+    t0 = time.perf_counter()
+    expected = [linear_nearest(index.stations, lat, lon, k) for lat, lon in sample]
+    elapsed = time.perf_counter() - t0
+    print(f"  linear : {len(sample):,} queries in {elapsed:.2f}s ({elapsed / len(sample) * 1e6:.1f}us/query)")
+
+    mismatches = sum(
+        1 for (lat, lon), want in zip(sample, expected)
+        if any(abs(got - w) > 1e-6 for (got, _), w in zip(index.nearest(lat, lon, k), want))
+    )
+    print(f"  mismatches vs linear scan: {mismatches}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--queries', type=int, default=100_000)
+    parser.add_argument('--k', type=int, default=3)
+    parser.add_argument('--stations', type=int, default=8000)
+    args = parser.parse_args()
+
+    with open(stations_file_path, newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    run(rows, args.queries, args.k)
+
+    # Synthetic stations scattered across the country, sized like the full IR list.
+    synthetic = [{'id_code': f"s{i}", 'station': f"station {i}", 'latitude': lat, 'longitude': lon}
+                 for i, (lat, lon) in enumerate(random_point() for _ in range(args.stations))]
+    run(synthetic, args.queries, args.k)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+# backend/bench_pnr_index.py
+"""Benchmarks the compiled PNR index against the old pandas DataFrame path.
+
+Usage:
+    python bench_pnr_index.py [--sizes 1000000 10000000] [--lookups 100000]
+
+For each size a synthetic PNR CSV is generated in a temp directory, then we time
+startup (pd.read_csv vs. build + mmap open) and per-lookup latency.
+"""
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time
+
+from pnr_index import PnrIndex, build_index
+
+
+def make_csv(path, n):
+    """Writes n synthetic PNR rows in the same shape as data/pnr_database.csv."""
+    with open(path, 'w', newline='') as f:
+        w = csv.writer(f)
+        w.writerow(['PNR', 'Train_No', 'Coach', 'Seat', 'Journey_Date'])
+        for i in range(n):
+            w.writerow([f"PNR{1000000000 + i * 7:010d}", random.randint(10000, 22999),
+                        f"S{random.randint(1, 12)}", random.randint(1, 72), '2026-10-16'])
+
+
+def lookup_sample(n, count):
+    """Returns PNRs to look up: half hits, half misses."""
+    hits = [f"PNR{1000000000 + random.randrange(n) * 7:010d}" for _ in range(count // 2)]
+    misses = [f"PNR{1000000000 + random.randrange(n) * 7 + 3:010d}" for _ in range(count - count // 2)]
+    sample = hits + misses
+    random.shuffle(sample)
+    return sample
+
+
+def bench_index(csv_path, index_path, sample):
+    t0 = time.perf_counter()
+    build_index(csv_path, index_path)
+    build_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    index = PnrIndex(index_path)
+    open_ms = (time.perf_counter() - t0) * 1000
+
+    t0 = time.perf_counter()
+    found = sum(1 for pnr in sample if index.get(pnr) is not None)
+    lookup_us = (time.perf_counter() - t0) / len(sample) * 1e6
+    index.close()
+    return {'build_s': build_s, 'startup_ms': open_ms, 'lookup_us': lookup_us, 'found': found,
+            'file_mb': os.path.getsize(index_path) / 1e6}
+
+
+def bench_pandas(csv_path, sample):
+    try:
+        import pandas as pd
+    except ImportError:
+        return None
+    t0 = time.perf_counter()
+    df = pd.read_csv(csv_path, index_col='PNR')
+    load_ms = (time.perf_counter() - t0) * 1000
+
+    t0 = time.perf_counter()
+    found = 0
+    for pnr in sample:
+        if pnr in df.index:
+            df.loc[pnr]['Train_No']
+            found += 1
+    lookup_us = (time.perf_counter() - t0) / len(sample) * 1e6
+    return {'startup_ms': load_ms, 'lookup_us': lookup_us, 'found': found,
+            'memory_mb': df.memory_usage(deep=True).sum() / 1e6}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000_000, 10_000_000])
+    parser.add_argument('--lookups', type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            csv_path = os.path.join(tmp, f"pnr_{n}.csv")
+            index_path = os.path.join(tmp, f"pnr_{n}.bin")
+            print(f"\n=== {n:,} PNRs ===")
+            make_csv(csv_path, n)
+            sample = lookup_sample(n, args.lookups)
+
+            idx = bench_index(csv_path, index_path, sample)
+            print(f"index : build {idx['build_s']:.1f}s, startup {idx['startup_ms']:.2f}ms, "
+                  f"lookup {idx['lookup_us']:.2f}us, file {idx['file_mb']:.1f}MB, hits {idx['found']}")
+
+            pdr = bench_pandas(csv_path, sample)
+            if pdr is None:
+                print("pandas: not installed, skipped")
+            else:
+                print(f"pandas: startup {pdr['startup_ms']:.0f}ms, lookup {pdr['lookup_us']:.2f}us, "
+                      f"memory {pdr['memory_mb']:.1f}MB per worker, hits {pdr['found']}")
+            os.remove(csv_path)
+            os.remove(index_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+# backend/bench_search.py
+"""Benchmarks FTS5 complaint search against LIKE '%...%' scans.
+
+Usage:
+    python bench_search.py [--complaints 1000000] [--repeat 5]
+
+Builds a temp database of synthetic complaints, indexes it with search.py, then
+times the same multi-word queries through /admin/search's code path and through
+a LIKE filter per word.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import complaints
+import search
+from bench_categorizer import synthetic_complaints
+from db import connect
+
+SCHEMA = '''
+CREATE TABLE complaints (
+    complaint_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    phone_number TEXT,
+    pnr TEXT,
+    token TEXT,
+    station TEXT,
+    complaint_text TEXT NOT NULL,
+    department TEXT,
+    status TEXT DEFAULT 'Open',
+    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+    parent_complaint_id INTEGER
+);
+'''
+# Selective queries like triage staff run (a train number narrows them), plus one very broad one.
+QUERIES = ["ac not working 12951", "dirty toilet 12627", "tte demanding money 22691", "charging point b2 12301",
+           "not working"]
+DEPARTMENTS = ["IRCTC Department", "Cleaning Department", "TICKET COLLECTOR Department", "General Operations"]
+
+
+def populate(conn, n):
+    texts = synthetic_complaints(min(n, 100_000))
+    rows = ((f"PNR{random.randint(1, 10**10):010d}",
+             f"{random.choice(texts)} on train {random.randint(12001, 22999)} coach "
+             f"{random.choice('ABSH')}{random.randint(1, 12)}",
+             random.choice(DEPARTMENTS),
+             f"2026-10-{random.randint(1, 28):02d} {random.randint(0, 23):02d}:00:00") for _ in range(n))
+    with conn:
+        conn.executemany("INSERT INTO complaints (pnr, complaint_text, department, timestamp) VALUES (?, ?, ?, ?)", rows)
+
+
+def like_search(conn, text, limit=search.DEFAULT_LIMIT):
+    words = text.split()
+    where = " AND ".join("complaint_text LIKE ?" for _ in words)
+    return conn.execute(f"SELECT {', '.join(complaints.COLUMNS)} FROM complaints WHERE {where} "
+                        f"ORDER BY timestamp DESC LIMIT ?", [f"%{w}%" for w in words] + [limit]).fetchall()
+
+
+def timed(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--complaints', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = connect(os.path.join(tmp, 'bench.db'))
+        conn.execute(SCHEMA)
+        t0 = time.perf_counter()
+        populate(conn, args.complaints)
+        print(f"inserted {args.complaints:,} complaints in {time.perf_counter() - t0:.1f}s")
+
+        t0 = time.perf_counter()
+        with conn:
+            search.create_index(conn)
+        print(f"built FTS index (migration of existing rows) in {time.perf_counter() - t0:.1f}s")
+
+        print(f"\n{'query':<26} {'matches':>8} {'fts5 (ms)':>10} {'LIKE (ms)':>10} {'fts5 + filter':>14}")
+        for q in QUERIES:
+            matches = conn.execute("SELECT COUNT(*) FROM complaints_fts WHERE complaints_fts MATCH ?",
+                                   (search.to_match_query(q),)).fetchone()[0]
+            fts_ms = timed(lambda: search.search(conn, q), args.repeat)
+            like_ms = timed(lambda: like_search(conn, q), args.repeat)
+            filtered_ms = timed(lambda: search.search(conn, q, {'department': 'Cleaning Department',
+                                                                'date_from': '2026-10-10', 'date_to': '2026-10-16'}),
+                                args.repeat)
+            print(f"{q:<26} {matches:8,} {fts_ms:10.1f} {like_ms:10.1f} {filtered_ms:14.1f}")
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+# backend/bench_sessions.py
+"""Benchmarks the session store and rate limiters (sessions.py) under a flood.
+
+Usage:
+    python bench_sessions.py [--sessions 50000] [--flooders 20] [--flood-rps 200] [--seconds 60]
+
+Simulates --seconds of webhook traffic: --sessions ordinary conversations taking a
+turn every few seconds, plus --flooders clients each sending --flood-rps complaint
+turns from one phone number, rotating sessions every 5 requests. Every request is
+admitted the way handlers.admit() does it (session bucket, then phone bucket for
+writes) and admitted turns read and update the session store. Reports the cost per
+request, how much of the flood was shed before reaching a handler, and how many
+ordinary turns were shed by mistake.
+"""
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+
+import sessions
+
+
+def percentile(sorted_values, p):
+    return sorted_values[min(int(len(sorted_values) * p / 100), len(sorted_values) - 1)]
+
+
+def traffic(n_sessions, flooders, flood_rps, seconds, seed=1):
+    """Yields (time, session, phone, writes, flood) in time order."""
+    rng = random.Random(seed)
+    events = []
+    for i in range(n_sessions):
+        t = rng.uniform(0, seconds)
+        phone = f"9{rng.randrange(10**9):09d}"
+        for turn in range(rng.randint(3, 7)):
+            events.append((t, f"s{i}", phone, turn >= 3, False))
+            t += rng.uniform(2, 10)
+    for f in range(flooders):
+        phone = f"8{f:09d}"
+        for k in range(int(flood_rps * seconds)):
+            events.append((k / flood_rps + rng.random() / flood_rps, f"f{f}-{k // 5}", phone, True, True))
+    events.sort()
+    return events
+
+
+def replay(events):
+    """Admits every request like handlers.admit(). Returns (store, limiters, per-request seconds, counts)."""
+    store = sessions.SessionStore()
+    session_limiter = sessions.RateLimiter(rate=2, burst=10)
+    phone_limiter = sessions.RateLimiter(rate=0.1, burst=5)
+    latencies = []
+    counts = {(flood, admitted): 0 for flood in (False, True) for admitted in (False, True)}
+    for now, session_id, phone, writes, flood in events:
+        t0 = time.perf_counter()
+        admitted = (session_limiter.allow(session_id, now=now)
+                    and (not writes or phone_limiter.allow(store.peek(session_id).get('phone_number', phone), now=now)))
+        if admitted:
+            store.get(session_id, now=now)
+            store.update(session_id, now=now, phone_number=phone)
+        latencies.append(time.perf_counter() - t0)
+        counts[flood, admitted] += 1
+    return store, {'session': session_limiter, 'phone': phone_limiter}, latencies, counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=50_000)
+    parser.add_argument('--flooders', type=int, default=20)
+    parser.add_argument('--flood-rps', type=float, default=200)
+    parser.add_argument('--seconds', type=float, default=60)
+    args = parser.parse_args()
+
+    events = traffic(args.sessions, args.flooders, args.flood_rps, args.seconds)
+    t_start = time.perf_counter()
+    store, limiters, latencies, counts = replay(events)
+    elapsed = time.perf_counter() - t_start
+    latencies.sort()
+
+    flood_total = counts[True, False] + counts[True, True]
+    normal_total = counts[False, False] + counts[False, True]
+    print(f"{len(events):,} requests over {args.seconds:g}s: {normal_total:,} ordinary, {flood_total:,} flood\n")
+    print(f"throughput      {len(events) / elapsed:10,.0f} requests/s")
+    print(f"per request     p50 {percentile(latencies, 50) * 1e6:.1f}us  p99 {percentile(latencies, 99) * 1e6:.1f}us")
+    print(f"flood shed      {counts[True, False] / max(flood_total, 1):7.1%} "
+          f"({counts[True, True]:,} flood requests reached a handler)")
+    print(f"ordinary shed   {counts[False, False] / max(normal_total, 1):7.1%}")
+    print(f"store           {store.stats()}")
+    for name, limiter in limiters.items():
+        print(f"{name + ' limiter':<15} {limiter.stats()}")
+
+    # Memory: the same replay again, under tracemalloc (latencies list excluded).
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    store, limiters, latencies, _ = replay(events)
+    used = tracemalloc.get_traced_memory()[0] - before - sys.getsizeof(latencies) - 24 * len(latencies)
+    tracemalloc.stop()
+    print(f"memory          {used / 1e6:.1f} MB for {len(store):,} sessions "
+          f"and {sum(len(l) for l in limiters.values()):,} buckets")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# backend/bench_station_index.py
+"""Benchmarks station search latency on the real list and a synthetic ~8k-station list.
+
+Usage:
+    python bench_station_index.py [--stations 8000] [--queries 5000]
+"""
+import argparse
+import os
+import random
+import string
+import time
+
+from station_index import StationIndex
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+stations_file_path = os.path.join(project_root, 'data', 'stations_original.csv')
+
+SUFFIXES = ['jn', 'road', 'halt', 'city', 'cantt', 'town', 'nagar', 'ganj', 'pur']
+
+
+def synthetic_stations(base, n):
+    """Grows the real list to n stations with plausible variant names and unique codes."""
+    rows = list(base)
+    codes = {r['id_code'] for r in rows}
+    while len(rows) < n:
+        src = random.choice(base)
+        name = f"{src['station'].split()[0]} {random.choice(SUFFIXES)} {random.choice(string.ascii_lowercase)}"
+        code = "".join(random.choices(string.ascii_lowercase, k=random.randint(2, 5)))
+        if code in codes:
+            continue
+        codes.add(code)
+        rows.append({**src, 'id_code': code, 'station': name})
+    return rows
+
+
+def typo(text):
+    """Applies one random deletion, swap or substitution."""
+    if len(text) < 4:
+        return text
+    i = random.randrange(1, len(text) - 1)
+    op = random.choice('dsr')
+    if op == 'd':
+        return text[:i] + text[i + 1:]
+    if op == 's':
+        return text[:i - 1] + text[i] + text[i - 1] + text[i + 1:]
+    return text[:i] + random.choice(string.ascii_lowercase) + text[i + 1:]
+
+
+def run(index, label, queries):
+    latencies = []
+    for q in queries:
+        t0 = time.perf_counter()
+        index.search(q)
+        latencies.append((time.perf_counter() - t0) * 1e6)
+    latencies.sort()
+    p = lambda q: latencies[min(int(len(latencies) * q), len(latencies) - 1)]
+    print(f"  {label:<7} p50 {p(0.5):7.1f}us  p95 {p(0.95):7.1f}us  p99 {p(0.99):7.1f}us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--stations', type=int, default=8000)
+    parser.add_argument('--queries', type=int, default=5000)
+    args = parser.parse_args()
+
+    base = StationIndex.from_csv(stations_file_path).stations
+    for rows in (base, synthetic_stations(base, args.stations)):
+        t0 = time.perf_counter()
+        index = StationIndex(rows)
+        print(f"\n=== {len(rows):,} stations (built in {(time.perf_counter() - t0) * 1000:.0f}ms) ===")
+        picks = [random.choice(rows) for _ in range(args.queries)]
+        run(index, 'code', [r['id_code'] for r in picks])
+        run(index, 'name', [r['station'] for r in picks])
+        run(index, 'prefix', [r['station'][:random.randint(3, len(r['station']))] for r in picks])
+        run(index, 'typo', [typo(r['station']) for r in picks])
+
+
+if __name__ == '__main__':
+    main()
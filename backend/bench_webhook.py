@@ -0,0 +1,271 @@
+# backend/bench_webhook.py
+"""Replays Dialogflow sessions against the webhook and reports per-intent latency.
+
+Usage:
+    python bench_webhook.py [--sessions 2000] [--rps 0] [--concurrency 16]
+                            [--fixtures webhook_fixtures.jsonl] [--url http://127.0.0.1:5000]
+                            [--repeat 5] [--out results.json] [--baseline baseline.json]
+                            [--tolerance 0.2] [--slack-ms 2]
+
+Requests come from webhook_fixtures.py (generated on the fly unless --fixtures is
+given). Without --url the Flask app is driven in-process through its test client,
+writing to a throwaway database; with --url a running server is driven over HTTP.
+
+Requests the webhook sheds (rate limits, see handlers.admit) are answered with a
+200 and a "slow down" reply. They are counted separately and left out of the
+latency figures, since no handler ran for them.
+
+--rps 0 sends as fast as --concurrency threads allow (closed loop). With a target
+rate, requests are scheduled at fixed intervals and each latency is measured from
+its scheduled send time, so a stalled server shows up as queueing delay instead
+of quietly lowering the request rate.
+
+The stream is replayed --repeat times (under fresh session names each time) and
+every latency and throughput figure reported is the median over the repetitions,
+so one noisy pass doesn't decide the result.
+
+With --baseline, the run fails (exit status 1) if throughput drops by more than
+--tolerance, more requests fail or are shed than in the baseline, or an intent's
+p95/p99 grows by more than --tolerance relative to the stored results and by
+more than --slack-ms in absolute terms (sub-millisecond percentiles jitter by
+far more than 20% on an unchanged build). Percentiles of intents with too few
+samples to estimate them are reported but not gated. Write a baseline with
+--out on a known-good build.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import webhook_fixtures
+
+PERCENTILES = (50, 95, 99)
+MIN_SAMPLES = 20   # intents with fewer samples per run (in the baseline or this run) are reported but not gated
+# A percentile is only gated if every repetition has this many samples above it
+# (p95 from 200 per run, p99 from 1,000): below that it is one or two stalls.
+MIN_TAIL_SAMPLES = 10
+
+
+def outcome(status, body, shed_response):
+    """'ok', 'shed' (answered with handlers.SHED_RESPONSE) or 'error'."""
+    if status != 200:
+        return 'error'
+    return 'shed' if body == shed_response else 'ok'
+
+
+def flask_sender():
+    """Sends through the Flask test client (one per thread), against a throwaway database."""
+    os.environ.setdefault('RAILMADAD_DB', os.path.join(tempfile.mkdtemp(prefix='bench_webhook_'), 'bench.db'))
+    import app as flask_app
+    from handlers import SHED_RESPONSE
+    local = threading.local()
+
+    def send(payload):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = flask_app.app.test_client()
+        resp = client.post('/webhook', json=payload)
+        return outcome(resp.status_code, resp.get_json(silent=True), SHED_RESPONSE)
+    return send
+
+
+def http_sender(url):
+    from handlers import SHED_RESPONSE
+    endpoint = f"{url.rstrip('/')}/webhook"
+
+    def send(payload):
+        req = urllib.request.Request(endpoint, data=json.dumps(payload).encode('utf-8'),
+                                     headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(req, timeout=30) as resp:
+                body = resp.read()
+                status = resp.status
+        except urllib.error.HTTPError:
+            return 'error'
+        try:
+            return outcome(status, json.loads(body), SHED_RESPONSE)
+        except ValueError:
+            return 'error'
+    return send
+
+
+def replay(send, stream, concurrency, rps=0):
+    """Sends every request; returns ([(intent, seconds, outcome)], elapsed seconds)."""
+    results = []
+    lock = threading.Lock()
+    start = time.perf_counter()
+
+    def one(i):
+        payload = stream[i]
+        # At a target rate, latency counts from when the request was due, not when a thread got to it.
+        due = start + i / rps if rps else time.perf_counter()
+        if rps:
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        try:
+            result = send(payload)
+        except Exception:
+            result = 'error'
+        elapsed = time.perf_counter() - due
+        with lock:
+            results.append((payload['queryResult']['intent']['displayName'], elapsed, result))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(len(stream))))
+    return results, time.perf_counter() - start
+
+
+def percentile(sorted_values, p):
+    return sorted_values[min(int(len(sorted_values) * p / 100), len(sorted_values) - 1)]
+
+
+def summarize(samples):
+    """Counts by outcome, and latencies of the requests that weren't shed (None if all were)."""
+    latencies = sorted(seconds for seconds, result in samples if result != 'shed')
+    summary = {'count': len(samples), 'errors': sum(1 for _, result in samples if result == 'error'),
+               'shed': len(samples) - len(latencies),
+               'mean_ms': sum(latencies) / len(latencies) * 1000 if latencies else None}
+    for p in PERCENTILES:
+        summary[f'p{p}_ms'] = percentile(latencies, p) * 1000 if latencies else None
+    return summary
+
+
+def median_of(summaries):
+    """Sums the counts of per-repetition summaries and takes the median of everything else."""
+    merged = {}
+    for key in summaries[0]:
+        values = [s[key] for s in summaries if s[key] is not None]
+        if key in ('count', 'errors', 'shed'):
+            merged[key] = sum(values)
+        else:
+            merged[key] = statistics.median(values) if values else None
+    return merged
+
+
+def build_report(runs, meta):
+    """Report over [(results, elapsed)], one per repetition: counts are totals, the rest medians."""
+    overall, by_intent = [], defaultdict(list)
+    for results, elapsed in runs:
+        samples = defaultdict(list)
+        for intent, seconds, result in results:
+            samples[intent].append((seconds, result))
+        for intent, intent_samples in samples.items():
+            by_intent[intent].append(summarize(intent_samples))
+        summary = summarize([(seconds, result) for _, seconds, result in results])
+        summary['throughput_rps'] = len(results) / elapsed
+        overall.append(summary)
+    return {'meta': meta, 'overall': median_of(overall),
+            'intents': {intent: median_of(summaries) for intent, summaries in sorted(by_intent.items())}}
+
+
+def print_report(report):
+    overall = report['overall']
+    print(f"\n{overall['count']:,} requests, {overall['throughput_rps']:.0f} req/s, {overall['errors']} errors, "
+          f"{overall['shed']} shed\n")
+    print(f"{'intent':<32} {'count':>7} {'errors':>7} {'shed':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for intent, s in list(report['intents'].items()) + [('(all)', overall)]:
+        ms = "".join(f" {s[f'p{p}_ms']:8.2f}" if s[f'p{p}_ms'] is not None else f" {'-':>8}" for p in PERCENTILES)
+        print(f"{intent:<32} {s['count']:7,} {s['errors']:7,} {s['shed']:7,}{ms}")
+    if overall['shed']:
+        print(f"\n⚠️  {overall['shed']:,} requests were shed by the webhook's rate limits; "
+              f"their latencies are left out above.")
+
+
+def regressions(report, baseline, tolerance, slack_ms=2.0):
+    """Returns a description of each metric that got worse than the baseline by more than tolerance.
+
+    A latency percentile only counts as worse if it also grew by more than slack_ms.
+    """
+    def per_run(results, intent):
+        """Latency samples (requests that weren't shed) per repetition."""
+        s = results['intents'][intent]
+        return (s['count'] - s.get('shed', 0)) / results['meta'].get('repeat', 1)
+
+    found = []
+    base_rps, rps = baseline['overall']['throughput_rps'], report['overall']['throughput_rps']
+    if rps < base_rps * (1 - tolerance):
+        found.append(f"throughput {rps:.0f} req/s < baseline {base_rps:.0f} req/s")
+    for key in ('errors', 'shed'):
+        if report['overall'][key] > baseline['overall'].get(key, 0):
+            found.append(f"{key} {report['overall'][key]} > baseline {baseline['overall'].get(key, 0)}")
+    for intent, base in baseline['intents'].items():
+        current = report['intents'].get(intent)
+        if current is None:
+            continue
+        samples = min(per_run(report, intent), per_run(baseline, intent))
+        if samples < MIN_SAMPLES:
+            continue
+        for p in (95, 99):
+            key = f'p{p}_ms'
+            if samples * (100 - p) / 100 < MIN_TAIL_SAMPLES or current[key] is None or base[key] is None:
+                continue
+            if current[key] > base[key] * (1 + tolerance) and current[key] - base[key] > slack_ms:
+                found.append(f"{intent} {key[:3]} {current[key]:.2f}ms > baseline {base[key]:.2f}ms")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=2000, help="sessions to generate (ignored with --fixtures)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--fixtures', help="JSONL written by webhook_fixtures.py")
+    parser.add_argument('--url', help="drive a running server instead of the in-process Flask app")
+    parser.add_argument('--rps', type=float, default=0, help="target request rate (0 = as fast as possible)")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--warmup', type=int, default=200, help="requests sent before measuring")
+    parser.add_argument('--repeat', type=int, default=5, help="replays of the stream; results are their medians")
+    parser.add_argument('--out', help="write the results as JSON")
+    parser.add_argument('--baseline', help="fail if the run regresses against these stored results")
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--slack-ms', type=float, default=2.0,
+                        help="latency growth (ms) below which a percentile never counts as a regression")
+    args = parser.parse_args()
+
+    sessions = (webhook_fixtures.load(args.fixtures) if args.fixtures
+                else webhook_fixtures.generate_sessions(args.sessions, seed=args.seed))
+    stream = webhook_fixtures.interleave(sessions)
+    send = http_sender(args.url) if args.url else flask_sender()
+
+    replay(send, webhook_fixtures.relabel(stream[:args.warmup], 'warmup'), args.concurrency)
+    print(f"Replaying {len(sessions):,} sessions ({len(stream):,} requests) {args.repeat} times "
+          f"{'over HTTP to ' + args.url if args.url else 'in-process'}, "
+          f"concurrency {args.concurrency}, {'target %g req/s' % args.rps if args.rps else 'unthrottled'}")
+    runs = [replay(send, webhook_fixtures.relabel(stream, f"run{r}") if r else stream, args.concurrency, args.rps)
+            for r in range(args.repeat)]
+    report = build_report(runs, {
+        'mode': 'http' if args.url else 'in-process', 'url': args.url, 'rps': args.rps,
+        'concurrency': args.concurrency, 'repeat': args.repeat, 'sessions': len(sessions), 'fixtures': args.fixtures,
+        'seed': None if args.fixtures else args.seed, 'time': time.strftime('%Y-%m-%dT%H:%M:%S')})
+    print_report(report)
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Results written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for key in ('mode', 'rps', 'concurrency', 'repeat'):
+            if baseline['meta'].get(key) != report['meta'][key]:
+                print(f"⚠️  Baseline was run with {key}={baseline['meta'].get(key)}, this run with {key}={report['meta'][key]}.")
+        found = regressions(report, baseline, args.tolerance, args.slack_ms)
+        if found:
+            print(f"\n❌ Regressed against {args.baseline} (tolerance {args.tolerance:.0%}, slack {args.slack_ms:g}ms):")
+            for line in found:
+                print(f"   {line}")
+            sys.exit(1)
+        print(f"\n✅ No regression against {args.baseline} (tolerance {args.tolerance:.0%}, slack {args.slack_ms:g}ms).")
+
+
+if __name__ == '__main__':
+    main()
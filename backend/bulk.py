@@ -0,0 +1,314 @@
+# backend/bulk.py
+"""Bulk complaint ingestion, for call centres and SMS gateways that send batches.
+
+Complaints are read as a stream of CSV or JSONL records with the fields
+    complaint_text (required), pnr or station, phone_number, token, timestamp
+and handled in chunks of CHUNK_SIZE, so memory stays flat whatever the upload size:
+    * each chunk is validated at once: every PNR in one sorted pass over the
+      PNR index (PnrIndex.get_many), stations against the station index;
+    * departments come from the same categorizer as the webhook;
+    * valid rows go to the group-commit writer as a single job: complaint IDs are
+      assigned up front, so near-duplicates are matched (see dedup.py), the rows
+      are staged with one executemany and inserted with one statement, and the
+      rollups are updated for the whole ID range, all in the writer's transaction.
+      The FTS triggers fire as for any insert. While one chunk is being written,
+      the next one is prepared.
+
+Every record gets a result, in input order: its complaint ID (and parent ticket,
+if it was filed as a duplicate) or the error that kept it out.
+
+Duplicate linking (signature, LSH lookups) takes about half of the time spent
+per row. Rows with a timestamp older than the duplicate window skip it anyway.
+Historical backfills can also switch it off for the whole upload (no duplicate
+index, or ?dedup=0 / --no-dedup); their rows are then all filed as 'Open'.
+
+Load a file from the command line (results go to stdout as JSONL):
+    python bulk.py ingest <complaints.csv|complaints.jsonl> [db_path] [--no-dedup]
+"""
+import csv
+import io
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+import dedup
+import rollups
+from pnr_index import key_to_pnr, pnr_to_key
+
+CHUNK_SIZE = 5000
+FORMATS = ('csv', 'jsonl')
+MAX_TEXT_LENGTH = 5000
+DEFAULT_DEPARTMENT = "General Operations"
+
+COLUMNS = ('complaint_id', 'phone_number', 'pnr', 'token', 'station', 'complaint_text',
+           'department', 'status', 'parent_complaint_id', 'timestamp')
+# Rows are staged in a temp table and moved into complaints with one INSERT ... SELECT.
+# Inserted one statement at a time inside the writer's savepoint, each row would make
+# the FTS index flush its pending terms, which gets slower as the index grows.
+STAGING_TABLE = (f"CREATE TEMP TABLE IF NOT EXISTS bulk_complaints ({', '.join(COLUMNS)})")
+STAGE = ("INSERT INTO temp.bulk_complaints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))")
+INSERT = (f"INSERT INTO main.complaints ({', '.join(COLUMNS)}) "
+          f"SELECT {', '.join(COLUMNS)} FROM temp.bulk_complaints ORDER BY complaint_id")
+# The ID AUTOINCREMENT would give the next complaint: past every ID ever used, even deleted ones.
+NEXT_ID = ("SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'complaints'), 0), "
+           "COALESCE((SELECT MAX(complaint_id) FROM complaints), 0)) + 1")
+
+
+def format_of(filename, content_type=None):
+    """Guesses the upload format from a file name or content type ('csv' or 'jsonl')."""
+    if content_type and ('csv' in content_type):
+        return 'csv'
+    if content_type and ('json' in content_type):
+        return 'jsonl'
+    return 'csv' if (filename or '').lower().endswith('.csv') else 'jsonl'
+
+
+def read_records(stream, fmt):
+    """Yields each record of a binary stream as a dict, or as an error string if it can't be parsed."""
+    if fmt not in FORMATS:
+        raise ValueError(f"'format' must be one of: {', '.join(FORMATS)}")
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='' if fmt == 'csv' else None)
+    if fmt == 'csv':
+        yield from csv.DictReader(text)
+        return
+    for line in text:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield f"Invalid JSON: {e}"
+            continue
+        yield record if isinstance(record, dict) else "Each line must be a JSON object"
+
+
+def _field(record, name):
+    value = record.get(name)
+    if type(value) is not str:
+        value = '' if value is None else str(value)
+    return value.strip()
+
+
+def _digits(value):
+    return value if value.isdigit() else "".join(filter(str.isdigit, value))
+
+
+def _token(pnr):
+    """A complaint token for a PNR, made the way the webhook makes them: its characters, shuffled."""
+    return "".join(random.sample(pnr, len(pnr)))
+
+
+def _parse_timestamp(value):
+    """'YYYY-MM-DD HH:MM:SS' in UTC (how SQLite stores CURRENT_TIMESTAMP) and its epoch seconds."""
+    dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt.strftime('%Y-%m-%d %H:%M:%S'), dt.replace(tzinfo=timezone.utc).timestamp()
+
+
+class _Chunk:
+    """One chunk of records: the results so far and the rows waiting to be inserted."""
+
+    def __init__(self, first_row):
+        self.first_row = first_row
+        self.results = []   # one dict per record, in input order
+        self.rows = []      # (result, column values, timestamp or None, dedup scope, signature)
+        self.future = None
+
+
+def prepare_chunk(records, first_row, pnr_data, stations, categorizer, station_cache, window_seconds, now):
+    """Validates and categorizes a chunk of records. Returns a _Chunk."""
+    chunk = _Chunk(first_row)
+    parsed = []   # (result, text, pnr, station, phone, token, timestamp, created)
+    for n, record in enumerate(records, first_row):
+        result = {'row': n}
+        chunk.results.append(result)
+        if type(record) is not dict:
+            result['error'] = record
+            continue
+        text, pnr, station = _field(record, 'complaint_text'), _field(record, 'pnr'), _field(record, 'station')
+        phone, timestamp = _field(record, 'phone_number'), _field(record, 'timestamp')
+        if not text:
+            result['error'] = "'complaint_text' is required"
+            continue
+        if len(text) > MAX_TEXT_LENGTH:
+            result['error'] = f"'complaint_text' is longer than {MAX_TEXT_LENGTH} characters"
+            continue
+        if not (pnr or station):
+            result['error'] = "A 'pnr' or a 'station' is required"
+            continue
+        if phone:
+            phone = _digits(phone)
+            if len(phone) != 10:
+                result['error'] = "'phone_number' must have 10 digits"
+                continue
+        if pnr:
+            # As in the webhook, a PNR complaint is about the train, not a station.
+            if not (len(pnr) == 13 and pnr.startswith('PNR') and pnr[3:].isdigit()):
+                key = pnr_to_key(pnr)
+                if key is None:
+                    result['error'] = f"Invalid PNR '{pnr}'"
+                    continue
+                pnr = key_to_pnr(key)
+            station = ''
+        created = now
+        if timestamp:
+            try:
+                timestamp, created = _parse_timestamp(timestamp)
+            except ValueError:
+                result['error'] = f"Invalid timestamp '{timestamp}'"
+                continue
+        parsed.append((result, text, pnr, station, phone, _field(record, 'token'), timestamp or None, created))
+
+    # Every PNR in the chunk in one sorted pass; station names through a cache kept for the upload.
+    pnrs = [row[2] for row in parsed if row[2]]
+    found = pnr_data.get_many(pnrs) if pnrs and pnr_data is not None else {}
+
+    def train_of(pnr):
+        return found[pnr].get('Train_No')
+
+    valid = []
+    for result, text, pnr, station, phone, token, timestamp, created in parsed:
+        if pnr:
+            if pnr not in found:
+                result['error'] = "PNR database is not loaded" if pnr_data is None else f"PNR {pnr} was not found"
+                continue
+            token = token or _token(pnr)
+        else:
+            canonical = station_cache.get(station, False)
+            if canonical is False:
+                match = stations.index.exact(station) if stations is not None else None
+                canonical = station_cache[station] = match.get('station') if match is not None else None
+            if canonical is None:
+                result['error'] = ("Station database is not loaded" if stations is None
+                                   else f"Unknown station '{station}'")
+                continue
+            station, token = canonical, ''
+        valid.append((result, text, pnr, station, phone, token, timestamp, created))
+
+    texts = [row[1] for row in valid]
+    departments = categorizer.categorize_many(texts) if categorizer is not None else [DEFAULT_DEPARTMENT] * len(texts)
+    signature, complaint_scope = dedup.signature, dedup.complaint_scope
+    for (result, text, pnr, station, phone, token, timestamp, created), department in zip(valid, departments):
+        result['department'] = department
+        # Complaints older than the duplicate window can't be linked to a recent ticket.
+        recent = now - created < window_seconds
+        chunk.rows.append((result, (phone, pnr, token, station, text, department), timestamp,
+                           complaint_scope(pnr, station, department, train_of=train_of) if recent else None,
+                           signature(text) if recent else None))
+    return chunk
+
+
+def insert_job(chunk, duplicate_index):
+    """The writer job inserting a chunk's valid rows. Returns [(complaint ID, parent ID), ...]."""
+    def job(cursor):
+        now = time.time()
+        first_id = cursor.execute(NEXT_ID).fetchone()[0]
+        ids = range(first_id, first_id + len(chunk.rows))
+        params, linked = [], []
+        try:
+            for complaint_id, (_, values, timestamp, scope, sig) in zip(ids, chunk.rows):
+                parent_id = duplicate_index.link(complaint_id, scope, sig, now) if duplicate_index is not None else None
+                params.append((complaint_id,) + values + ('Duplicate' if parent_id else 'Open', parent_id, timestamp))
+                linked.append((complaint_id, parent_id))
+            cursor.execute(STAGING_TABLE)
+            cursor.executemany(STAGE, params)
+            cursor.execute(INSERT)
+            cursor.execute("DELETE FROM temp.bulk_complaints")
+            rollups.record_complaints(cursor, ids[0], ids[-1])
+        except Exception:
+            # The insert is rolled back; so must the index entries made for it be.
+            if duplicate_index is not None:
+                duplicate_index.remove(ids)
+            raise
+        return linked
+    return job
+
+
+def _finish(chunk, summary):
+    """Fills in the results of a chunk once its insert is done. Returns them."""
+    if chunk.future is not None:
+        try:
+            linked = chunk.future.result()
+        except Exception as e:
+            print(f"❌ ERROR inserting rows {chunk.first_row}-{chunk.first_row + len(chunk.results) - 1}: {e}")
+            linked = None
+            for result, *_ in chunk.rows:
+                result.pop('department', None)
+                result['error'] = f"Insert failed: {e}"
+        for (result, *_), (complaint_id, parent_id) in zip(chunk.rows, linked or ()):
+            result['complaint_id'] = complaint_id
+            if parent_id:
+                result['parent_complaint_id'] = parent_id
+                summary['duplicates'] += 1
+            summary['inserted'] += 1
+    summary['rows'] += len(chunk.results)
+    summary['errors'] += sum(1 for r in chunk.results if 'error' in r)
+    return chunk.results
+
+
+def ingest(records, writer, pnr_data=None, stations=None, categorizer=None, duplicate_index=None,
+           chunk_size=CHUNK_SIZE, summary=None):
+    """Yields a result dict per record, in order. Counts go into summary (a dict), if given.
+
+    records is an iterable of dicts (or error strings, see read_records()). Up to
+    two chunks are in memory: one being inserted by the writer while the next is
+    prepared.
+    """
+    summary = summary if summary is not None else {}
+    summary.update(rows=0, inserted=0, duplicates=0, errors=0)
+    started = time.perf_counter()
+    window_seconds = duplicate_index.window_seconds if duplicate_index is not None else 0
+    station_cache = {}
+    pending = None
+    records = iter(records)
+    row = 1
+    while True:
+        batch = [r for _, r in zip(range(chunk_size), records)]
+        if not batch:
+            break
+        chunk = prepare_chunk(batch, row, pnr_data, stations, categorizer, station_cache, window_seconds, time.time())
+        row += len(batch)
+        if chunk.rows:
+            chunk.future = writer.submit(insert_job(chunk, duplicate_index))
+        if pending is not None:
+            yield from _finish(pending, summary)
+        pending = chunk
+    if pending is not None:
+        yield from _finish(pending, summary)
+    summary['seconds'] = round(time.perf_counter() - started, 3)
+
+
+def encode_results(results, summary):
+    """Yields JSONL bytes: one line per result, then a final {"summary": ...} line."""
+    batch = []
+    for result in results:
+        batch.append(json.dumps(result))
+        if len(batch) >= CHUNK_SIZE:
+            yield ("\n".join(batch) + "\n").encode('utf-8')
+            batch = []
+    batch.append(json.dumps({'summary': summary}))
+    yield ("\n".join(batch) + "\n").encode('utf-8')
+
+
+if __name__ == '__main__':
+    link_duplicates = '--no-dedup' not in sys.argv
+    args = [a for a in sys.argv if a != '--no-dedup']
+    if len(args) < 3 or args[1] != 'ingest':
+        print("Usage: python bulk.py ingest <complaints.csv|complaints.jsonl> [db_path] [--no-dedup]")
+        sys.exit(1)
+    if len(args) > 3:
+        os.environ['RAILMADAD_DB'] = args[3]
+    # handlers reads RAILMADAD_DB when imported, and brings the datasets and database with it.
+    import handlers
+    summary = {}
+    with open(args[2], 'rb') as f:
+        results = handlers.ingest_complaints(f, format_of(args[2]), summary, link_duplicates=link_duplicates)
+        for data in encode_results(results, summary):
+            sys.stdout.buffer.write(data)
+    print(f"✅ Ingested {args[2]} into {handlers.db_path}: {summary['inserted']} complaints "
+          f"({summary['duplicates']} duplicates), {summary['errors']} rows rejected, "
+          f"{summary['rows'] / max(summary['seconds'], 1e-9):,.0f} rows/s.", file=sys.stderr)
@@ -0,0 +1,160 @@
+# backend/categorizer.py
+"""Single-pass complaint categorizer.
+
+The department keyword tables (data/department_keywords.json) are compiled once
+into a single alternation regex. Each complaint is scanned once; every keyword
+hit adds its weight to its department's score and the highest score wins, with
+ties going to the department listed first.
+
+Keywords match at the start of a word: short ones (3 letters or fewer, like
+"tc" or "tea") must be the whole word, so "watch" no longer counts as a ticket
+complaint; longer ones also match inflections ("cleaning", "toilets").
+
+Most texts are not scanned with the regex at all: they are split on whitespace
+and each piece is looked up in a cache of the keywords the regex finds in it,
+which takes about a quarter less time. Words never span whitespace, so the hits
+are the same. Only texts containing a keyword with a space in it ("no ticket")
+take the full regex scan, where that phrase wins over the keywords inside it.
+
+Re-route the historical complaints table from the command line:
+    python categorizer.py recategorize [db_path] [keywords_path]
+"""
+import json
+import os
+import re
+import sys
+from itertools import chain
+
+import rollups
+from db import connect
+
+SHORT_KEYWORD = 3
+WORD_CACHE = 100_000   # words whose keyword hits are remembered; complaint vocabulary is small
+
+
+class _WordHits(dict):
+    """Whitespace-separated word -> tuple of the keywords found in it, filled in on first lookup."""
+
+    def __init__(self, findall):
+        super().__init__()
+        self._findall = findall
+
+    def __missing__(self, word):
+        if len(self) >= WORD_CACHE:
+            self.clear()
+        hits = self[word] = tuple(self._findall(word))
+        return hits
+
+
+class Categorizer:
+    """Compiled department keyword tables."""
+
+    def __init__(self, departments, default="General Operations"):
+        """departments: list of (name, keywords); a keyword is a string or a (keyword, weight) pair."""
+        self.default = default
+        self.departments = [name for name, _ in departments]
+        self._lookup = {}   # keyword -> (department index, weight); the first department listing it wins
+        for d, (_, keywords) in enumerate(departments):
+            for kw in keywords:
+                kw, weight = (kw, 1.0) if isinstance(kw, str) else (kw[0], float(kw[1]))
+                self._lookup.setdefault(kw.lower(), (d, weight))
+
+        # Longest first, so "no ticket" is preferred over "ticket" at the same position. Texts are
+        # lowercased before scanning: an IGNORECASE pattern is about three times slower.
+        words = sorted(self._lookup, key=len, reverse=True)
+        short = [re.escape(w) for w in words if len(w) <= SHORT_KEYWORD]
+        long = [re.escape(w) for w in words if len(w) > SHORT_KEYWORD]
+        if short:
+            long.append(f"(?:{'|'.join(short)})\\b")
+        # One capturing group, so findall returns the matched keywords as plain strings.
+        pattern = re.compile(r"\b(" + "|".join(long) + ")") if long else None
+        self._findall = pattern.findall if pattern else (lambda text: [])
+        self._phrases = [w for w in words if len(w.split()) > 1]
+        self._word_hits = _WordHits(self._findall).__getitem__   # word -> tuple of the keywords in it
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding='utf-8') as f:
+            config = json.load(f)
+        return cls([(d['name'], d['keywords']) for d in config['departments']],
+                   config.get('default', "General Operations"))
+
+    def _hits(self, text):
+        """The keywords found in a lowercased text, as the regex scan finds them."""
+        for phrase in self._phrases:
+            if phrase in text:
+                return self._findall(text)
+        return list(chain.from_iterable(map(self._word_hits, text.split())))
+
+    def _totals(self, hits):
+        totals = [0.0] * len(self.departments)
+        lookup = self._lookup
+        for kw in hits:
+            d, weight = lookup[kw]
+            totals[d] += weight
+        return totals
+
+    def scores(self, text):
+        """Returns {department: score} for one complaint."""
+        return dict(zip(self.departments, self._totals(self._hits(text.lower()))))
+
+    def categorize(self, text):
+        """Returns the department a complaint should be routed to."""
+        hits = self._hits(text.lower())
+        if not hits:
+            return self.default
+        if len(hits) == 1:
+            d, weight = self._lookup[hits[0]]
+            return self.departments[d] if weight > 0 else self.default
+        best, best_score = None, 0.0
+        for d, score in enumerate(self._totals(hits)):
+            if score > best_score:
+                best, best_score = d, score
+        return self.default if best is None else self.departments[best]
+
+    def categorize_many(self, texts):
+        """Categorizes an iterable of complaints, e.g. for re-routing the complaints table."""
+        categorize = self.categorize
+        return [categorize(text) for text in texts]
+
+
+def recategorize_complaints(db_path, categorizer, batch_size=10000):
+    """Re-routes every row of the complaints table. Returns the number of rows whose department changed.
+
+    The dashboard rollups are moved to the new departments in each batch's transaction.
+    """
+    conn = connect(db_path)
+    with conn:
+        rollups.create_tables(conn)
+    changed = 0
+    last_id = -1
+    while True:
+        rows = conn.execute(
+            "SELECT complaint_id, complaint_text, department FROM complaints WHERE complaint_id > ? "
+            "ORDER BY complaint_id LIMIT ?", (last_id, batch_size)).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        departments = categorizer.categorize_many(r[1] or '' for r in rows)
+        updates = [(dept, r[0]) for r, dept in zip(rows, departments) if dept != r[2]]
+        if not updates:
+            continue
+        first_changed, last_changed = updates[0][1], updates[-1][1]
+        with conn:
+            rollups.remove_complaints(conn, first_changed, last_changed)
+            conn.executemany("UPDATE complaints SET department = ? WHERE complaint_id = ?", updates)
+            rollups.record_complaints(conn, first_changed, last_changed)
+        changed += len(updates)
+    conn.close()
+    return changed
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] != 'recategorize':
+        print("Usage: python categorizer.py recategorize [db_path] [keywords_path]")
+        sys.exit(1)
+    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    db = sys.argv[2] if len(sys.argv) > 2 else os.path.join(project_root, 'railmadad.db')
+    keywords = sys.argv[3] if len(sys.argv) > 3 else os.path.join(project_root, 'data', 'department_keywords.json')
+    n = recategorize_complaints(db, Categorizer.from_file(keywords))
+    print(f"✅ Re-categorized complaints in {db}: {n} rows changed department.")
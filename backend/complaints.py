@@ -0,0 +1,117 @@
+# backend/complaints.py
+"""Filtered, keyset-paginated reads of the complaints table.
+
+Pages are ordered newest first on (timestamp, complaint_id) and fetched by
+seeking past the last row of the previous page instead of using OFFSET, so every
+page costs the same no matter how deep it is or how big the table grows. The
+indexes created by create_indexes() cover the unfiltered listing and each filter
+column.
+"""
+from datetime import datetime
+
+COLUMNS = ('complaint_id', 'phone_number', 'pnr', 'token', 'station',
+           'complaint_text', 'department', 'status', 'timestamp', 'parent_complaint_id')
+
+# Filters that compare a column for equality: request arg -> column.
+EQUALITY_FILTERS = {
+    'department': 'department',
+    'status': 'status',
+    'station': 'station',
+    'pnr': 'pnr',
+    'parent': 'parent_complaint_id',   # the duplicates linked to a ticket (see dedup.py)
+}
+
+INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_complaints_ts ON complaints (timestamp, complaint_id)",
+    "CREATE INDEX IF NOT EXISTS idx_complaints_department_ts ON complaints (department, timestamp, complaint_id)",
+    "CREATE INDEX IF NOT EXISTS idx_complaints_status_ts ON complaints (status, timestamp, complaint_id)",
+    "CREATE INDEX IF NOT EXISTS idx_complaints_station_ts ON complaints (station, timestamp, complaint_id)",
+    "CREATE INDEX IF NOT EXISTS idx_complaints_pnr_ts ON complaints (pnr, timestamp, complaint_id)",
+)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def create_indexes(cursor):
+    for sql in INDEXES:
+        cursor.execute(sql)
+
+
+def _parse_date(value, name):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d')
+    except ValueError:
+        raise ValueError(f"'{name}' must be a date like 2026-10-16")
+
+
+def parse_filters(args):
+    """Reads department/status/station/pnr/parent/date_from/date_to from request args. Empty values are ignored."""
+    filters = {}
+    for arg in EQUALITY_FILTERS:
+        value = (args.get(arg) or '').strip()
+        if value:
+            filters[arg] = value
+    for arg in ('date_from', 'date_to'):
+        value = (args.get(arg) or '').strip()
+        if value:
+            filters[arg] = _parse_date(value, arg)
+    return filters
+
+
+def filter_clause(filters, table=''):
+    """Returns (sql, params) for a WHERE clause matching the filters ('' if there are none)."""
+    prefix = f"{table}." if table else ''
+    conditions, params = [], []
+    for arg, column in EQUALITY_FILTERS.items():
+        if arg in filters:
+            conditions.append(f"{prefix}{column} = ?")
+            params.append(filters[arg])
+    if 'date_from' in filters:
+        conditions.append(f"{prefix}timestamp >= ?")
+        params.append(filters['date_from'])
+    if 'date_to' in filters:
+        # date_to is inclusive: everything before the start of the next day.
+        conditions.append(f"{prefix}timestamp < date(?, '+1 day')")
+        params.append(filters['date_to'])
+    return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+
+def encode_cursor(row):
+    """Page cursor for a row: '<timestamp>~<complaint_id>'."""
+    return f"{row['timestamp']}~{row['complaint_id']}"
+
+
+def decode_cursor(value):
+    timestamp, _, complaint_id = (value or '').rpartition('~')
+    if not timestamp or not complaint_id.isdigit():
+        raise ValueError("Invalid page cursor")
+    return timestamp, int(complaint_id)
+
+
+def fetch_page(conn, filters, before=None, after=None, limit=DEFAULT_PAGE_SIZE):
+    """Returns (rows, has_older, has_newer) for one page, newest first.
+
+    before/after are cursors from encode_cursor(): 'before' gives the next
+    (older) page, 'after' the previous (newer) one, and neither the first page.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    where, params = filter_clause(filters)
+    seek = after if after else before
+    if seek:
+        timestamp, complaint_id = decode_cursor(seek)
+        op = '>' if after else '<'
+        where += (" AND " if where else " WHERE ") + f"(timestamp, complaint_id) {op} (?, ?)"
+        params += [timestamp, complaint_id]
+    order = "ASC" if after else "DESC"
+    sql = (f"SELECT {', '.join(COLUMNS)} FROM complaints{where} "
+           f"ORDER BY timestamp {order}, complaint_id {order} LIMIT ?")
+    rows = [dict(zip(COLUMNS, r)) for r in conn.execute(sql, params + [limit + 1])]
+
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if after:
+        # Walked forwards in time to reach the newer page; show it newest first.
+        rows.reverse()
+        return rows, True, more
+    return rows, more, bool(before)
@@ -0,0 +1,461 @@
+# backend/datasets.py
+"""Hot-reloadable PNR and station datasets.
+
+Each dataset holds an immutable snapshot (the compiled PNR index, or the station
+rows with their search indexes). A reload builds and validates the new snapshot
+in the background and then swaps one reference, so:
+    * requests read `dataset.current` once and keep using that snapshot, even if
+      a reload lands halfway through (copy-on-write: nothing is ever mutated);
+    * a snapshot that fails to load or validate is discarded and the old one stays.
+
+Reloads are triggered by the file watcher (polling the source files every
+DATASET_WATCH_INTERVAL seconds) or by an admin request, optionally with a delta
+file that is merged into the current snapshot instead of reparsing everything.
+Every load records its time and the process's resident memory, see Dataset.history.
+An admin reload can also trace the heap the load allocates, at a heavy cost in load
+time, so it is only done on request.
+
+With several workers, one compiles a changed PNR CSV while the others wait on a lock
+file and then open the index it wrote.
+
+Short-lived processes (the Cloud Function, see main.py) instead load each dataset
+on first use with Dataset.get(), from its precompiled form. Compile both ahead of
+a deploy with:
+    python datasets.py compile
+"""
+import csv
+import hashlib
+import os
+import pickle
+import sys
+import threading
+import time
+from collections import deque, namedtuple
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:   # Windows: no compile lock, each worker compiles its own staging file
+    fcntl = None
+
+from pnr_index import PnrIndex, apply_delta, build_index
+
+HISTORY = 20   # loads remembered per dataset
+PNR_REQUIRED_COLUMNS = ('PNR', 'Train_No')
+STATION_REQUIRED_COLUMNS = ('id_code', 'station')
+
+Stations = namedtuple('Stations', 'columns rows index nearest')
+# Modules whose classes are pickled in the compiled stations file.
+STATION_MODULES = ('station_index.py', 'station_geo.py')
+_stations_format = None
+
+
+class Dataset:
+    """One reloadable dataset: the current snapshot plus how to (re)build it.
+
+    load(previous) returns a new snapshot; apply_delta(previous, delta_path) returns
+    one with the delta merged in. Both raise to reject the result.
+    """
+
+    def __init__(self, name, paths, load, apply_delta=None, size=len, mapped_bytes=None):
+        self.name = name
+        self.paths = paths          # files whose changes trigger a reload
+        self._load = load
+        self._apply_delta = apply_delta
+        self._size = size
+        self._mapped_bytes = mapped_bytes
+        self.current = None
+        self.version = 0
+        self.history = deque(maxlen=HISTORY)
+        self._signature = None
+        self._lock = threading.Lock()   # one reload at a time
+        self._first_load = threading.Lock()
+        # tracemalloc is process-wide: DatasetManager.add() shares one lock between its datasets.
+        self.trace_lock = threading.Lock()
+
+    def signature(self):
+        """(mtime, size) of every source file; a change means the dataset should be reloaded."""
+        sig = []
+        for path in self.paths:
+            try:
+                st = os.stat(path)
+                sig.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                sig.append(None)
+        return tuple(sig)
+
+    def get(self):
+        """The current snapshot, loading it first if nothing has been loaded yet (None if that fails)."""
+        if self._signature is None:
+            with self._first_load:
+                if self._signature is None:
+                    self.reload()
+        return self.current
+
+    def reload(self, delta_path=None, trace_memory=False):
+        """Builds, validates and swaps in a new snapshot. Returns the stats of this load.
+
+        On failure the current snapshot is kept and the stats carry the error.
+        trace_memory also measures the heap the load allocates with tracemalloc,
+        which makes a large load over ten times slower. Traced loads of all the
+        manager's datasets run one at a time, since they share the one tracer.
+        """
+        with self._lock:
+            if trace_memory:
+                with self.trace_lock:
+                    return self._reload(delta_path, trace_memory)
+            return self._reload(delta_path, trace_memory)
+
+    def _reload(self, delta_path, trace_memory):
+        previous = self.current
+        if trace_memory:
+            import tracemalloc
+            tracing = tracemalloc.is_tracing()
+            if not tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            heap_before = tracemalloc.get_traced_memory()[0]
+        rss_before = resident_bytes()
+        start = time.perf_counter()
+        stats = {'dataset': self.name, 'delta': delta_path,
+                 'started': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        try:
+            if delta_path:
+                if self._apply_delta is None or previous is None:
+                    raise ValueError(f"No {self.name} snapshot loaded to apply a delta to")
+                snapshot = self._apply_delta(previous, delta_path)
+            else:
+                snapshot = self._load(previous)
+        except Exception as e:
+            stats.update(ok=False, error=str(e), version=self.version)
+            self._signature = self.signature()   # don't retry until the files change again
+            print(f"❌ ERROR reloading {self.name} dataset: {e}")
+        else:
+            self.version += 1
+            self.current = snapshot   # the swap: one reference assignment
+            # Taken after the load, which may itself have rewritten the files (compiled index, merged delta).
+            self._signature = self.signature()
+            stats.update(ok=True, version=self.version, rows=self._size(snapshot))
+            if self._mapped_bytes:
+                stats['mapped_bytes'] = self._mapped_bytes(snapshot)
+            print(f"✅ {self.name} dataset v{self.version} loaded ({stats['rows']} rows).")
+        finally:
+            stats['load_seconds'] = round(time.perf_counter() - start, 4)
+            rss_after = resident_bytes()
+            if rss_after is not None:
+                # Includes the new snapshot's touched mmap pages; the old snapshot is freed later, if at all.
+                stats['rss_bytes'] = rss_after
+                stats['rss_delta_bytes'] = rss_after - rss_before
+            if trace_memory:
+                heap_after, heap_peak = tracemalloc.get_traced_memory()
+                if not tracing:
+                    tracemalloc.stop()
+                # Approximate: allocations by other threads during the load are counted too.
+                stats['heap_bytes'] = heap_after - heap_before
+                stats['heap_peak_bytes'] = heap_peak - heap_before
+        self.history.append(stats)
+        return stats
+
+    def reload_in_background(self, delta_path=None, on_done=None, trace_memory=False):
+        def run():
+            stats = self.reload(delta_path, trace_memory)
+            if on_done:
+                on_done(stats)
+        thread = threading.Thread(target=run, name=f"reload-{self.name}", daemon=True)
+        thread.start()
+        return thread
+
+    def changed(self):
+        return self.signature() != self._signature
+
+    def status(self):
+        return {'dataset': self.name, 'version': self.version, 'loaded': self.current is not None,
+                'rows': self._size(self.current) if self.current is not None else 0,
+                'paths': self.paths, 'history': list(self.history)}
+
+
+def resident_bytes():
+    """The process's resident set size, or None where /proc isn't available."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+@contextmanager
+def compile_lock(path):
+    """Holds an exclusive lock on `path`.lock, across processes, while one worker compiles `path`."""
+    if fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        yield   # closing the file releases the lock
+
+
+class DatasetManager:
+    """The datasets of one worker, plus the thread that polls their files for changes."""
+
+    def __init__(self):
+        self.datasets = {}
+        self.trace_lock = threading.Lock()   # serializes memory-traced loads, see Dataset.reload
+        self.watch_interval = 0
+        self._stop = threading.Event()
+        self._watcher = None
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def add(self, dataset):
+        self.datasets[dataset.name] = dataset
+        dataset.trace_lock = self.trace_lock
+        return dataset
+
+    def __getitem__(self, name):
+        return self.datasets[name]
+
+    def status(self):
+        return {name: d.status() for name, d in self.datasets.items()}
+
+    def watch(self, interval):
+        """Polls every dataset's files every `interval` seconds and reloads the ones that changed."""
+        self.watch_interval = interval
+        if interval <= 0 or (self._watcher is not None and self._watcher.is_alive()):
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._run, name='dataset-watcher', daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.watch_interval):
+            for dataset in list(self.datasets.values()):
+                if dataset.changed():
+                    dataset.reload()
+
+    def _after_fork(self):
+        # Threads don't survive fork (e.g. gunicorn --preload): restart the watcher in the child.
+        self._watcher = None
+        self.watch(self.watch_interval)
+
+
+def pnr_dataset(csv_path, index_path):
+    """The PNR dataset, served from the compiled index (see pnr_index.py).
+
+    A reload compiles the CSV (or merges a delta) into a staging file and only
+    moves it over the live index once it validates. Already-open snapshots keep
+    their mmap of the old file, which stays readable until they are dropped.
+    Compiling holds a lock file, so when every worker's watcher sees the same new
+    CSV, one compiles it and the rest open the result.
+    """
+    def validate(index):
+        missing = [c for c in PNR_REQUIRED_COLUMNS if c not in index.columns]
+        if missing:
+            raise ValueError(f"PNR index is missing columns: {', '.join(missing)}")
+        if len(index) == 0:
+            raise ValueError("PNR index is empty")
+        first = index.head(1)[0]
+        if index.get(first[index.key_column]) != first:
+            raise ValueError("PNR index lookup check failed")
+
+    def publish(staging_path):
+        index = PnrIndex(staging_path)
+        try:
+            validate(index)
+        except Exception:
+            index.close()
+            os.remove(staging_path)
+            raise
+        # The open mmap follows the file through the rename.
+        os.replace(staging_path, index_path)
+        index.path = index_path
+        return index
+
+    def up_to_date():
+        return os.path.exists(index_path) and not (
+            os.path.exists(csv_path) and os.path.getmtime(csv_path) > os.path.getmtime(index_path))
+
+    def open_index():
+        index = PnrIndex(index_path)
+        validate(index)
+        return index
+
+    def load(previous):
+        if up_to_date():
+            # e.g. another worker already compiled it, or merged a delta into it.
+            return open_index()
+        if not os.path.exists(csv_path):
+            raise FileNotFoundError(csv_path)
+        with compile_lock(index_path):
+            if up_to_date():
+                return open_index()   # compiled by the worker that held the lock
+            staging_path = f"{index_path}.{os.getpid()}.new"
+            stats = build_index(csv_path, staging_path)
+            print(f"✅ Compiled PNR index ({stats['count']} PNRs) to {index_path}")
+            return publish(staging_path)
+
+    def merge(previous, delta_path):
+        with compile_lock(index_path):
+            staging_path = f"{index_path}.{os.getpid()}.new"
+            stats = apply_delta(previous.path, delta_path, staging_path)
+            print(f"✅ Merged PNR delta: {stats['added']} added, {stats['replaced']} replaced, "
+                  f"{stats['deleted']} deleted, {stats['skipped']} skipped.")
+            return publish(staging_path)
+
+    return Dataset('pnr', [csv_path, index_path], load, merge,
+                   mapped_bytes=lambda index: os.path.getsize(index.path))
+
+
+def read_station_rows(csv_path):
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f, quotechar='"')
+        return reader.fieldnames or [], list(reader)
+
+
+def build_stations(columns, rows):
+    """Builds and validates the station lookup structures for a list of rows."""
+    missing = [c for c in STATION_REQUIRED_COLUMNS if c not in columns]
+    if missing:
+        raise ValueError(f"Station data is missing columns: {', '.join(missing)}")
+    if not rows:
+        raise ValueError("Station data is empty")
+    # Exact, prefix and typo-tolerant lookups (see station_index.py) and a KD-tree
+    # over the coordinates for location-based lookups (see station_geo.py).
+    from station_geo import NearestStationIndex
+    from station_index import StationIndex
+    index = StationIndex(rows)
+    nearest = NearestStationIndex(rows)
+    stations = Stations(list(columns), rows, index, nearest)
+    check_stations(stations)
+    return stations
+
+
+def check_stations(stations):
+    if stations.index.exact(stations.rows[0]['station']) is None:
+        raise ValueError("Station index lookup check failed")
+
+
+def stations_format():
+    """A hash of the code behind the pickled station indexes, saved with them.
+
+    A compiled file written by other versions of station_index.py or station_geo.py
+    would unpickle old object state into the new classes, so it is rebuilt instead.
+    """
+    global _stations_format
+    if _stations_format is None:
+        digest = hashlib.sha1(repr(Stations._fields).encode())
+        here = os.path.dirname(os.path.abspath(__file__))
+        for module in STATION_MODULES:
+            with open(os.path.join(here, module), 'rb') as f:
+                digest.update(f.read())
+        _stations_format = digest.hexdigest()
+    return _stations_format
+
+
+def save_stations(stations, compiled_path):
+    """Pickles built station indexes, so later loads skip building them."""
+    tmp_path = f"{compiled_path}.tmp{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        # The format goes first, in a pickle of its own, so a stale file is rejected before its objects are read.
+        pickle.dump(stations_format(), f, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(stations, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, compiled_path)
+
+
+def load_stations(compiled_path):
+    """Unpickles station indexes saved by save_stations(). Raises ValueError if they were built by other code."""
+    with open(compiled_path, 'rb') as f:
+        if pickle.load(f) != stations_format():
+            raise ValueError("compiled by a different version of the station index code")
+        return pickle.load(f)
+
+
+def compile_stations(csv_path, compiled_path):
+    """Builds the station indexes from the CSV and saves them to compiled_path. Returns the snapshot."""
+    stations = build_stations(*read_station_rows(csv_path))
+    save_stations(stations, compiled_path)
+    return stations
+
+
+def station_dataset(csv_path, compiled_path=None):
+    """The station dataset. A delta is merged by station code and written back to the CSV.
+
+    With compiled_path, the built indexes are also pickled there (about 3x faster
+    to load than rebuilding them) and used as long as they are newer than the CSV
+    and were built by the current code (see stations_format).
+    """
+    def load(previous):
+        if compiled_path and os.path.exists(compiled_path) and not (
+                os.path.exists(csv_path) and os.path.getmtime(csv_path) > os.path.getmtime(compiled_path)):
+            try:
+                stations = load_stations(compiled_path)
+                check_stations(stations)
+                return stations
+            except Exception as e:
+                print(f"❌ ERROR reading compiled stations {compiled_path}, rebuilding them: {e}")
+        stations = build_stations(*read_station_rows(csv_path))
+        if compiled_path:
+            try:
+                save_stations(stations, compiled_path)
+            except OSError:
+                pass   # e.g. a read-only deploy: serve the built indexes without caching them
+        return stations
+
+    def merge(previous, delta_path):
+        delta_columns, delta_rows = read_station_rows(delta_path)
+        missing = [c for c in previous.columns if c not in delta_columns]
+        if missing:
+            raise ValueError(f"Delta {delta_path} is missing columns: {', '.join(missing)}")
+        # The delta's rows replace every existing row with the same code (the data has a few
+        # duplicated codes); 'delete' rows just remove them. Other rows keep their order.
+        replacements = {}
+        for row in delta_rows:
+            code = row['id_code']
+            replacements.setdefault(code, [])
+            if (row.get('op') or '').strip().lower() != 'delete':
+                replacements[code].append({c: row[c] for c in previous.columns})
+        rows = []
+        placed = set()
+        for row in previous.rows:
+            code = row['id_code']
+            if code not in replacements:
+                rows.append(row)
+            elif code not in placed:
+                rows.extend(replacements[code])
+                placed.add(code)
+        for code, new_rows in replacements.items():
+            if code not in placed:
+                rows.extend(new_rows)
+        stations = build_stations(previous.columns, rows)
+        # Persist the merged list so restarts and the other workers (via their watchers) see it too.
+        tmp_path = f"{csv_path}.tmp{os.getpid()}"
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=stations.columns)
+            writer.writeheader()
+            writer.writerows(stations.rows)
+        os.replace(tmp_path, csv_path)
+        if compiled_path:
+            save_stations(stations, compiled_path)
+        return stations
+
+    return Dataset('stations', [csv_path], load, merge, size=lambda stations: len(stations.rows))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] != 'compile':
+        print("Usage: python datasets.py compile")
+        sys.exit(1)
+    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    data_dir = os.path.join(project_root, 'data')
+    pnr_csv = os.path.join(data_dir, 'pnr_database.csv')
+    if os.path.exists(pnr_csv):
+        result = build_index(pnr_csv, os.path.join(data_dir, 'pnr_index.bin'))
+        print(f"✅ Compiled PNR index: {result['count']} PNRs, {result['bytes']} bytes")
+    else:
+        print(f"❌ {pnr_csv} not found, PNR index not compiled.")
+    # Through the module, so the pickle refers to datasets.Stations rather than __main__.Stations.
+    import datasets
+    stations = datasets.compile_stations(os.path.join(data_dir, 'stations_original.csv'),
+                                         os.path.join(data_dir, 'stations_index.pickle'))
+    print(f"✅ Compiled station indexes: {len(stations.rows)} stations")
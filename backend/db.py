@@ -0,0 +1,187 @@
+# backend/db.py
+"""SQLite persistence layer: pooled WAL connections and a group-commit writer.
+
+Reads use one connection per thread (get_connection). Writes go through a single
+background GroupCommitWriter per process: requests that arrive within a few
+milliseconds of each other are committed together in one transaction (one fsync),
+and each caller still gets its own result back, e.g. the new row's lastrowid.
+Because only that one thread writes, workers in the same process never contend
+for the database lock.
+"""
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",       # readers don't block the writer and vice versa
+    "PRAGMA synchronous=NORMAL",     # with WAL: durable at checkpoints, no fsync per commit (see DURABLE_PRAGMAS)
+    "PRAGMA busy_timeout=5000",      # wait for other processes' writers instead of failing
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",      # 16 MB page cache per connection
+)
+
+# For the group-commit writer, which stores the complaints: with WAL, FULL syncs the log at
+# every commit, so a complaint whose ID the passenger was given survives a power cut. Under
+# NORMAL the commits since the last checkpoint can be lost. Group commit keeps it to one fsync
+# per batch rather than per complaint.
+DURABLE_PRAGMAS = ("PRAGMA synchronous=FULL",)
+
+_local = threading.local()
+
+
+def connect(db_path, durable=False):
+    """Opens a new connection with the tuned pragmas applied (and DURABLE_PRAGMAS, if durable)."""
+    conn = sqlite3.connect(db_path, timeout=5.0, check_same_thread=False)
+    for pragma in PRAGMAS + (DURABLE_PRAGMAS if durable else ()):
+        conn.execute(pragma)
+    return conn
+
+
+def get_connection(db_path):
+    """Returns this thread's pooled connection to db_path, opening it on first use."""
+    pool = getattr(_local, 'pool', None)
+    if pool is None or _local.pid != os.getpid():
+        # Connections must not be shared across a fork (e.g. gunicorn preload).
+        pool = _local.pool = {}
+        _local.pid = os.getpid()
+    conn = pool.get(db_path)
+    if conn is None:
+        conn = pool[db_path] = connect(db_path)
+    return conn
+
+
+class GroupCommitWriter:
+    """Background thread that batches write jobs into shared transactions.
+
+    A job is a callable taking a cursor; its return value is handed back to the
+    caller. Jobs submitted within max_delay seconds of the first one in a batch
+    (up to max_batch jobs) are committed together.
+    """
+
+    def __init__(self, db_path, max_batch=256, max_delay=0.002):
+        self.db_path = db_path
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.jobs = 0
+
+    def _ensure_started(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                # Threads don't survive a fork, so each worker process starts its own.
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, job):
+        """Queues job(cursor) and returns a Future for its result."""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((job, future))
+        return future
+
+    def run(self, job, timeout=30):
+        """Runs job(cursor) in the next group commit and waits for its result."""
+        return self.submit(job).result(timeout)
+
+    def execute(self, sql, params=(), timeout=30):
+        """Runs one INSERT/UPDATE in the next group commit and returns its lastrowid."""
+        def job(cursor):
+            cursor.execute(sql, params)
+            return cursor.lastrowid
+        return self.run(job, timeout)
+
+    def close(self, timeout=5):
+        """Flushes queued jobs and stops the writer thread."""
+        if self._thread is not None and self._pid == os.getpid():
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = None
+        while len(batch) < self.max_batch:
+            try:
+                if deadline is None:
+                    item = self._queue.get_nowait()
+                else:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                if deadline is None:
+                    # Nothing else waiting: linger briefly so a burst can share this commit.
+                    deadline = time.monotonic() + self.max_delay
+                    continue
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        conn = connect(self.db_path, durable=True)
+        conn.isolation_level = None  # we issue BEGIN/COMMIT ourselves
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch = self._collect(first)
+            results = []
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                cursor = conn.cursor()
+                for job, future in batch:
+                    # A savepoint per job, so one failing job doesn't roll back the others.
+                    cursor.execute("SAVEPOINT job")
+                    try:
+                        results.append((future, job(cursor), None))
+                        cursor.execute("RELEASE job")
+                    except Exception as e:
+                        cursor.execute("ROLLBACK TO job")
+                        cursor.execute("RELEASE job")
+                        results.append((future, None, e))
+                conn.execute("COMMIT")
+            except Exception as e:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.jobs += len(batch)
+            for future, result, error in results:
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+        conn.close()
+
+
+_writers = {}
+
+
+def get_writer(db_path):
+    """Returns the process-wide GroupCommitWriter for db_path."""
+    writer = _writers.get(db_path)
+    if writer is None:
+        writer = _writers.setdefault(db_path, GroupCommitWriter(db_path))
+    return writer
+
+
+@atexit.register
+def _close_writers():
+    for writer in _writers.values():
+        writer.close()
@@ -0,0 +1,293 @@
+# backend/dedup.py
+"""Near-duplicate complaint detection at ingest time.
+
+Each complaint gets a MinHash signature of its words. Recent complaints sit in an
+LSH index: the signature is cut into bands, and two complaints about the same
+train (or station) and routed to the same department that share any band are
+compared signature to signature. A new complaint whose estimated word overlap
+(Jaccard similarity) with a recent one is at least THRESHOLD, and which shares at
+least MIN_SHARED_WORDS of its words with it, is a duplicate: it is stored linked
+to the earlier complaint's parent ticket (complaints.parent_complaint_id) with
+status 'Duplicate'.
+
+Words nearly every complaint uses ("not working", "please help", "coach") are
+left out, so "AC not working" and "toilet not working" have nothing in common.
+Short complaints only match on MIN_SHARED_WORDS words, or if they are the same
+words, since one word more or less moves their similarity a long way.
+
+An insert costs one signature, BANDS dict lookups and at most MAX_CANDIDATES
+comparisons, however many complaints are indexed. Memory is bounded: entries
+expire after WINDOW_SECONDS and the oldest are evicted beyond MAX_ENTRIES.
+
+The index lives in each worker process and is warmed from the database at
+startup (see warm()), so with several workers the first report of an incident
+that reaches each worker opens its own parent ticket; later ones are linked.
+"""
+import re
+import threading
+import time
+from collections import deque
+from hashlib import blake2b
+
+NUM_PERM = 32            # MinHash values per signature (16-bit each, so one 64-byte BLAKE2b digest per word)
+BANDS = 16               # LSH bands of NUM_PERM // BANDS rows: pairs above ~0.3 similarity become candidates
+THRESHOLD = 0.6          # minimum estimated Jaccard similarity for a duplicate (estimates are within ~0.09)
+MIN_SHARED_WORDS = 2     # and the minimum estimated words in common, unless both have the same words
+WINDOW_SECONDS = 6 * 3600
+MAX_ENTRIES = 100_000
+MAX_CANDIDATES = 32      # comparisons per insert, so an incident's crowded buckets stay cheap
+WORD_CACHE = 100_000     # word hashes kept; complaint vocabulary is small, so most words hit
+
+_ROWS = NUM_PERM // BANDS
+
+WORD = re.compile(r'[a-z0-9]+')
+STOPWORDS = frozenset("""a an and are at be been but by for from has have i in is it its me my of on or our
+    since so that the there this to was we were with""".split()) | frozenset(
+    # Words that say nothing about which problem it is.
+    """again am being coach help into issue kindly look madam no not please problem sir train urgent very
+    working""".split())
+
+SCHEMA = (
+    "ALTER TABLE complaints ADD COLUMN parent_complaint_id INTEGER",
+    "CREATE INDEX IF NOT EXISTS idx_complaints_parent ON complaints (parent_complaint_id)",
+)
+
+
+def create_schema(cursor):
+    """Adds the parent_complaint_id column (to existing databases too) and its index."""
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(complaints)")}
+    if 'parent_complaint_id' not in columns:
+        cursor.execute(SCHEMA[0])
+    cursor.execute(SCHEMA[1])
+
+
+# Hash values are packed into one int, a 24-bit lane per value (16 value bits, then a
+# guard bit), so whole signatures are combined with a few int operations: subtracting
+# lane by lane leaves a lane's guard bit set where the first value is >= the second.
+# The number of words rides above the lanes, out of the way of the guard bit masks.
+_LANE = 24
+_COUNT_SHIFT = _LANE * NUM_PERM
+_GUARDS = sum(1 << (16 + _LANE * i) for i in range(NUM_PERM))
+_VALUES = sum(0xFFFF << (_LANE * i) for i in range(NUM_PERM))
+_ONES = sum(1 << (_LANE * i) for i in range(NUM_PERM))
+_word_hashes = {}
+
+
+def words(text):
+    return {w for w in WORD.findall(text.lower()) if w not in STOPWORDS}
+
+
+def _hash_word(w):
+    h = _word_hashes.get(w)
+    if h is None:
+        if len(_word_hashes) >= WORD_CACHE:
+            _word_hashes.clear()
+        digest = blake2b(w.encode('utf-8'), digest_size=NUM_PERM * 2).digest()
+        lanes = bytearray(NUM_PERM * 3)
+        lanes[0::3] = digest[0::2]
+        lanes[1::3] = digest[1::2]
+        h = _word_hashes[w] = int.from_bytes(lanes, 'little')
+    return h
+
+
+def signature(text):
+    """MinHash signature of the complaint's words (None if it has none), as a packed int.
+
+    Each word's BLAKE2b digest is read as NUM_PERM independent 16-bit hash values;
+    the signature keeps the minimum of each across the words, plus the number of words.
+    """
+    hashes = [_hash_word(w) for w in words(text)]
+    if not hashes:
+        return None
+    m = hashes[0]
+    for h in hashes[1:]:
+        first_ge = ((((m | _GUARDS) - h) & _GUARDS) >> 16) * 0xFFFF
+        m = (h & first_ge) | (m & (_VALUES ^ first_ge))
+    return m | min(len(hashes), 0xFFFF) << _COUNT_SHIFT
+
+
+def similarity(sig1, sig2):
+    """Estimated Jaccard similarity: the fraction of matching MinHash values."""
+    differing = (((sig1 ^ sig2) | _GUARDS) - _ONES) & _GUARDS   # guard bits of the non-zero lanes
+    return (NUM_PERM - differing.bit_count()) / NUM_PERM
+
+
+def matches(sig1, sig2, threshold=THRESHOLD):
+    """The estimated similarity if the two complaints are duplicates, else 0.0.
+
+    Words in common are estimated from the similarity J and the word counts
+    (|A & B| = J / (1 + J) * (|A| + |B|)).
+    """
+    score = similarity(sig1, sig2)
+    if score < threshold:
+        return 0.0
+    n1, n2 = sig1 >> _COUNT_SHIFT, sig2 >> _COUNT_SHIFT
+    if score == 1.0 and n1 == n2:
+        return score
+    return score if round(score / (1 + score) * (n1 + n2)) >= MIN_SHARED_WORDS else 0.0
+
+
+class DuplicateIndex:
+    """LSH index of recent complaint signatures, scoped by train or station and department."""
+
+    def __init__(self, window_seconds=WINDOW_SECONDS, max_entries=MAX_ENTRIES, threshold=THRESHOLD):
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self.threshold = threshold
+        # hash of (scope, band, band values) -> complaint id, or a list of ids (oldest first) once shared.
+        # Most buckets hold one complaint, so they cost a dict slot rather than a container each.
+        self._buckets = {}
+        self._entries = {}       # complaint_id -> (scope, signature, parent_id, created)
+        self._order = deque()    # complaint ids, oldest first
+        self._lock = threading.Lock()
+        self.duplicates = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _bucket_keys(scope, sig):
+        lanes = sig.to_bytes(NUM_PERM * 3 + 2, 'little')   # the bands only cover the lanes
+        step = _ROWS * 3
+        return [hash((scope, band, lanes[band * step:(band + 1) * step])) for band in range(BANDS)]
+
+    def _evict(self, now):
+        cutoff = now - self.window_seconds
+        order, entries = self._order, self._entries
+        while order and (len(order) > self.max_entries or order[0] not in entries
+                         or entries[order[0]][3] < cutoff):
+            self._unlink(order.popleft())
+
+    def _unlink(self, complaint_id):
+        entry = self._entries.pop(complaint_id, None)
+        if entry is None:
+            return   # already removed
+        buckets = self._buckets
+        for key in self._bucket_keys(entry[0], entry[1]):
+            bucket = buckets.get(key)
+            if bucket is None:
+                continue
+            if type(bucket) is int:
+                if bucket == complaint_id:
+                    del buckets[key]
+            elif complaint_id in bucket:
+                bucket.remove(complaint_id)   # usually the oldest, so at the front
+                if not bucket:
+                    del buckets[key]
+
+    def _find(self, scope, sig, keys):
+        best, best_score = None, self.threshold
+        checked = set()
+        for key in keys:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                continue
+            for complaint_id in ((bucket,) if type(bucket) is int else reversed(bucket)):   # newest first
+                if complaint_id in checked:
+                    continue
+                checked.add(complaint_id)
+                entry = self._entries[complaint_id]
+                # A different scope can only get here through a hash collision.
+                score = matches(sig, entry[1], self.threshold) if entry[0] == scope else 0.0
+                if score and score >= best_score:
+                    best, best_score = (complaint_id, entry), score
+                if len(checked) >= MAX_CANDIDATES or best_score == 1.0:
+                    break
+            if len(checked) >= MAX_CANDIDATES or best_score == 1.0:
+                break
+        if best is None:
+            return None
+        complaint_id, entry = best
+        return entry[2] or complaint_id, best_score
+
+    def _add(self, complaint_id, scope, sig, parent_id, now, keys):
+        if complaint_id in self._entries:
+            return
+        self._entries[complaint_id] = (scope, sig, parent_id, now)
+        self._order.append(complaint_id)
+        buckets = self._buckets
+        for key in keys:
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = complaint_id
+            elif type(bucket) is int:
+                buckets[key] = [bucket, complaint_id]
+            else:
+                bucket.append(complaint_id)
+        if parent_id:
+            self.duplicates += 1
+
+    def find(self, scope, sig, now=None):
+        """Returns (parent complaint ID, similarity) of the best recent match, or None."""
+        if sig is None or not scope:
+            return None
+        now = time.time() if now is None else now
+        keys = self._bucket_keys(scope, sig)
+        with self._lock:
+            self._evict(now)
+            return self._find(scope, sig, keys)
+
+    def add(self, complaint_id, scope, sig, parent_id=None, now=None):
+        """Indexes a stored complaint (with its parent ticket, if it is a duplicate)."""
+        if sig is None or not scope:
+            return
+        now = time.time() if now is None else now
+        keys = self._bucket_keys(scope, sig)
+        with self._lock:
+            self._add(complaint_id, scope, sig, parent_id, now, keys)
+            self._evict(now)
+
+    def link(self, complaint_id, scope, sig, now=None):
+        """find() and add() in one step, for a complaint whose ID is known before it is stored.
+
+        Returns the parent complaint ID, or None if the complaint isn't a duplicate.
+        """
+        if sig is None or not scope:
+            return None
+        now = time.time() if now is None else now
+        keys = self._bucket_keys(scope, sig)
+        with self._lock:
+            self._evict(now)
+            match = self._find(scope, sig, keys)
+            parent_id = match[0] if match else None
+            self._add(complaint_id, scope, sig, parent_id, now, keys)
+        return parent_id
+
+    def remove(self, complaint_ids):
+        """Unindexes complaints, e.g. ones added ahead of an insert that then failed."""
+        with self._lock:
+            for complaint_id in complaint_ids:
+                self._unlink(complaint_id)
+
+    def warm(self, conn, scope_of, limit=None):
+        """Indexes the complaints of the last window from the database, oldest first. Returns how many.
+
+        scope_of(pnr, station, department) gives a complaint's scope (see complaint_scope()).
+        """
+        limit = self.max_entries if limit is None else limit
+        rows = conn.execute(
+            "SELECT complaint_id, pnr, station, department, complaint_text, parent_complaint_id, "
+            "CAST(strftime('%s', timestamp) AS INTEGER) FROM complaints "
+            "WHERE timestamp >= datetime('now', ?) ORDER BY complaint_id DESC LIMIT ?",
+            (f"-{int(self.window_seconds)} seconds", limit)).fetchall()
+        for complaint_id, pnr, station, department, text, parent_id, created in reversed(rows):
+            self.add(complaint_id, scope_of(pnr, station, department), signature(text or ''), parent_id, now=created)
+        return len(rows)
+
+    def stats(self):
+        return {'entries': len(self._entries), 'buckets': len(self._buckets), 'duplicates': self.duplicates,
+                'window_seconds': self.window_seconds, 'max_entries': self.max_entries}
+
+
+def complaint_scope(pnr, station, department, train_of=None):
+    """What a complaint is about: ('train', number, department) for a PNR complaint,
+    ('station', name, department) otherwise.
+
+    train_of(pnr) looks up the PNR's train; without it (or if it fails) the PNR itself is the scope.
+    """
+    if pnr:
+        train = train_of(pnr) if train_of else None
+        return ('train', str(train), department) if train else ('pnr', pnr, department)
+    if station:
+        return ('station', station.strip().lower(), department)
+    return None
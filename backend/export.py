@@ -0,0 +1,93 @@
+# backend/export.py
+"""Streaming CSV/JSONL exports of the complaints and queries tables.
+
+Rows are read from a SQLite cursor in batches and encoded as they go, so memory
+stays flat and the first bytes go out immediately whatever the size of the export.
+"""
+import csv
+import io
+import json
+import zlib
+
+import complaints
+from db import connect
+
+TABLES = {
+    'complaints': {
+        'columns': complaints.COLUMNS,
+        'key': 'complaint_id',
+        'filters': set(complaints.EQUALITY_FILTERS) | {'date_from', 'date_to'},
+    },
+    'queries': {
+        'columns': ('query_id', 'query_text', 'status', 'timestamp'),
+        'key': 'query_id',
+        'filters': {'status', 'date_from', 'date_to'},
+    },
+}
+
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+BATCH_SIZE = 1000
+
+
+def check_export(table, fmt, filters):
+    """Raises ValueError if the table, format or any filter isn't supported."""
+    if table not in TABLES:
+        raise ValueError(f"Unknown table '{table}'")
+    if fmt not in FORMATS:
+        raise ValueError(f"'format' must be one of: {', '.join(FORMATS)}")
+    unsupported = set(filters) - TABLES[table]['filters']
+    if unsupported:
+        raise ValueError(f"Unsupported filter(s) for {table}: {', '.join(sorted(unsupported))}")
+
+
+def _encode_batches(rows_batches, columns, fmt):
+    """Yields encoded text for a header (CSV only) and then each batch of rows."""
+    if fmt == 'csv':
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(columns)
+        yield buf.getvalue()
+        for batch in rows_batches:
+            buf.seek(0)
+            buf.truncate()
+            writer.writerows(batch)
+            yield buf.getvalue()
+    else:
+        for batch in rows_batches:
+            yield "".join(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n" for row in batch)
+
+
+def stream_export(db_path, table, fmt='csv', filters=None, gzip=False):
+    """Generator of bytes for an export of table, oldest row first."""
+    filters = filters or {}
+    check_export(table, fmt, filters)
+    spec = TABLES[table]
+    where, params = complaints.filter_clause(filters)
+    sql = f"SELECT {', '.join(spec['columns'])} FROM {table}{where} ORDER BY {spec['key']}"
+
+    def batches():
+        # A dedicated connection: the generator outlives the request handler that created it.
+        conn = connect(db_path)
+        try:
+            cursor = conn.execute(sql, params)
+            while True:
+                batch = cursor.fetchmany(BATCH_SIZE)
+                if not batch:
+                    break
+                yield batch
+        finally:
+            conn.close()
+
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None  # wbits=31: gzip container
+    for text in _encode_batches(batches(), spec['columns'], fmt):
+        data = text.encode('utf-8')
+        if compressor is not None:
+            data = compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    if compressor is not None:
+        yield compressor.flush()
@@ -0,0 +1,534 @@
+# backend/handlers.py
+"""Dialogflow intent handlers, shared by every entry point.
+
+app.py (Flask), asgi.py and main.py (the Cloud Function) all serve the webhook
+from here. The module only imports what dispatching needs, so a cold start pays
+for the rest on the first request that uses it:
+    * the PNR and station datasets load on first lookup, from their precompiled
+      forms (see datasets.py);
+    * the database (sqlite3, table setup, the group-commit writer) and the
+      department categorizer are set up on the first write.
+Long-running servers call these up front instead (see app.py).
+"""
+import os
+import random
+import re
+import threading
+
+import datasets
+import sessions
+from intents import IntentRegistry
+
+# --- 1. Define Paths ---
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+pnr_file_path = os.path.join(project_root, 'data', 'pnr_database.csv')
+pnr_index_path = os.path.join(project_root, 'data', 'pnr_index.bin')
+stations_file_path = os.path.join(project_root, 'data', 'stations_original.csv')
+stations_compiled_path = os.path.join(project_root, 'data', 'stations_index.pickle')
+db_path = os.environ.get('RAILMADAD_DB', os.path.join(project_root, 'railmadad.db'))
+keywords_file_path = os.environ.get('DEPARTMENT_KEYWORDS_FILE',
+                                    os.path.join(project_root, 'data', 'department_keywords.json'))
+
+# --- 2. Datasets ---
+# PNRs and stations are reloadable snapshots (see datasets.py). Handlers read one
+# snapshot per request; a reload swaps in a new one without disturbing requests in flight.
+dataset_manager = datasets.DatasetManager()
+# PNRs are served from a compiled, memory-mapped index (see pnr_index.py),
+# so workers share pages and never hold the CSV in a DataFrame.
+pnr_dataset = dataset_manager.add(datasets.pnr_dataset(pnr_file_path, pnr_index_path))
+# Exact, prefix and typo-tolerant lookups plus a KD-tree over the coordinates.
+station_dataset = dataset_manager.add(datasets.station_dataset(stations_file_path, stations_compiled_path))
+
+# --- 3. Database and Categorizer (set up on first use) ---
+_setup_lock = threading.Lock()
+_db_writer = None
+_duplicate_index = None
+_categorizer = None
+_categorizer_loaded = False
+
+def setup_database():
+    """Creates the tables, indexes and triggers if they don't exist yet."""
+    # Imported here: only processes that write pay for sqlite3 and the writer thread.
+    from db import connect
+    import complaints
+    import dedup
+    import rollups
+    import search
+    try:
+        # connect() also switches the database to WAL mode (see db.py)
+        conn = connect(db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS queries (
+            query_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            query_text TEXT NOT NULL,
+            status TEXT DEFAULT 'Open',
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+        ''')
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS complaints (
+            complaint_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            phone_number TEXT,
+            pnr TEXT,
+            token TEXT,
+            station TEXT,
+            complaint_text TEXT NOT NULL,
+            department TEXT, 
+            status TEXT DEFAULT 'Open',
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+        ''')
+        # Links near-duplicate complaints to their parent ticket (see dedup.py)
+        dedup.create_schema(cursor)
+        # Indexes behind the paginated, filtered complaints log (see complaints.py)
+        complaints.create_indexes(cursor)
+        # Per-department/station/hour and per-status counts for the stats dashboard (see rollups.py)
+        rollups.create_tables(cursor)
+        print("✅ Database tables checked/created successfully.")
+        conn.commit()
+        try:
+            # Full-text index over complaint text, kept in sync by triggers (see search.py)
+            search.create_index(cursor)
+            conn.commit()
+            print("✅ Complaint search index checked/created successfully.")
+        except Exception as e:
+            print(f"❌ ERROR setting up complaint search (is FTS5 available?): {e}")
+        conn.close()
+    except Exception as e:
+        print(f"❌ ERROR setting up database: {e}")
+
+def get_db_writer():
+    """The group-commit writer every insert goes through, setting up the database on first use."""
+    global _db_writer
+    if _db_writer is None:
+        with _setup_lock:
+            if _db_writer is None:
+                from db import get_writer
+                setup_database()
+                _db_writer = get_writer(db_path)
+    return _db_writer
+
+def get_duplicate_index():
+    """The index of recent complaints that near-duplicates are matched against (see dedup.py)."""
+    global _duplicate_index
+    if _duplicate_index is None:
+        with _setup_lock:
+            if _duplicate_index is None:
+                import dedup
+                _duplicate_index = dedup.DuplicateIndex()
+    return _duplicate_index
+
+def get_categorizer():
+    """The department categorizer (see categorizer.py), loaded on first use; None if it failed to load."""
+    global _categorizer, _categorizer_loaded
+    if not _categorizer_loaded:
+        with _setup_lock:
+            if not _categorizer_loaded:
+                from categorizer import Categorizer
+                try:
+                    # Department keyword tables, compiled once into a single regex
+                    _categorizer = Categorizer.from_file(keywords_file_path)
+                    print("✅ Department keywords loaded successfully.")
+                except Exception as e:
+                    print(f"❌ ERROR loading department keywords: {e}")
+                _categorizer_loaded = True
+    return _categorizer
+
+def warm_up():
+    """Sets up the database and loads the datasets and categorizer now, for long-running servers.
+
+    Also starts the dataset file watcher (every DATASET_WATCH_INTERVAL seconds, 0 = off).
+    """
+    get_db_writer()
+    pnr_dataset.reload()
+    station_dataset.reload()
+    dataset_manager.watch(float(os.environ.get('DATASET_WATCH_INTERVAL', 10)))
+    get_categorizer()
+    try:
+        from db import connect
+        conn = connect(db_path)
+        count = get_duplicate_index().warm(conn, complaint_scope)
+        conn.close()
+        print(f"✅ Duplicate detection warmed with {count} recent complaints.")
+    except Exception as e:
+        print(f"❌ ERROR warming duplicate detection: {e}")
+
+# --- 4. Sessions and Rate Limits ---
+# What earlier turns established (phone number, verified PNR and token, confirmed
+# station), kept server-side per Dialogflow session (see sessions.py). Set
+# SESSION_STORE_DB to a database path to share sessions between worker processes.
+session_store = sessions.SessionStore(
+    ttl=float(os.environ.get('SESSION_TTL', sessions.SESSION_TTL)),
+    max_entries=int(os.environ.get('SESSION_MAX', sessions.MAX_SESSIONS)),
+    backend=sessions.SqliteSessionBackend(os.environ['SESSION_STORE_DB']) if os.environ.get('SESSION_STORE_DB') else None)
+
+# Token buckets, per worker: every turn of a session, and every write (query or
+# complaint) by a phone number, however many sessions it comes from.
+session_limiter = sessions.RateLimiter(rate=float(os.environ.get('SESSION_RATE', 2)),
+                                       burst=int(os.environ.get('SESSION_BURST', 10)))
+phone_limiter = sessions.RateLimiter(rate=float(os.environ.get('PHONE_RATE', 0.1)),
+                                     burst=int(os.environ.get('PHONE_BURST', 5)))
+rate_limiters = {'session': session_limiter, 'phone': phone_limiter}
+
+SHED_RESPONSE = {"fulfillmentText": "You're sending messages too quickly. Please wait a moment and try again."}
+
+def context_parameters(request_json, name):
+    """Parameters of the named Dialogflow output context in the request, or None if it isn't there."""
+    for c in request_json['queryResult'].get('outputContexts', []):
+        if c['name'].endswith(f"/contexts/{name}"):
+            return c.get('parameters', {})
+    return None
+
+def admit(request_json, intent_name):
+    """Applies the rate limits before any handler runs. Returns the reply for a shed request, or None."""
+    session_id = request_json.get('session')
+    if not session_limiter.allow(session_id):
+        return SHED_RESPONSE
+    if intent_name in intent_registry.writers:
+        phone_number = (session_store.peek(session_id).get('phone_number')
+                        or (context_parameters(request_json, 'awaiting-location') or {}).get('phone_number'))
+        if not phone_limiter.allow(phone_number):
+            return SHED_RESPONSE
+    return None
+
+# Intents whose handlers update the session store. With a shared backend that is a
+# SQLite read and write, which can wait on a busy database like any other write.
+SESSION_INTENTS = frozenset({'provide_phone_number', 'user_confirms_station_yes', 'provide_pnr'})
+
+def blocks(intent_name):
+    """Whether the intent's handler may wait on SQLite, so async servers run it off the event loop."""
+    return intent_name in intent_registry.writers or (session_store.backend is not None and intent_name in SESSION_INTENTS)
+
+def session_stats():
+    return {'store': session_store.stats(), 'limiters': {n: l.stats() for n, l in rate_limiters.items()}}
+
+def render_session_metrics():
+    """Session store and rate limiter counters of this worker, in Prometheus text format."""
+    return sessions.render_prometheus(session_store, rate_limiters)
+
+# --- 5. Intent Handlers ---
+
+# Handlers register here by intent name; dispatch is timed and counted per intent (see intents.py).
+# Under gunicorn, set METRICS_DIR to a shared directory so /metrics covers every worker.
+intent_registry = IntentRegistry(metrics_dir=os.environ.get('METRICS_DIR'))
+
+STATION_SUGGESTIONS = 5  # max station chips offered when there's no exact match
+NEAREST_STATIONS = 3     # stations offered after a location share
+
+@intent_registry.handler('capture_user_query', writes=True)
+def handle_query_intent(request_json):
+    """Handles the 'capture_user_query' intent."""
+    user_query_text = request_json['queryResult']['parameters']['user_query']
+    new_query_id = get_db_writer().execute("INSERT INTO queries (query_text) VALUES (?)", (user_query_text,))
+    response_text = f"Thank you. Your query has been registered with ID: Q-{new_query_id}."
+    return {"fulfillmentText": response_text}
+
+@intent_registry.handler('provide_phone_number')
+def handle_phone_number(request_json):
+    """Handles the 'provide_phone_number' intent."""
+    raw_input = request_json['queryResult'].get('queryText', '')
+    digits = re.findall(r'\d', raw_input)
+    phone_number_str = "".join(digits)
+    
+    if len(phone_number_str) == 10:
+        session_store.update(request_json.get('session'), phone_number=phone_number_str)
+        return {
+            "fulfillmentText": "Thank you. Where is the issue occurring? Please select one:",
+            "outputContexts": [
+                {
+                    "name": f"{request_json['session']}/contexts/awaiting-location",
+                    "lifespanCount": 1,
+                    "parameters": {"phone_number": phone_number_str}
+                }
+            ],
+            "payload": {
+                "richContent": [
+                    [
+                        {
+                            "type": "chips",
+                            "options": [
+                                {"text": "On a Train"},
+                                {"text": "On a Platform"}
+                            ]
+                        }
+                    ]
+                ]
+            }
+        }
+    else:
+        return {"fulfillmentText": "That doesn't seem to be a valid 10-digit number. Please try again."}
+
+@intent_registry.handler('provide_station_name')
+def handle_station_search(request_json):
+    """Handles the 'provide_station_name' intent."""
+    user_input = request_json['queryResult']['parameters'].get('station_input', '').lower().strip('"')
+    stations = station_dataset.get()
+    if stations is None:
+        return {"fulfillmentText": "Error: Station database is not loaded. Please contact support."}
+    
+    station_match = stations.index.exact(user_input)
+    
+    if station_match is not None:
+        original_station_name = station_match.get('station')
+        return {
+            "fulfillmentText": f"Did you mean '{original_station_name}'?",
+            "outputContexts": [
+                {
+                    "name": f"{request_json['session']}/contexts/awaiting-station-confirmation",
+                    "lifespanCount": 1,
+                    "parameters": {"station_confirmed": original_station_name}
+                }
+            ]
+        }
+
+    # No exact match: offer the closest stations as chips. Tapping one sends its
+    # exact name back through this intent, which then asks for confirmation.
+    candidates = stations.index.search(user_input, k=STATION_SUGGESTIONS)
+    if candidates:
+        return {
+            "fulfillmentText": "I couldn't find an exact match. Did you mean one of these stations?",
+            "payload": {
+                "richContent": [
+                    [
+                        {
+                            "type": "chips",
+                            "options": [{"text": row['station']} for _, row in candidates]
+                        }
+                    ]
+                ]
+            }
+        }
+    else:
+        return {"fulfillmentText": "Sorry, I couldn't find that station. Please try the name or code again."}
+
+def get_shared_location(request_json):
+    """Returns (latitude, longitude) from the intent parameters or the messenger payload, or None."""
+    params = request_json['queryResult'].get('parameters', {})
+    if params.get('latitude') not in (None, '') and params.get('longitude') not in (None, ''):
+        return params['latitude'], params['longitude']
+    location = request_json.get('originalDetectIntentRequest', {}).get('payload', {}).get('location', {})
+    if location.get('latitude') is not None and location.get('longitude') is not None:
+        return location['latitude'], location['longitude']
+    return None
+
+@intent_registry.handler('provide_location')
+def handle_location_shared(request_json):
+    """Handles the 'provide_location' intent (a shared lat/long instead of a station name)."""
+    stations = station_dataset.get()
+    if stations is None:
+        return {"fulfillmentText": "Error: Station database is not loaded. Please contact support."}
+    location = get_shared_location(request_json)
+    nearest = stations.nearest.nearest(*location, k=NEAREST_STATIONS) if location else []
+    if not nearest:
+        return {"fulfillmentText": "Sorry, I couldn't read your location. Please type the station name or code instead."}
+
+    distance_km, closest = nearest[0]
+    original_station_name = closest.get('station')
+    # Go straight to confirmation, as if the user had typed the closest station's name.
+    return {
+        "fulfillmentText": f"The nearest station is '{original_station_name}' ({distance_km:.1f} km away). Is that where the issue is?",
+        "outputContexts": [
+            {
+                "name": f"{request_json['session']}/contexts/awaiting-station-confirmation",
+                "lifespanCount": 1,
+                "parameters": {"station_confirmed": original_station_name}
+            }
+        ],
+        "payload": {
+            "richContent": [
+                [
+                    {
+                        "type": "chips",
+                        "options": [{"text": row['station']} for _, row in nearest[1:]]
+                    }
+                ]
+            ]
+        }
+    }
+
+@intent_registry.handler('user_confirms_station_yes')
+def handle_station_confirmed(request_json):
+    """Handles the 'user_confirms_station_yes' intent."""
+    try:
+        confirmed_station = "Unknown"
+        contexts = request_json['queryResult']['outputContexts']
+        for c in contexts:
+            if 'awaiting-station-confirmation' in c['name']:
+                confirmed_station = c['parameters']['station_confirmed']
+                break
+        session_store.update(request_json.get('session'), station=confirmed_station, pnr='', token='')
+        response_text = f"Great! Complaint at '{confirmed_station}'. Please describe your complaint (e.g., 'no water', 'dirty platform')."
+        return {
+            "fulfillmentText": response_text,
+            "outputContexts": [
+                {
+                    "name": f"{request_json['session']}/contexts/awaiting-complaint-description",
+                    "lifespanCount": 1,
+                    "parameters": {"station_confirmed": confirmed_station}
+                }
+            ]
+        }
+    except Exception as e:
+        intent_registry.log_error("handle_station_confirmed", e)
+        return {"fulfillmentText": "An error occurred. Please try again."}
+
+@intent_registry.handler('provide_pnr')
+def handle_pnr_verification(request_json):
+    """Handles the 'provide_pnr' intent."""
+    pnr_str = request_json['queryResult']['parameters'].get('pnr_number', '')
+    pnr_data = pnr_dataset.get()
+    if pnr_data is None:
+        return {"fulfillmentText": "Error: PNR database is not loaded. Please check server logs."}
+    try:
+        pnr_num_str = str(int(float(pnr_str)))
+        padded_pnr_num = pnr_num_str.zfill(10)
+        pnr_to_check = f"PNR{padded_pnr_num}"
+        
+        pnr_details = pnr_data.get(pnr_to_check)
+        if pnr_details is not None:
+            pnr_list = list(pnr_to_check)
+            random.shuffle(pnr_list)
+            token = "".join(pnr_list)
+
+            # Use the correct column name 'Train_No'
+            train_no = pnr_details['Train_No'] 
+            session_store.update(request_json.get('session'), pnr=pnr_to_check, token=token, station='')
+
+            response_text = f"PNR verified for Train {train_no}. Your complaint token is {token}. Please describe your complaint."
+            return {
+                "fulfillmentText": response_text,
+                "outputContexts": [
+                    {
+                        "name": f"{request_json['session']}/contexts/awaiting-complaint-description",
+                        "lifespanCount": 1,
+                        "parameters": {
+                            "complaint_token": token,
+                            "pnr": pnr_to_check
+                        }
+                    }
+                ]
+            }
+        else:
+            return {"fulfillmentText": "That PNR was not found in our records. Please try again."}
+    except Exception as e:
+        intent_registry.log_error("PNR check", e)
+        return {"fulfillmentText": "That doesn't seem to be a valid PNR. Please enter a 10-digit PNR."}
+
+def categorize_complaint(complaint_text):
+    """Analyzes complaint text to route it to a department."""
+    categorizer = get_categorizer()
+    if categorizer is None:
+        return "General Operations"
+    return categorizer.categorize(complaint_text)
+
+def train_of_pnr(pnr):
+    """The train number booked on a PNR, or None."""
+    pnr_data = pnr_dataset.get()
+    details = pnr_data.get(pnr) if pnr_data is not None else None
+    return details['Train_No'] if details else None
+
+def complaint_scope(pnr, station, department):
+    """Which complaints a complaint can duplicate: those about the same train, or the same station,
+    routed to the same department."""
+    import dedup
+    return dedup.complaint_scope(pnr, station, department, train_of=train_of_pnr)
+
+def insert_complaint(cursor, phone_number, pnr, token, station, complaint_text, department, parent_id=None):
+    """Inserts one complaint and updates the rollups in the same transaction. Returns its ID.
+
+    A near-duplicate is linked to its parent ticket and filed as 'Duplicate' instead of 'Open'.
+    """
+    import rollups
+    cursor.execute(
+        "INSERT INTO complaints (phone_number, pnr, token, station, complaint_text, department, status, parent_complaint_id) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (phone_number, pnr, token, station, complaint_text, department,
+         'Duplicate' if parent_id else 'Open', parent_id)
+    )
+    complaint_id = cursor.lastrowid
+    rollups.record_complaint(cursor, complaint_id)
+    return complaint_id
+
+@intent_registry.handler('capture_complaint_description', writes=True)
+def handle_complaint_logging(request_json):
+    """Handles the final 'capture_complaint_description' intent."""
+    try:
+        complaint_text = request_json['queryResult']['parameters'].get('complaint_text', '')
+        session_id = request_json.get('session')
+        # The request's contexts win; the session store fills in what has expired from them.
+        state = session_store.get(session_id)
+        params = context_parameters(request_json, 'awaiting-complaint-description')
+        if params is not None:
+            pnr = params.get('pnr', '')
+            token = params.get('complaint_token', '')
+            station = params.get('station_confirmed', '')
+        else:
+            pnr, token, station = state.get('pnr', ''), state.get('token', ''), state.get('station', '')
+        phone_number = ((context_parameters(request_json, 'awaiting-location') or {}).get('phone_number')
+                        or state.get('phone_number', ''))
+
+        department = categorize_complaint(complaint_text)
+        
+        if pnr:
+            station = ""
+        if station:
+            pnr = ""
+            token = ""
+
+        import dedup
+        scope = complaint_scope(pnr, station, department)
+        signature = dedup.signature(complaint_text)
+        duplicate_index = get_duplicate_index()
+
+        def log_complaint(cursor):
+            # Runs on the writer thread, so matching and indexing are serialized with the inserts.
+            match = duplicate_index.find(scope, signature)
+            parent_id = match[0] if match else None
+            complaint_id = insert_complaint(cursor, phone_number, pnr, token, station, complaint_text, department, parent_id)
+            duplicate_index.add(complaint_id, scope, signature, parent_id)
+            return complaint_id, parent_id
+
+        new_complaint_id, parent_id = get_db_writer().run(log_complaint)
+        # The conversation starts over; the phone number carries on to the next complaint.
+        session_store.update(session_id, pnr='', token='', station='')
+        if parent_id:
+            response_text = (f"Thank you. This issue has already been reported as complaint C-{parent_id}, "
+                             f"so we've added yours (ID: C-{new_complaint_id}) to it.")
+        else:
+            response_text = f"Thank you. Your complaint (ID: C-{new_complaint_id}) has been successfully routed to the {department}."
+        return {
+            "fulfillmentText": response_text,
+            "outputContexts": [] 
+        }
+    except Exception as e:
+        intent_registry.log_error("complaint logging", e)
+        return {"fulfillmentText": "Sorry, there was an error lodging your complaint. Please try again."}
+
+def ingest_complaints(stream, fmt, summary=None, link_duplicates=True):
+    """Bulk-loads complaints from a CSV or JSONL byte stream (see bulk.py). Yields a result per record.
+
+    Rows are validated against the current dataset snapshots, routed by the same
+    categorizer and, unless link_duplicates is off, linked to duplicates through
+    the same index as webhook complaints.
+    """
+    import bulk
+    return bulk.ingest(bulk.read_records(stream, fmt), get_db_writer(),
+                       pnr_data=pnr_dataset.get(), stations=station_dataset.get(), categorizer=get_categorizer(),
+                       duplicate_index=get_duplicate_index() if link_duplicates else None, summary=summary)
+
+# --- 6. Webhook Dispatch ---
+def handle_webhook(request_json):
+    """Routes one Dialogflow request to its intent handler. Returns the response dict."""
+    try:
+        intent_name = request_json['queryResult']['intent']['displayName']
+    except Exception:
+        return {"fulfillmentText": "Error: Invalid request."}
+
+    shed = admit(request_json, intent_name)
+    if shed is not None:
+        return shed
+    response = intent_registry.dispatch(intent_name, request_json)
+    if response is None:
+        return {"fulfillmentText": "Error: Unrecognized intent in webhook."}
+    return response
@@ -0,0 +1,91 @@
+# backend/intents.py
+"""Dialogflow intent registry.
+
+Handlers register themselves by intent display name with @intents.handler('name')
+and the webhook dispatches with one dict lookup. Every dispatch is timed and
+counted per intent (see metrics.py); an intent can also be put under the sampling
+profiler at runtime.
+"""
+import threading
+import time
+
+from metrics import Metrics, SamplingProfiler
+
+
+class IntentRegistry:
+    def __init__(self, metrics_dir=None):
+        self._handlers = {}
+        self.writers = set()   # intents whose handlers block on database writes
+        self._current = threading.local()
+        self.metrics = Metrics('railmadad_intent', 'intent', metrics_dir)
+        self.profiled_intent = None
+        self.profiler = None
+
+    def handler(self, intent_name, writes=False):
+        """Decorator registering a function as the handler for a Dialogflow intent.
+
+        Pass writes=True if the handler waits on a database write, so async servers
+        know to run it off the event loop.
+        """
+        def register(fn):
+            if intent_name in self._handlers:
+                raise ValueError(f"Intent '{intent_name}' already has a handler")
+            self._handlers[intent_name] = fn
+            if writes:
+                self.writers.add(intent_name)
+            return fn
+        return register
+
+    def __contains__(self, intent_name):
+        return intent_name in self._handlers
+
+    @property
+    def intents(self):
+        return sorted(self._handlers)
+
+    def dispatch(self, intent_name, request_json):
+        """Runs the registered handler and returns its response dict (None if the intent is unknown)."""
+        fn = self._handlers.get(intent_name)
+        if fn is None:
+            self.metrics.observe('unrecognized', 0.0, error=True)
+            return None
+        profiler = self.profiler if intent_name == self.profiled_intent else None
+        thread_id = threading.get_ident()
+        if profiler is not None:
+            profiler.enter(thread_id)
+        self._current.intent = intent_name
+        error = False
+        start = time.perf_counter()
+        try:
+            return fn(request_json)
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.metrics.observe(intent_name, time.perf_counter() - start, error)
+            self._current.intent = None
+            if profiler is not None:
+                profiler.exit(thread_id)
+
+    def log_error(self, where, exc):
+        """For handlers that catch their own exceptions: logs it and counts an error for the current intent."""
+        print(f"Error in {where}: {exc}")
+        intent_name = getattr(self._current, 'intent', None)
+        if intent_name:
+            self.metrics.count_error(intent_name)
+
+    def start_profiling(self, intent_name, interval=0.001):
+        """Samples stacks of every call to one intent (in this worker) until stop_profiling()."""
+        if intent_name not in self._handlers:
+            raise ValueError(f"Unknown intent '{intent_name}'")
+        self.stop_profiling()
+        profiler = SamplingProfiler(interval)
+        profiler.start()
+        self.profiler, self.profiled_intent = profiler, intent_name
+
+    def stop_profiling(self):
+        """Switches profiling off and returns the profiler with its collected samples."""
+        profiler, self.profiler, self.profiled_intent = self.profiler, None, None
+        if profiler is not None:
+            profiler.stop()
+        return profiler
@@ -0,0 +1,232 @@
+# backend/metrics.py
+"""Low-overhead request metrics and an on-demand sampling profiler.
+
+Counters live in per-thread shards: a request thread only ever touches its own
+dicts, so recording needs no lock. A scrape sums the shards of this process and,
+when METRICS_DIR is set (e.g. under gunicorn), merges in the snapshots every
+other worker process writes there, so /metrics shows totals for the whole server.
+Those snapshots are written by a background thread in each worker, never by a
+request thread, so a slow or full disk can't hold up or fail a request.
+"""
+import bisect
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+# Latency histogram bucket upper bounds, in seconds.
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SNAPSHOT_INTERVAL = 5.0  # seconds between a worker's snapshot writes to METRICS_DIR
+
+
+class _Shard:
+    __slots__ = ('requests', 'errors', 'latency_sum', 'buckets')
+
+    def __init__(self):
+        self.requests = Counter()
+        self.errors = Counter()
+        self.latency_sum = Counter()
+        self.buckets = {}   # name -> list of per-bucket counts (the last slot is +Inf)
+
+
+class Metrics:
+    """Per-name request counts, error counts and latency histograms."""
+
+    def __init__(self, prefix, label, metrics_dir=None):
+        self.prefix = prefix
+        self.label = label
+        self.metrics_dir = metrics_dir
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()  # only taken when a new thread records its first sample
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_thread = None
+        self._snapshot_failing = False
+        if metrics_dir and hasattr(os, 'register_at_fork'):
+            # Threads don't survive a fork: each gunicorn worker starts its own writer.
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def observe(self, name, seconds, error=False):
+        shard = self._shard()
+        shard.requests[name] += 1
+        if error:
+            shard.errors[name] += 1
+        shard.latency_sum[name] += seconds
+        counts = shard.buckets.get(name)
+        if counts is None:
+            counts = shard.buckets[name] = [0] * (len(BUCKETS) + 1)
+        counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        if self.metrics_dir and self._snapshot_thread is None:
+            self._start_snapshots()
+
+    def count_error(self, name):
+        """Counts an error that a handler caught and turned into a reply itself."""
+        self._shard().errors[name] += 1
+
+    def snapshot(self):
+        """Sums this process's shards into a JSON-serializable dict."""
+        total = {'requests': Counter(), 'errors': Counter(), 'latency_sum': Counter(), 'buckets': {}}
+        with self._shards_lock:
+            shards = list(self._shards)
+        for shard in shards:
+            # dict() copies are atomic under the GIL, so other threads can keep recording meanwhile.
+            total['requests'].update(dict(shard.requests))
+            total['errors'].update(dict(shard.errors))
+            total['latency_sum'].update(dict(shard.latency_sum))
+            for name, counts in dict(shard.buckets).items():
+                merged = total['buckets'].setdefault(name, [0] * len(counts))
+                for i, c in enumerate(counts):
+                    merged[i] += c
+        return {k: dict(v) for k, v in total.items()}
+
+    def _start_snapshots(self):
+        with self._snapshot_lock:
+            if self._snapshot_thread is not None:
+                return
+            self._snapshot_thread = threading.Thread(target=self._write_snapshots, name='metrics-snapshots', daemon=True)
+            try:
+                self._snapshot_thread.start()
+            except RuntimeError as e:   # out of threads: go without snapshots rather than fail the request
+                print(f"❌ ERROR starting metrics snapshot writer: {e}")
+
+    def _after_fork(self):
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_thread = None
+
+    def _write_snapshots(self):
+        while True:
+            self.write_snapshot()
+            time.sleep(SNAPSHOT_INTERVAL)
+
+    def write_snapshot(self):
+        """Writes this process's totals to METRICS_DIR/<pid>.json (atomically). Returns False if it failed."""
+        with self._snapshot_lock:
+            tmp = None
+            try:
+                os.makedirs(self.metrics_dir, exist_ok=True)
+                fd, tmp = tempfile.mkstemp(dir=self.metrics_dir, prefix=f"{os.getpid()}.", suffix='.tmp')
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(self.snapshot(), f)
+                os.replace(tmp, os.path.join(self.metrics_dir, f"{os.getpid()}.json"))
+                self._snapshot_failing = False
+                return True
+            except OSError as e:
+                if not self._snapshot_failing:   # once, not every SNAPSHOT_INTERVAL
+                    print(f"❌ ERROR writing metrics snapshot: {e}")
+                self._snapshot_failing = True
+                if tmp is not None:
+                    try:
+                        os.remove(tmp)
+                    except OSError:
+                        pass
+                return False
+
+    def aggregate(self):
+        """Totals for this process plus every other worker's latest snapshot in METRICS_DIR."""
+        snapshots = [self.snapshot()]
+        if self.metrics_dir and os.path.isdir(self.metrics_dir):
+            own = f"{os.getpid()}.json"
+            for filename in os.listdir(self.metrics_dir):
+                if filename.endswith('.json') and filename != own:
+                    try:
+                        with open(os.path.join(self.metrics_dir, filename)) as f:
+                            snapshots.append(json.load(f))
+                    except (OSError, ValueError):
+                        continue
+        total = {'requests': Counter(), 'errors': Counter(), 'latency_sum': Counter(), 'buckets': {}}
+        for snap in snapshots:
+            for key in ('requests', 'errors', 'latency_sum'):
+                total[key].update(snap.get(key, {}))
+            for name, counts in snap.get('buckets', {}).items():
+                merged = total['buckets'].setdefault(name, [0] * len(counts))
+                for i, c in enumerate(counts):
+                    merged[i] += c
+        return total
+
+    def render_prometheus(self):
+        """Renders the aggregated metrics in the Prometheus text exposition format."""
+        total = self.aggregate()
+        p, label = self.prefix, self.label
+
+        def esc(value):
+            return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+        lines = [f"# HELP {p}_requests_total Requests handled, by {label}.",
+                 f"# TYPE {p}_requests_total counter"]
+        lines += [f'{p}_requests_total{{{label}="{esc(n)}"}} {c}' for n, c in sorted(total['requests'].items())]
+        lines += [f"# HELP {p}_errors_total Requests that failed, by {label}.",
+                  f"# TYPE {p}_errors_total counter"]
+        lines += [f'{p}_errors_total{{{label}="{esc(n)}"}} {c}' for n, c in sorted(total['errors'].items())]
+        lines += [f"# HELP {p}_latency_seconds Handler latency, by {label}.",
+                  f"# TYPE {p}_latency_seconds histogram"]
+        for name, counts in sorted(total['buckets'].items()):
+            cumulative = 0
+            for bound, c in zip(list(BUCKETS) + ['+Inf'], counts):
+                cumulative += c
+                lines.append(f'{p}_latency_seconds_bucket{{{label}="{esc(name)}",le="{bound}"}} {cumulative}')
+            lines.append(f'{p}_latency_seconds_sum{{{label}="{esc(name)}"}} {total["latency_sum"].get(name, 0.0)}')
+            lines.append(f'{p}_latency_seconds_count{{{label}="{esc(name)}"}} {cumulative}')
+        return "\n".join(lines) + "\n"
+
+
+class SamplingProfiler:
+    """Samples the stacks of registered threads from a background thread.
+
+    Only threads currently inside a profiled call (between enter() and exit()) are
+    sampled, so leaving it switched on for one intent doesn't slow down the others.
+    enter()/exit() are single set operations, atomic under the GIL, so they take no lock.
+    """
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.stacks = Counter()    # folded stack "a;b;c" -> samples (flamegraph.pl / speedscope format)
+        self.samples = 0
+        self._threads = set()
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def start(self):
+        self._sampler = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+    def enter(self, thread_id):
+        self._threads.add(thread_id)
+
+    def exit(self, thread_id):
+        self._threads.discard(thread_id)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            threads = tuple(self._threads)
+            if not threads:
+                continue
+            frames = sys._current_frames()
+            for thread_id in threads:
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                if stack:
+                    self.stacks[";".join(reversed(stack))] += 1
+                    self.samples += 1
+
+    def folded(self):
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
@@ -0,0 +1,329 @@
+# backend/pnr_index.py
+"""Compiled, memory-mapped PNR index.
+
+The PNR CSV is compiled once into a sorted, fixed-width binary file. Workers
+mmap that file (so the OS shares the pages between them) and look PNRs up by
+binary search, without loading pandas or the whole dataset into memory.
+
+File layout:
+    8 bytes   magic (b'RMPNRIX1')
+    4 bytes   header length, little-endian uint32
+    N bytes   JSON header: count, record_size, key_column, columns [[name, width], ...]
+    padding   up to an 8-byte boundary
+    records   count * record_size bytes, sorted by key
+
+Each record is an 8-byte big-endian key (the numeric part of 'PNRxxxxxxxxxx')
+followed by each column as UTF-8, NUL-padded to its fixed width. Big-endian keys
+mean raw byte comparison gives numeric order, so lookups never unpack structs.
+
+Build from the command line (or merge a delta CSV into an existing index):
+    python pnr_index.py build [csv_path] [index_path]
+    python pnr_index.py delta <delta_csv> [index_path]
+"""
+import csv
+import json
+import mmap
+import os
+import struct
+import sys
+
+MAGIC = b'RMPNRIX1'
+KEY_SIZE = 8
+KEY_PREFIX = 'PNR'
+
+
+def pnr_to_key(pnr):
+    """Converts 'PNR0123456789' (or a bare number) to its 8-byte sort key, or None."""
+    pnr = str(pnr).strip()
+    if pnr.upper().startswith(KEY_PREFIX):
+        pnr = pnr[len(KEY_PREFIX):]
+    if not pnr.isdigit():
+        return None
+    return struct.pack('>Q', int(pnr))
+
+
+def key_to_pnr(key):
+    """Converts an 8-byte sort key back to the 'PNR0123456789' form."""
+    return f"{KEY_PREFIX}{struct.unpack('>Q', key)[0]:010d}"
+
+
+def _preamble(count, record_size, key_column, columns):
+    header_json = json.dumps({
+        'count': count,
+        'record_size': record_size,
+        'key_column': key_column,
+        'columns': columns,
+    }).encode('utf-8')
+    preamble = MAGIC + struct.pack('<I', len(header_json)) + header_json
+    return preamble + b'\0' * (-len(preamble) % 8)
+
+
+def build_index(csv_path, index_path, key_column='PNR'):
+    """Compiles the PNR CSV into a binary index. Returns a stats dict."""
+    # Pass 1: find the fixed width of every column.
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        key_pos = header.index(key_column)
+        value_positions = [i for i in range(len(header)) if i != key_pos]
+        widths = [1] * len(value_positions)
+        for row in reader:
+            for n, i in enumerate(value_positions):
+                w = len(row[i].encode('utf-8'))
+                if w > widths[n]:
+                    widths[n] = w
+
+    columns = [[header[i], w] for i, w in zip(value_positions, widths)]
+    record_size = KEY_SIZE + sum(widths)
+
+    # Pass 2: pack every row into a fixed-width record.
+    records = []
+    skipped = 0
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader)
+        for row in reader:
+            key = pnr_to_key(row[key_pos])
+            if key is None:
+                skipped += 1
+                continue
+            parts = [key]
+            for n, i in enumerate(value_positions):
+                parts.append(row[i].encode('utf-8').ljust(widths[n], b'\0'))
+            records.append(b''.join(parts))
+
+    # Stable sort on the key prefix, so the first row wins for duplicate PNRs (as in the CSV).
+    records.sort(key=lambda rec: rec[:KEY_SIZE])
+    unique = []
+    last_key = None
+    for rec in records:
+        key = rec[:KEY_SIZE]
+        if key != last_key:
+            unique.append(rec)
+            last_key = key
+    duplicates = len(records) - len(unique)
+
+    preamble = _preamble(len(unique), record_size, key_column, columns)
+
+    # Write to a temp file and rename, so running workers never see a half-written index.
+    tmp_path = f"{index_path}.tmp{os.getpid()}"
+    with open(tmp_path, 'wb') as out:
+        out.write(preamble)
+        for rec in unique:
+            out.write(rec)
+    os.replace(tmp_path, index_path)
+
+    return {'count': len(unique), 'skipped': skipped, 'duplicates': duplicates,
+            'record_size': record_size, 'bytes': len(preamble) + record_size * len(unique)}
+
+
+class PnrIndex:
+    """Read-only view over a compiled PNR index file."""
+
+    def __init__(self, index_path):
+        self.path = index_path
+        with open(index_path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{index_path} is not a PNR index file")
+        (header_len,) = struct.unpack_from('<I', self._mm, len(MAGIC))
+        start = len(MAGIC) + 4
+        header = json.loads(self._mm[start:start + header_len].decode('utf-8'))
+        data_start = start + header_len
+        self._data_start = data_start + (-data_start % 8)
+        self._count = header['count']
+        self._record_size = header['record_size']
+        self.key_column = header['key_column']
+        self._fields = []
+        offset = KEY_SIZE
+        for name, width in header['columns']:
+            self._fields.append((name, offset, width))
+            offset += width
+        self.columns = [self.key_column] + [name for name, _, _ in self._fields]
+
+    def __len__(self):
+        return self._count
+
+    def _find(self, key):
+        """Binary search for a key; returns the record offset or -1."""
+        mm = self._mm
+        size = self._record_size
+        base = self._data_start
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            off = base + mid * size
+            probe = mm[off:off + KEY_SIZE]
+            if probe < key:
+                lo = mid + 1
+            elif probe > key:
+                hi = mid
+            else:
+                return off
+        return -1
+
+    def _lower_bound(self, key, lo=0):
+        """Index of the first record (from lo on) whose key is >= key."""
+        mm = self._mm
+        size = self._record_size
+        base = self._data_start
+        hi = self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            off = base + mid * size
+            if mm[off:off + KEY_SIZE] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _decode(self, off):
+        rec = self._mm[off:off + self._record_size]
+        row = {self.key_column: key_to_pnr(rec[:KEY_SIZE])}
+        for name, start, width in self._fields:
+            row[name] = rec[start:start + width].rstrip(b'\0').decode('utf-8')
+        return row
+
+    def __contains__(self, pnr):
+        key = pnr_to_key(pnr)
+        return key is not None and self._find(key) >= 0
+
+    def get(self, pnr):
+        """Returns the row for a PNR as a dict, or None if it isn't in the index."""
+        key = pnr_to_key(pnr)
+        if key is None:
+            return None
+        off = self._find(key)
+        return self._decode(off) if off >= 0 else None
+
+    def get_many(self, pnrs):
+        """Looks up a batch of PNRs in one pass. Returns {pnr: row} for those in the index.
+
+        The keys are searched in sorted order, each search starting where the last
+        one ended, and a PNR repeated in the batch is only looked up once.
+        """
+        by_key = {}
+        for pnr in pnrs:
+            key = pnr_to_key(pnr)
+            if key is not None:
+                by_key.setdefault(key, []).append(pnr)
+        found = {}
+        mm, size, base = self._mm, self._record_size, self._data_start
+        i = 0
+        for key in sorted(by_key):
+            i = self._lower_bound(key, i)
+            if i == self._count:
+                break
+            off = base + i * size
+            if mm[off:off + KEY_SIZE] == key:
+                row = self._decode(off)
+                for pnr in by_key[key]:
+                    found[pnr] = row
+        return found
+
+    def head(self, n=100):
+        """Returns the first n rows (in key order) as a list of dicts."""
+        return [self._decode(self._data_start + i * self._record_size)
+                for i in range(min(n, self._count))]
+
+    def close(self):
+        self._mm.close()
+
+
+COPY_CHUNK = 1 << 24   # bytes of untouched records copied per write when merging a delta
+
+
+def apply_delta(index_path, delta_path, out_path):
+    """Merges a delta CSV into a compiled index, writing the result to out_path. Returns a stats dict.
+
+    The delta has the PNR CSV's columns plus an optional 'op' column: 'delete'
+    removes the PNR, anything else adds or replaces it; later rows win. Runs of
+    untouched records are copied byte for byte, so a delta costs a sequential
+    copy of the index rather than a reparse of the full CSV.
+    """
+    base = PnrIndex(index_path)
+    try:
+        changes = {}   # key -> row dict, or None to delete
+        skipped = 0
+        with open(delta_path, newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            missing = [c for c in base.columns if c not in (reader.fieldnames or ())]
+            if missing:
+                raise ValueError(f"Delta {delta_path} is missing columns: {', '.join(missing)}")
+            for row in reader:
+                key = pnr_to_key(row[base.key_column])
+                if key is None:
+                    skipped += 1
+                    continue
+                changes[key] = None if (row.get('op') or '').strip().lower() == 'delete' else row
+
+        # Widen columns if the delta has longer values; untouched records are then re-padded.
+        widths = [width for _, _, width in base._fields]
+        for row in changes.values():
+            if row is not None:
+                for n, (name, _, _) in enumerate(base._fields):
+                    widths[n] = max(widths[n], len(row[name].encode('utf-8')))
+        widened = widths != [width for _, _, width in base._fields]
+        record_size = KEY_SIZE + sum(widths)
+
+        keys = sorted(changes)
+        existing = {key for key in keys if base._find(key) >= 0}
+        deleted = sum(1 for key in keys if changes[key] is None and key in existing)
+        added = sum(1 for key in keys if changes[key] is not None and key not in existing)
+        count = len(base) - deleted + added
+        columns = [[name, width] for (name, _, _), width in zip(base._fields, widths)]
+        preamble = _preamble(count, record_size, base.key_column, columns)
+
+        mm, size, data_start = base._mm, base._record_size, base._data_start
+
+        def copy(out, first, last):
+            if not widened:
+                for start in range(first * size, last * size, COPY_CHUNK):
+                    out.write(mm[data_start + start:data_start + min(last * size, start + COPY_CHUNK)])
+                return
+            for i in range(first, last):
+                rec = mm[data_start + i * size:data_start + (i + 1) * size]
+                out.write(rec[:KEY_SIZE])
+                for (_, start, width), new_width in zip(base._fields, widths):
+                    out.write(rec[start:start + width].ljust(new_width, b'\0'))
+
+        tmp_path = f"{out_path}.tmp{os.getpid()}"
+        with open(tmp_path, 'wb') as out:
+            out.write(preamble)
+            pos = 0
+            for key in keys:
+                i = base._lower_bound(key)
+                copy(out, pos, i)
+                pos = i + 1 if key in existing else i
+                row = changes[key]
+                if row is not None:
+                    out.write(key)
+                    for (name, _, _), width in zip(base._fields, widths):
+                        out.write(row[name].encode('utf-8').ljust(width, b'\0'))
+            copy(out, pos, len(base))
+        os.replace(tmp_path, out_path)
+    finally:
+        base.close()
+
+    return {'count': count, 'added': added, 'replaced': len(existing) - deleted, 'deleted': deleted,
+            'skipped': skipped, 'widened': widened, 'record_size': record_size,
+            'bytes': len(preamble) + record_size * count}
+
+
+if __name__ == '__main__':
+    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    if len(sys.argv) > 2 and sys.argv[1] == 'delta':
+        dst = sys.argv[3] if len(sys.argv) > 3 else os.path.join(project_root, 'data', 'pnr_index.bin')
+        result = apply_delta(dst, sys.argv[2], dst)
+        print(f"✅ Applied {sys.argv[2]} to {dst}: {result['count']} PNRs ({result['added']} added, "
+              f"{result['replaced']} replaced, {result['deleted']} deleted, {result['skipped']} skipped)")
+        sys.exit(0)
+    if len(sys.argv) < 2 or sys.argv[1] != 'build':
+        print("Usage: python pnr_index.py build [csv_path] [index_path]\n"
+              "       python pnr_index.py delta <delta_csv> [index_path]")
+        sys.exit(1)
+    src = sys.argv[2] if len(sys.argv) > 2 else os.path.join(project_root, 'data', 'pnr_database.csv')
+    dst = sys.argv[3] if len(sys.argv) > 3 else os.path.join(project_root, 'data', 'pnr_index.bin')
+    result = build_index(src, dst)
+    print(f"✅ Built {dst}: {result['count']} PNRs, {result['bytes']} bytes "
+          f"({result['skipped']} skipped, {result['duplicates']} duplicates)")
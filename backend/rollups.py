@@ -0,0 +1,181 @@
+# backend/rollups.py
+"""Incrementally maintained complaint counts for the admin dashboard.
+
+Two rollup tables are updated in the same transaction as each complaint insert
+(and each re-categorization, see categorizer.py):
+    complaint_rollups       count per (department, station, hour bucket)
+    complaint_status_counts count per status
+
+so dashboard stats cost O(buckets), not a scan of the complaints table.
+
+Rebuild or verify the rollups from the command line:
+    python rollups.py backfill [db_path]
+    python rollups.py check [db_path]
+"""
+import os
+import sys
+
+from db import connect
+
+HOUR_BUCKET = "strftime('%Y-%m-%d %H:00:00', timestamp)"
+STATS_FILTERS = frozenset({'department', 'station', 'date_from', 'date_to'})   # what stats() can filter by
+
+SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS complaint_rollups (
+        department TEXT NOT NULL,
+        station TEXT NOT NULL,
+        hour TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (department, station, hour)
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_complaint_rollups_hour ON complaint_rollups (hour)",
+    '''
+    CREATE TABLE IF NOT EXISTS complaint_status_counts (
+        status TEXT PRIMARY KEY,
+        count INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+)
+
+# The rollup rows a set of complaints contributes to, with NULLs folded to ''.
+# {sign} is '' to count them, '-' to subtract them.
+_ROLLUP_SELECT = (f"SELECT COALESCE(department, ''), COALESCE(station, ''), {HOUR_BUCKET}, {{sign}}COUNT(*) "
+                  "FROM complaints {where} GROUP BY 1, 2, 3")
+_STATUS_SELECT = "SELECT COALESCE(status, ''), {sign}COUNT(*) FROM complaints {where} GROUP BY 1"
+
+
+def create_tables(cursor):
+    for sql in SCHEMA:
+        cursor.execute(sql)
+
+
+def _add(cursor, where, params, sign=''):
+    """Adds the complaints matching `where` to both rollups, or subtracts them with sign='-'."""
+    cursor.execute(
+        "INSERT INTO complaint_rollups (department, station, hour, count) "
+        + _ROLLUP_SELECT.format(where=where, sign=sign)
+        + " ON CONFLICT (department, station, hour) DO UPDATE SET count = count + excluded.count",
+        params)
+    cursor.execute(
+        "INSERT INTO complaint_status_counts (status, count) "
+        + _STATUS_SELECT.format(where=where, sign=sign)
+        + " ON CONFLICT (status) DO UPDATE SET count = count + excluded.count",
+        params)
+
+
+def record_complaint(cursor, complaint_id):
+    """Adds one just-inserted complaint to the rollups. Call inside the insert's transaction."""
+    record_complaints(cursor, complaint_id, complaint_id)
+
+
+def record_complaints(cursor, first_id, last_id):
+    """Adds a just-inserted range of complaint IDs to the rollups, e.g. after a bulk insert."""
+    _add(cursor, "WHERE complaint_id BETWEEN ? AND ?", (first_id, last_id))
+
+
+def remove_complaints(cursor, first_id, last_id):
+    """Takes a range of complaint IDs out of the rollups, e.g. before rewriting their departments.
+
+    Call it with the rows as they are now, and record_complaints() once they are
+    updated, in the same transaction. Rollup rows left at zero are deleted.
+    """
+    params = (first_id, last_id)
+    _add(cursor, "WHERE complaint_id BETWEEN ? AND ?", params, sign='-')
+    cursor.execute("DELETE FROM complaint_rollups WHERE count = 0 AND (department, station, hour) IN ("
+                   f"SELECT COALESCE(department, ''), COALESCE(station, ''), {HOUR_BUCKET} "
+                   "FROM complaints WHERE complaint_id BETWEEN ? AND ?)", params)
+    cursor.execute("DELETE FROM complaint_status_counts WHERE count = 0")
+
+
+def backfill(conn):
+    """Rebuilds both rollup tables from the complaints table in one transaction."""
+    with conn:
+        create_tables(conn)
+        conn.execute("DELETE FROM complaint_rollups")
+        conn.execute("DELETE FROM complaint_status_counts")
+        conn.execute("INSERT INTO complaint_rollups (department, station, hour, count) "
+                     + _ROLLUP_SELECT.format(where='', sign=''))
+        conn.execute("INSERT INTO complaint_status_counts (status, count) "
+                     + _STATUS_SELECT.format(where='', sign=''))
+
+
+def check(conn):
+    """Compares the rollups with a full recount. Returns a list of (table, key, rollup, actual) mismatches."""
+    mismatches = []
+    pairs = (
+        ('complaint_rollups', "SELECT department, station, hour, count FROM complaint_rollups",
+         _ROLLUP_SELECT.format(where='', sign='')),
+        ('complaint_status_counts', "SELECT status, count FROM complaint_status_counts",
+         _STATUS_SELECT.format(where='', sign='')),
+    )
+    for table, rollup_sql, actual_sql in pairs:
+        stored = {row[:-1]: row[-1] for row in conn.execute(rollup_sql)}
+        actual = {row[:-1]: row[-1] for row in conn.execute(actual_sql)}
+        for key in stored.keys() | actual.keys():
+            if stored.get(key, 0) != actual.get(key, 0):
+                mismatches.append((table, key, stored.get(key, 0), actual.get(key, 0)))
+    return mismatches
+
+
+def stats(conn, filters=None, top_stations=20):
+    """Reads dashboard aggregates from the rollups.
+
+    filters (see complaints.parse_filters) can limit them to a department, a station
+    and a date range of hour buckets. The rollups aren't kept by status, PNR or parent
+    ticket, so those filters raise ValueError rather than being ignored.
+    """
+    filters = filters or {}
+    unsupported = set(filters) - STATS_FILTERS
+    if unsupported:
+        raise ValueError(f"Unsupported filter(s) for stats: {', '.join(sorted(unsupported))}")
+    conditions, params = [], []
+    for column in ('department', 'station'):
+        if column in filters:
+            conditions.append(f"{column} = ?")
+            params.append(filters[column])
+    if 'date_from' in filters:
+        conditions.append("hour >= ?")
+        params.append(filters['date_from'])
+    if 'date_to' in filters:
+        conditions.append("hour < date(?, '+1 day')")
+        params.append(filters['date_to'])
+    where = (" WHERE " + " AND ".join(conditions)) if conditions else ""
+
+    def grouped(column, order="2 DESC", limit=None):
+        sql = f"SELECT {column}, SUM(count) FROM complaint_rollups{where} GROUP BY 1 ORDER BY {order}"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return [{"key": k, "count": c} for k, c in conn.execute(sql, params)]
+
+    total = conn.execute(f"SELECT COALESCE(SUM(count), 0) FROM complaint_rollups{where}", params).fetchone()[0]
+    return {
+        "total": total,
+        "by_department": grouped("department"),
+        "by_station": grouped("station", limit=top_stations),
+        "by_hour": grouped("hour", order="1"),
+        # Status counts are kept for all time; they are not split by hour, department or station.
+        "by_status": [{"key": k, "count": c} for k, c in
+                      conn.execute("SELECT status, count FROM complaint_status_counts ORDER BY count DESC")],
+    }
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] not in ('backfill', 'check'):
+        print("Usage: python rollups.py backfill|check [db_path]")
+        sys.exit(1)
+    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    db = sys.argv[2] if len(sys.argv) > 2 else os.path.join(project_root, 'railmadad.db')
+    conn = connect(db)
+    if sys.argv[1] == 'backfill':
+        backfill(conn)
+        print(f"✅ Rebuilt complaint rollups in {db}.")
+    else:
+        problems = check(conn)
+        for table, key, stored, actual in problems:
+            print(f"❌ {table} {key}: rollup {stored}, actual {actual}")
+        if problems:
+            sys.exit(1)
+        print(f"✅ Complaint rollups in {db} are consistent.")
+    conn.close()
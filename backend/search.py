@@ -0,0 +1,119 @@
+# backend/search.py
+"""Full-text search over complaint text with SQLite FTS5.
+
+complaints_fts is an external-content FTS5 index over complaints.complaint_text:
+it stores only the index, reads text from the complaints table, and is kept in
+sync by triggers, so every write path (webhook, bulk loads, manual edits) is covered.
+
+Rebuild the index for existing rows from the command line:
+    python search.py rebuild [db_path]
+"""
+import os
+import re
+import sys
+from html import escape
+
+import complaints
+from db import connect
+
+SCHEMA = (
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS complaints_fts USING fts5(
+        complaint_text,
+        content='complaints',
+        content_rowid='complaint_id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS complaints_fts_insert AFTER INSERT ON complaints BEGIN
+        INSERT INTO complaints_fts (rowid, complaint_text) VALUES (new.complaint_id, new.complaint_text);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS complaints_fts_delete AFTER DELETE ON complaints BEGIN
+        INSERT INTO complaints_fts (complaints_fts, rowid, complaint_text)
+        VALUES ('delete', old.complaint_id, old.complaint_text);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS complaints_fts_update AFTER UPDATE OF complaint_text ON complaints BEGIN
+        INSERT INTO complaints_fts (complaints_fts, rowid, complaint_text)
+        VALUES ('delete', old.complaint_id, old.complaint_text);
+        INSERT INTO complaints_fts (rowid, complaint_text) VALUES (new.complaint_id, new.complaint_text);
+    END
+    ''',
+)
+
+SEARCH_FILTERS = {'department', 'status', 'station', 'pnr', 'date_from', 'date_to'}
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 200
+
+# Snippet markers that can't appear in complaint text; swapped for <mark> after HTML-escaping.
+_HL_START, _HL_END = '\x02', '\x03'
+
+
+def create_index(cursor):
+    """Creates the FTS table and triggers. On first creation, indexes the existing complaints."""
+    exists = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'complaints_fts'").fetchone()
+    for sql in SCHEMA:
+        cursor.execute(sql)
+    if not exists:
+        rebuild(cursor)
+
+
+def rebuild(cursor):
+    """Re-indexes every row of the complaints table."""
+    cursor.execute("INSERT INTO complaints_fts (complaints_fts) VALUES ('rebuild')")
+
+
+def to_match_query(text):
+    """Turns free text into an FTS5 query that requires every word; a trailing '*' keeps prefix search.
+
+    'AC not working on 12951' -> '"ac" "not" "working" "on" "12951"'
+    """
+    terms = []
+    for word, star in re.findall(r'(\w+)(\*?)', text.lower()):
+        terms.append(f'"{word}"' + star)
+    return " ".join(terms)
+
+
+def search(conn, text, filters=None, limit=DEFAULT_LIMIT):
+    """Returns complaints matching text, best (lowest bm25) first, each with an HTML snippet."""
+    match = to_match_query(text)
+    if not match:
+        return []
+    filters = filters or {}
+    unsupported = set(filters) - SEARCH_FILTERS
+    if unsupported:
+        raise ValueError(f"Unsupported filter(s): {', '.join(sorted(unsupported))}")
+    where, params = complaints.filter_clause(filters, table='c')
+    where = where.replace(" WHERE ", " AND ", 1)
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    columns = ", ".join(f"c.{col}" for col in complaints.COLUMNS)
+    sql = (f"SELECT {columns}, snippet(complaints_fts, 0, '{_HL_START}', '{_HL_END}', '…', 16), "
+           f"bm25(complaints_fts) "
+           f"FROM complaints_fts JOIN complaints c ON c.complaint_id = complaints_fts.rowid "
+           f"WHERE complaints_fts MATCH ?{where} ORDER BY bm25(complaints_fts) LIMIT ?")
+    results = []
+    for row in conn.execute(sql, [match] + params + [limit]):
+        result = dict(zip(complaints.COLUMNS, row))
+        result['snippet'] = escape(row[-2]).replace(_HL_START, '<mark>').replace(_HL_END, '</mark>')
+        result['score'] = round(row[-1], 4)
+        results.append(result)
+    return results
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] != 'rebuild':
+        print("Usage: python search.py rebuild [db_path]")
+        sys.exit(1)
+    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    db = sys.argv[2] if len(sys.argv) > 2 else os.path.join(project_root, 'railmadad.db')
+    conn = connect(db)
+    with conn:
+        create_index(conn)
+        rebuild(conn)
+    conn.close()
+    print(f"✅ Rebuilt the complaint search index in {db}.")
@@ -0,0 +1,236 @@
+# backend/sessions.py
+"""Server-side conversation state and per-client rate limiting for the webhook.
+
+SessionStore keeps what earlier turns of a Dialogflow conversation established
+(the phone number, the verified PNR and token, or the confirmed station), keyed
+by the request's `session`. Dialogflow contexts only live for a turn or two
+(lifespanCount 1), so the store is what lets the complaint turn still know the
+phone number given three turns earlier. Entries expire TTL seconds after their
+last use and the least recently used are evicted beyond max_entries; both are
+O(1), since the LRU order is also the expiry order.
+
+The store is per worker process. To share it between workers, give it a
+backend: any object with get(session_id, now), put(session_id, state, expires)
+and delete(session_id), e.g. a Redis client wrapper. SqliteSessionBackend is a
+local stand-in for one, a table in a WAL database that every worker on the host
+can reach. The in-process LRU stays in front of it as a read-through cache.
+
+RateLimiter is a token bucket per key (a session or a phone number): `burst`
+requests at once, refilled at `rate` per second. A check is one dict lookup and
+some arithmetic, so excess requests are shed before they reach SQLite.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+
+SESSION_TTL = 20 * 60    # seconds; Dialogflow forgets a session's contexts after 20 idle minutes
+MAX_SESSIONS = 100_000
+MAX_LIMITED_KEYS = 100_000
+
+
+class SessionStore:
+    """LRU + TTL map of Dialogflow session -> dict of conversation state."""
+
+    def __init__(self, ttl=SESSION_TTL, max_entries=MAX_SESSIONS, backend=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.backend = backend
+        self._entries = OrderedDict()   # session -> (expires, state), least recently used first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.backend_hits = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _prune(self, now):
+        entries = self._entries
+        while entries:
+            session_id, (expires, _) = next(iter(entries.items()))
+            if expires > now and len(entries) <= self.max_entries:
+                break
+            del entries[session_id]
+            if expires <= now:
+                self.expired += 1
+            else:
+                self.evicted += 1
+
+    def get(self, session_id, now=None, _count=True):
+        """The session's state (a dict; empty if it is unknown), refreshing its TTL."""
+        if not session_id:
+            return {}
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None and entry[0] > now:
+                self._entries[session_id] = (now + self.ttl, entry[1])
+                self._entries.move_to_end(session_id)
+                self.hits += _count
+                return dict(entry[1])
+            self.misses += _count
+            self._prune(now)
+        state = self.backend.get(session_id, now) if self.backend is not None else None
+        if not state:
+            return {}
+        with self._lock:
+            self.backend_hits += _count
+            self._entries[session_id] = (now + self.ttl, state)
+            self._entries.move_to_end(session_id)
+            self._prune(now)
+        return dict(state)
+
+    def peek(self, session_id):
+        """The session's state in this worker, if any, without counting a lookup or refreshing it."""
+        entry = self._entries.get(session_id) if session_id else None
+        return entry[1] if entry is not None else {}
+
+    def update(self, session_id, now=None, **fields):
+        """Merges fields into the session's state. Returns the new state."""
+        if not session_id:
+            return dict(fields)
+        state = self.get(session_id, now, _count=False)
+        state.update(fields)
+        now = time.time() if now is None else now
+        with self._lock:
+            self._entries[session_id] = (now + self.ttl, state)
+            self._entries.move_to_end(session_id)
+            self._prune(now)
+        if self.backend is not None:
+            self.backend.put(session_id, state, now + self.ttl)
+        return dict(state)
+
+    def delete(self, session_id):
+        with self._lock:
+            self._entries.pop(session_id, None)
+        if self.backend is not None:
+            self.backend.delete(session_id)
+
+    def stats(self):
+        return {'sessions': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                'backend_hits': self.backend_hits, 'expired': self.expired, 'evicted': self.evicted,
+                'ttl': self.ttl, 'max_entries': self.max_entries,
+                'backend': type(self.backend).__name__ if self.backend is not None else None}
+
+
+class SqliteSessionBackend:
+    """Session states in a SQLite table, shared by every worker process on the host."""
+
+    PURGE_INTERVAL = 60.0   # seconds between deletes of expired rows
+
+    def __init__(self, db_path):
+        # Imported here: only processes configured with a shared store pay for sqlite3.
+        from db import connect, get_connection
+        self.db_path = db_path
+        self._connection = get_connection
+        conn = connect(db_path)
+        conn.execute("CREATE TABLE IF NOT EXISTS sessions ("
+                     "session_id TEXT PRIMARY KEY, state TEXT NOT NULL, expires REAL NOT NULL)")
+        conn.commit()
+        conn.close()
+        self._last_purge = 0.0
+
+    def get(self, session_id, now):
+        row = self._connection(self.db_path).execute(
+            "SELECT state FROM sessions WHERE session_id = ? AND expires > ?", (session_id, now)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, session_id, state, expires):
+        conn = self._connection(self.db_path)
+        with conn:
+            conn.execute("INSERT INTO sessions (session_id, state, expires) VALUES (?, ?, ?) "
+                         "ON CONFLICT (session_id) DO UPDATE SET state = excluded.state, expires = excluded.expires",
+                         (session_id, json.dumps(state), expires))
+            now = time.time()
+            if now - self._last_purge > self.PURGE_INTERVAL:
+                self._last_purge = now
+                conn.execute("DELETE FROM sessions WHERE expires <= ?", (now,))
+
+    def delete(self, session_id):
+        conn = self._connection(self.db_path)
+        with conn:
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+
+class RateLimiter:
+    """Token bucket per key: up to `burst` requests at once, refilled at `rate` per second.
+
+    Buckets idle long enough to have refilled are dropped, since a new one would be
+    identical; beyond max_keys the least recently used are dropped early.
+    """
+
+    def __init__(self, rate, burst, max_keys=MAX_LIMITED_KEYS):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._refill_seconds = burst / rate if rate > 0 else float('inf')
+        self._buckets = OrderedDict()   # key -> [tokens, last update], least recently used first
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.shed = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def allow(self, key, now=None):
+        """Takes a token from key's bucket. False means the request should be shed."""
+        if not key:
+            return True
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            buckets = self._buckets
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = [self.burst, now]
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+                buckets.move_to_end(key)
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                self.allowed += 1
+                allowed = True
+            else:
+                self.shed += 1
+                allowed = False
+            # Drop buckets from the idle end: refilled ones for free, the rest only over max_keys.
+            while len(buckets) > 1:
+                oldest_key, (_, last) = next(iter(buckets.items()))
+                if now - last >= self._refill_seconds:
+                    del buckets[oldest_key]
+                elif len(buckets) > self.max_keys:
+                    del buckets[oldest_key]
+                    self.evicted += 1
+                else:
+                    break
+            return allowed
+
+    def stats(self):
+        return {'keys': len(self._buckets), 'allowed': self.allowed, 'shed': self.shed,
+                'evicted': self.evicted, 'rate': self.rate, 'burst': self.burst}
+
+
+def render_prometheus(store, limiters, prefix='railmadad'):
+    """The store's and limiters' counters in the Prometheus text format (this process only)."""
+    s = store.stats()
+    lines = [f"# HELP {prefix}_sessions Conversation sessions held in this worker.",
+             f"# TYPE {prefix}_sessions gauge",
+             f"{prefix}_sessions {s['sessions']}",
+             f"# HELP {prefix}_session_lookups_total Session store lookups, by result.",
+             f"# TYPE {prefix}_session_lookups_total counter"]
+    for result in ('hits', 'misses', 'backend_hits'):
+        lines.append(f'{prefix}_session_lookups_total{{result="{result}"}} {s[result]}')
+    lines += [f"# HELP {prefix}_session_removals_total Sessions dropped from this worker, by reason.",
+              f"# TYPE {prefix}_session_removals_total counter"]
+    for reason in ('expired', 'evicted'):
+        lines.append(f'{prefix}_session_removals_total{{reason="{reason}"}} {s[reason]}')
+    lines += [f"# HELP {prefix}_rate_limited_total Webhook requests checked by each rate limiter, by outcome.",
+              f"# TYPE {prefix}_rate_limited_total counter"]
+    for name, limiter in sorted(limiters.items()):
+        lines.append(f'{prefix}_rate_limited_total{{limiter="{name}",outcome="allowed"}} {limiter.allowed}')
+        lines.append(f'{prefix}_rate_limited_total{{limiter="{name}",outcome="shed"}} {limiter.shed}')
+    return "\n".join(lines) + "\n"
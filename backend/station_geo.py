@@ -0,0 +1,89 @@
+# backend/station_geo.py
+"""Nearest-station lookup by coordinates.
+
+Stations are projected onto the unit sphere (x, y, z) and stored in a KD-tree.
+Straight-line (chord) distance on the sphere orders points exactly like
+great-circle distance, so the tree can prune with plain Euclidean bounds and we
+only convert the k winners to kilometres with the haversine formula.
+"""
+import heapq
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def to_xyz(lat, lon):
+    lat, lon = math.radians(lat), math.radians(lon)
+    return (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat))
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in kilometres."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def valid_coordinates(lat, lon):
+    try:
+        lat, lon = float(lat), float(lon)
+    except (TypeError, ValueError):
+        return False
+    return -90 <= lat <= 90 and -180 <= lon <= 180
+
+
+class NearestStationIndex:
+    """KD-tree over station coordinates. Rows without valid latitude/longitude are skipped."""
+
+    def __init__(self, rows):
+        self.stations = [r for r in rows if valid_coordinates(r.get('latitude'), r.get('longitude'))]
+        points = [(to_xyz(float(r['latitude']), float(r['longitude'])), i) for i, r in enumerate(self.stations)]
+        # Each node is (point, station_id, split_axis, left, right).
+        self._root = self._build(points, 0)
+
+    def __len__(self):
+        return len(self.stations)
+
+    def _build(self, points, depth):
+        if not points:
+            return None
+        axis = depth % 3
+        points.sort(key=lambda p: p[0][axis])
+        mid = len(points) // 2
+        point, i = points[mid]
+        return (point, i, axis,
+                self._build(points[:mid], depth + 1),
+                self._build(points[mid + 1:], depth + 1))
+
+    def nearest(self, lat, lon, k=5):
+        """Returns up to k (distance_km, station_row) pairs, closest first."""
+        if not valid_coordinates(lat, lon) or k <= 0:
+            return []
+        lat, lon = float(lat), float(lon)
+        target = to_xyz(lat, lon)
+        heap = []  # max-heap of (-squared chord distance, station_id), size <= k
+
+        # Stack of (node, squared distance from target to the node's region along the split axis).
+        stack = [(self._root, 0.0)]
+        while stack:
+            node, bound = stack.pop()
+            if node is None or (len(heap) == k and bound >= -heap[0][0]):
+                continue
+            point, i, axis, left, right = node
+            d = ((point[0] - target[0]) ** 2 + (point[1] - target[1]) ** 2 + (point[2] - target[2]) ** 2)
+            if len(heap) < k:
+                heapq.heappush(heap, (-d, i))
+            elif d < -heap[0][0]:
+                heapq.heapreplace(heap, (-d, i))
+            diff = target[axis] - point[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            # The far side is only visited if the splitting plane is closer than the k-th best so far.
+            stack.append((far, diff * diff))
+            stack.append((near, 0.0))
+
+        result = []
+        for _, i in sorted(heap, reverse=True):
+            row = self.stations[i]
+            result.append((haversine_km(lat, lon, float(row['latitude']), float(row['longitude'])), row))
+        return result
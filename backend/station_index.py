@@ -0,0 +1,195 @@
+# backend/station_index.py
+"""Typo-tolerant station search index.
+
+Built once from stations_original.csv and queried on every 'provide_station_name'
+turn. Three structures are combined:
+    * an exact dict for station codes and names,
+    * a prefix trie over codes, names and every word in a name ("cantt" finds "agra cantt"),
+    * a trigram inverted index for edit-distance matches.
+
+Names and queries are also reduced to a consonant "skeleton" (first letter of each
+word plus its consonants), because the IR list abbreviates names by dropping
+vowels: "adarsh nagar" and "adrsh ngr delhi" both become "adrsh ngr ...".
+"""
+import csv
+import re
+from collections import Counter
+
+VOWELS = set('aeiou')
+PREFIX_CAP = 32          # station ids kept per trie node
+FUZZY_CANDIDATES = 8     # trigram candidates re-scored with edit distance
+MIN_SCORE = 0.6         # minimum edit-distance similarity for a fuzzy match
+
+
+def normalize(text):
+    """Lowercases and strips punctuation: '"Agra  Cantt."' -> 'agra cantt'."""
+    return " ".join(re.sub(r'[^a-z0-9]+', ' ', str(text).lower()).split())
+
+
+def skeleton(text):
+    """Drops non-leading vowels from every word: 'adarsh nagar' -> 'adrsh ngr'."""
+    return " ".join(w[0] + "".join(c for c in w[1:] if c not in VOWELS) for w in text.split())
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, limit=None):
+    """Levenshtein distance between two short strings.
+
+    Uses Myers'/Hyyrö's bit-parallel algorithm, so each character of b costs a
+    handful of integer operations instead of a row of the DP table. With a limit,
+    returns limit + 1 as soon as the distance must exceed it.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is not None and len(a) - len(b) > limit:
+        return limit + 1
+    if not b:
+        return len(a)
+    peq = {}
+    for i, ch in enumerate(b):
+        peq[ch] = peq.get(ch, 0) | (1 << i)
+    mask = (1 << len(b)) - 1
+    high = 1 << (len(b) - 1)
+    pv, mv, score = mask, 0, len(b)
+    for ch in a:
+        eq = peq.get(ch, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | ~(xh | pv)
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = (ph << 1) | 1
+        mh <<= 1
+        pv = (mh | ~(xv | ph)) & mask
+        mv = ph & xv & mask
+    if limit is not None and score > limit:
+        return limit + 1
+    return score
+
+
+class StationIndex:
+    """Exact, prefix and fuzzy lookups over a list of station rows."""
+
+    def __init__(self, rows):
+        self.stations = list(rows)
+        self._exact = {}
+        self._trie = {}
+        self._grams = {}
+
+        # Per station: (code, name, skeleton), used to score candidates.
+        self._keys = []
+        for row in self.stations:
+            name = normalize(row.get('station', ''))
+            self._keys.append((normalize(row.get('id_code', '')), name, skeleton(name)))
+
+        # Insert shorter names first so each trie node's capped list favours closer matches.
+        order = sorted(range(len(self.stations)), key=lambda i: len(self._keys[i][1]))
+        for i in order:
+            code, name, skel = self._keys[i]
+            forms = {f for f in (code, name, skel) if f}
+            for form in (code, name):
+                if form:
+                    self._exact.setdefault(form, i)
+            for form in forms:
+                words = form.split()
+                for w in range(len(words)):
+                    self._trie_insert(" ".join(words[w:]), i)
+                for g in trigrams(form):
+                    self._grams.setdefault(g, []).append(i)
+
+    @classmethod
+    def from_csv(cls, path):
+        with open(path, newline='', encoding='utf-8') as f:
+            return cls(csv.DictReader(f, quotechar='"'))
+
+    def __len__(self):
+        return len(self.stations)
+
+    def _trie_insert(self, key, i):
+        node = self._trie
+        for ch in key:
+            node = node.setdefault(ch, {})
+            ids = node.setdefault('', [])
+            if len(ids) < PREFIX_CAP and i not in ids:
+                ids.append(i)
+
+    def _trie_prefix(self, prefix):
+        node = self._trie
+        for ch in prefix:
+            node = node.get(ch)
+            if node is None:
+                return []
+        return node.get('', [])
+
+    def exact(self, query):
+        """Returns the station row whose code or name equals the query, or None."""
+        i = self._exact.get(normalize(query))
+        return self.stations[i] if i is not None else None
+
+    def search(self, query, k=5):
+        """Returns up to k (score, station_row) pairs, best first. Exact matches score 1.0."""
+        q = normalize(query)
+        if not q:
+            return []
+        scores = {}
+
+        def offer(i, score):
+            if score > scores.get(i, 0):
+                scores[i] = score
+
+        if q in self._exact:
+            offer(self._exact[q], 1.0)
+
+        q_skel = skeleton(q)
+        for form in {q, q_skel}:
+            for i in self._trie_prefix(form):
+                # Longer prefixes of shorter names rank higher.
+                offer(i, 0.8 + 0.15 * min(len(form) / len(self._keys[i][1] or '-'), 1.0))
+
+        # Edit-distance matching is the slow path: only take it when nothing exact
+        # and too few prefixes matched.
+        if q not in self._exact and len(scores) < k:
+            self._fuzzy(q, q_skel, offer)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], len(self._keys[item[0]][1])))
+        return [(round(score, 3), self.stations[i]) for i, score in ranked[:k]]
+
+    def _fuzzy(self, q, q_skel, offer):
+        q_grams = trigrams(q) | trigrams(q_skel)
+        postings = [self._grams[g] for g in q_grams if g in self._grams]
+        # Very common trigrams ("  a", " jn") say little and dominate counting time; skip them
+        # unless they are all we have.
+        common = max(64, len(self.stations) // 20)
+        postings = [p for p in postings if len(p) <= common] or postings
+        counts = Counter()
+        for p in postings:
+            counts.update(p)
+        candidates = counts.most_common(FUZZY_CANDIDATES)
+        # Drop candidates sharing far fewer trigrams than the best one before paying for edit distance.
+        min_shared = max(len(q_grams) // 4, candidates[0][1] // 2) if candidates else 0
+        for i, shared in candidates:
+            if shared <= min_shared:
+                break
+            code, name, skel = self._keys[i]
+            best = 0.0
+            for form, key in ((q, name), (q_skel, skel), (q, code)):
+                if best >= 0.9:
+                    break
+                if key and form:
+                    # Trim the key to the query's length so a partial query isn't penalized
+                    # for the district suffix IR puts on names ("adrsh ngr delhi").
+                    target = key[:max(len(form), len(key.split()[0]))]
+                    size = max(len(form), len(target))
+                    limit = int(size * (1 - max(MIN_SCORE, best)))
+                    d = edit_distance(form, target, limit)
+                    if d <= limit:
+                        best = max(best, 1 - d / size)
+            if best:
+                offer(i, 0.75 * best)
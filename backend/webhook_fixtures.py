@@ -0,0 +1,228 @@
+# backend/webhook_fixtures.py
+"""Generates realistic Dialogflow webhook requests for load tests and benchmarks.
+
+Requests come in whole conversations (sessions), shaped the way Dialogflow sends
+them: each turn carries the contexts the previous turns set in outputContexts,
+so a replayed session exercises the same code paths a live chat does. Every
+intent the webhook handles is covered, including the unhappy paths (typos,
+unknown PNRs, invalid phone numbers).
+
+Usage:
+    python webhook_fixtures.py [--sessions 2000] [--seed 1] [--out webhook_fixtures.jsonl]
+
+The output has one session per line: a JSON list of requests.
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import uuid
+
+from pnr_index import PnrIndex
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+PNR_INDEX_PATH = os.path.join(project_root, 'data', 'pnr_index.bin')
+STATIONS_PATH = os.path.join(project_root, 'data', 'stations_original.csv')
+
+COMPLAINTS = ["toilet is very dirty and there is no water", "AC not working in coach B2 since morning",
+              "TTE demanding money for berth", "food served was stale and overpriced",
+              "charging point not working near my seat", "platform is flooded near the stairs",
+              "fan not working and lights flickering", "waiting room is locked at night"]
+QUERIES = ["when does the tatkal window open?", "how do I get a refund for a cancelled ticket?",
+           "is there a lounge at this station?", "what is the baggage allowance in sleeper class?"]
+
+# Relative frequency of each kind of conversation in the replayed traffic.
+SESSION_MIX = {
+    'pnr_complaint': 30,
+    'station_complaint': 20,
+    'station_typo_complaint': 10,
+    'location_complaint': 10,
+    'query': 20,
+    'unknown_pnr': 5,
+    'invalid_phone': 5,
+}
+
+
+def load_stations(path=STATIONS_PATH):
+    """Station rows (id_code, station, latitude, longitude) from the stations CSV."""
+    with open(path, newline='') as f:
+        return [{'id_code': row['id_code'], 'station': row['station'],
+                 'latitude': float(row['latitude']), 'longitude': float(row['longitude'])}
+                for row in csv.DictReader(f)]
+
+
+def load_pnrs(path=PNR_INDEX_PATH, n=1000):
+    """Known PNRs from the compiled PNR index, or an empty list if it hasn't been built."""
+    if not os.path.exists(path):
+        return []
+    index = PnrIndex(path)
+    try:
+        return [row['PNR'] for row in index.head(n)]
+    finally:
+        index.close()
+
+
+class SessionBuilder:
+    """Builds the turns of one conversation, carrying its contexts forward like Dialogflow does."""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.session = f"projects/rail-madad/agent/sessions/{uuid.UUID(int=rng.getrandbits(128))}"
+        self.contexts = {}   # context name -> parameters
+        self.turns = []
+
+    def set_context(self, name, **parameters):
+        self.contexts[name] = parameters
+
+    def turn(self, intent, query_text, parameters=None, original_request=None):
+        request = {
+            "responseId": str(uuid.UUID(int=self.rng.getrandbits(128))),
+            "session": self.session,
+            "queryResult": {
+                "queryText": query_text,
+                "parameters": parameters or {},
+                "allRequiredParamsPresent": True,
+                "intent": {"name": f"projects/rail-madad/agent/intents/{intent}", "displayName": intent},
+                "intentDetectionConfidence": 1,
+                "languageCode": "en",
+                "outputContexts": [{"name": f"{self.session}/contexts/{name}", "lifespanCount": 1,
+                                    "parameters": dict(params)} for name, params in self.contexts.items()],
+            },
+        }
+        if original_request:
+            request["originalDetectIntentRequest"] = original_request
+        self.turns.append(request)
+        return request
+
+
+def _phone(rng):
+    return f"9{rng.randrange(10**9):09d}"
+
+
+def _typo(rng, name):
+    """The station name with one character dropped or swapped, as a user might type it."""
+    if len(name) < 5:
+        return name + rng.choice('aeiou')
+    i = rng.randrange(1, len(name) - 1)
+    if rng.random() < 0.5:
+        return name[:i] + name[i + 1:]
+    return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+
+
+def _ask_phone(b):
+    phone = _phone(b.rng)
+    b.turn('provide_phone_number', f"{phone[:5]} {phone[5:]}")
+    b.set_context('awaiting-location', phone_number=phone)
+
+
+def _complain(b):
+    text = b.rng.choice(COMPLAINTS)
+    b.turn('capture_complaint_description', text, {'complaint_text': text})
+
+
+def _confirm_station(b, station):
+    b.set_context('awaiting-station-confirmation', station_confirmed=station)
+    b.turn('user_confirms_station_yes', 'yes')
+    b.contexts.pop('awaiting-station-confirmation')
+    b.set_context('awaiting-complaint-description', station_confirmed=station)
+
+
+def build_session(kind, rng, stations, pnrs):
+    """Returns the list of requests for one conversation of the given kind (a SESSION_MIX key)."""
+    b = SessionBuilder(rng)
+    if kind == 'query':
+        text = rng.choice(QUERIES)
+        b.turn('capture_user_query', text, {'user_query': text})
+        return b.turns
+    if kind == 'invalid_phone':
+        b.turn('provide_phone_number', str(rng.randrange(10**5, 10**7)))
+        return b.turns
+
+    _ask_phone(b)
+    if kind in ('pnr_complaint', 'unknown_pnr'):
+        if kind == 'pnr_complaint' and pnrs:
+            pnr = rng.choice(pnrs)
+        else:
+            pnr = f"PNR{rng.randrange(10**10):010d}"
+        digits = pnr[3:].lstrip('0') or '0'
+        b.turn('provide_pnr', digits, {'pnr_number': float(digits)})
+        if kind == 'unknown_pnr' or not pnrs:
+            return b.turns
+        token = list(pnr)
+        rng.shuffle(token)
+        b.set_context('awaiting-complaint-description', pnr=pnr, complaint_token="".join(token))
+    elif kind == 'location_complaint':
+        station = rng.choice(stations)
+        lat = station['latitude'] + rng.uniform(-0.02, 0.02)
+        lon = station['longitude'] + rng.uniform(-0.02, 0.02)
+        if rng.random() < 0.5:
+            b.turn('provide_location', 'location shared', {'latitude': lat, 'longitude': lon})
+        else:
+            b.turn('provide_location', 'location shared', {},
+                   {"source": "telegram", "payload": {"location": {"latitude": lat, "longitude": lon}}})
+        _confirm_station(b, station['station'])
+    else:
+        station = rng.choice(stations)['station']
+        if kind == 'station_typo_complaint':
+            typed = _typo(rng, station)
+            b.turn('provide_station_name', typed, {'station_input': typed})
+        typed = station if rng.random() < 0.8 else station.upper()
+        b.turn('provide_station_name', typed, {'station_input': typed})
+        _confirm_station(b, station)
+    _complain(b)
+    return b.turns
+
+
+def generate_sessions(n, stations=None, pnrs=None, seed=1, mix=SESSION_MIX):
+    """n sessions drawn from the mix, each a list of Dialogflow requests."""
+    rng = random.Random(seed)
+    stations = stations if stations is not None else load_stations()
+    pnrs = pnrs if pnrs is not None else load_pnrs()
+    kinds = rng.choices(list(mix), weights=list(mix.values()), k=n)
+    return [build_session(kind, rng, stations, pnrs) for kind in kinds]
+
+
+def interleave(sessions):
+    """Flattens sessions into one request stream, round-robin, keeping each session's turns in order."""
+    stream = []
+    depth = max((len(s) for s in sessions), default=0)
+    for i in range(depth):
+        stream.extend(s[i] for s in sessions if i < len(s))
+    return stream
+
+
+def relabel(stream, tag):
+    """The same requests under new session names (suffixed with tag), for replaying a stream again.
+
+    The webhook keeps state and rate limits per session, so a replay under the old
+    names would continue the earlier conversations instead of repeating them.
+    """
+    relabeled = []
+    for request in stream:
+        session = request['session']
+        relabeled.append(json.loads(json.dumps(request).replace(f'"{session}', f'"{session}-{tag}')))
+    return relabeled
+
+
+def save(path, sessions):
+    with open(path, 'w') as f:
+        for session in sessions:
+            f.write(json.dumps(session) + "\n")
+
+
+def load(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', default='webhook_fixtures.jsonl')
+    args = parser.parse_args()
+
+    sessions = generate_sessions(args.sessions, seed=args.seed)
+    save(args.out, sessions)
+    print(f"✅ Wrote {args.sessions} sessions ({sum(len(s) for s in sessions)} requests) to {args.out}")